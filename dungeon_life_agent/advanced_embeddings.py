@@ -8,8 +8,12 @@ planificación de optimización del proyecto:
   estrategias configurables.
 * **Cuantización ligera**: soporta almacenamiento en precisiones FP32,
   FP16 e INT8 para optimizar memoria sin depender de librerías externas.
-* **Caché híbrida**: combina un caché en memoria (LRU) con un backend
-  opcional en Redis para escenarios distribuidos.
+  Los vectores se guardan empaquetados en buffers binarios
+  (``PackedVector``), no como listas de ``float`` de Python.
+* **Caché híbrida**: combina un caché en memoria (LRU), un nivel opcional
+  en disco local (SQLite) que sobrevive a reinicios y un backend opcional
+  en Redis para escenarios distribuidos; en disco y en Redis cada valor son
+  los bytes del vector con una cabecera mínima.
 * **Métricas de calidad**: genera métricas simples sobre la magnitud y
   coherencia de los embeddings para facilitar la monitorización.
 
@@ -22,18 +26,25 @@ han diseñado para mantener compatibilidad hacia atrás con el pipeline de
 
 from __future__ import annotations
 
-import hashlib
-import json
+import contextlib
+import functools
 import logging
 import math
+import pathlib
+import sqlite3
+import struct
+import sys
 import threading
 import time
 from collections import OrderedDict
 from dataclasses import dataclass
 from statistics import mean, pstdev
-from typing import Callable, Iterable, Protocol, Sequence
+from typing import Any, Callable, Iterable, Iterator, Protocol, Sequence
 
+from . import vector_math
 from .embedding_gemma import EmbeddingGemma
+from .single_flight import SingleFlight
+from .vector_store import text_key
 
 LOGGER = logging.getLogger(__name__)
 
@@ -87,11 +98,258 @@ Factory = Callable[[EmbeddingModelConfig], SupportsEmbedding]
 
 
 # ---------------------------------------------------------------------------
-# Caché híbrida (memoria + Redis opcional)
+# Vectores empaquetados
+
+_PACKED_MAGIC = b"DLEV"
+_PACKED_VERSION = 1
+_PACKED_HEADER = struct.Struct("<4sBBHf")
+_PRECISION_FORMATS = {"fp32": (0, "f"), "fp16": (1, "e"), "int8": (2, "b")}
+_PRECISION_BY_CODE = {code: name for name, (code, _) in _PRECISION_FORMATS.items()}
+_FLOAT32 = struct.Struct("<f")
+# Máximo de parámetros por sentencia que aceptan incluso las versiones
+# antiguas de SQLite (999).
+_SQLITE_BATCH = 500
+_DISK_TOUCH_BATCH = 256
+
+
+@dataclass(frozen=True, slots=True)
+class PackedVector:
+    """Vector cuantizado guardado como bytes little-endian.
+
+    ``fp32`` y ``fp16`` son flotantes IEEE de 4 y 2 bytes; ``int8`` guarda
+    enteros con signo y una escala por vector (``valor = entero * scale``).
+    Un vector que no cabe en ``fp16`` se codifica en ``fp32``.
+    """
+
+    precision: str
+    data: bytes
+    scale: float = 1.0
+
+    @classmethod
+    def encode(cls, vector: Sequence[float], precision: str) -> PackedVector:
+        precision = precision.lower()
+        if precision not in _PRECISION_FORMATS:
+            precision = "fp32"
+        layout = _vector_struct(precision, len(vector))
+        if precision == "int8":
+            peak = max((abs(component) for component in vector), default=0.0)
+            # La escala viaja como float32 en la cabecera: se redondea ya aquí
+            # para que el vector decodifique igual en memoria y desde Redis.
+            scale = _FLOAT32.unpack(_FLOAT32.pack(peak / 127.0))[0] if peak > 0 else 1.0
+            quantized = [max(-127, min(127, round(component / scale))) for component in vector]
+            return cls(precision, layout.pack(*quantized), scale)
+        try:
+            return cls(precision, layout.pack(*vector))
+        except OverflowError:
+            if precision != "fp16":
+                raise
+            # Algún componente supera el rango de fp16 (±65504): se guarda
+            # en fp32 en lugar de recortarlo.
+            return cls("fp32", _vector_struct("fp32", len(vector)).pack(*vector))
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> PackedVector | None:
+        """Reconstruye un vector serializado con ``to_bytes``; ``None`` si no es válido."""
+
+        if len(raw) < _PACKED_HEADER.size:
+            return None
+        magic, version, code, dimension, scale = _PACKED_HEADER.unpack_from(raw)
+        precision = _PRECISION_BY_CODE.get(code)
+        if magic != _PACKED_MAGIC or version != _PACKED_VERSION or precision is None:
+            return None
+        data = bytes(raw[_PACKED_HEADER.size :])
+        if len(data) != _vector_struct(precision, dimension).size:
+            return None
+        return cls(precision, data, scale)
+
+    @property
+    def dimension(self) -> int:
+        return len(self.data) // _vector_struct(self.precision, 1).size
+
+    def to_bytes(self) -> bytes:
+        code = _PRECISION_FORMATS[self.precision][0]
+        return _PACKED_HEADER.pack(_PACKED_MAGIC, _PACKED_VERSION, code, self.dimension, self.scale) + self.data
+
+    def values(self) -> tuple[float, ...] | tuple[int, ...]:
+        """Componentes almacenados tal cual (enteros en ``int8``)."""
+
+        return _vector_struct(self.precision, self.dimension).unpack(self.data)
+
+    def decode(self) -> list[float]:
+        values = self.values()
+        if self.precision == "int8":
+            scale = self.scale
+            return [component * scale for component in values]
+        return list(values)
+
+
+@functools.lru_cache(maxsize=64)
+def _vector_struct(precision: str, dimension: int) -> struct.Struct:
+    return struct.Struct(f"<{dimension}{_PRECISION_FORMATS[precision][1]}")
+
+
+# ---------------------------------------------------------------------------
+# Nivel persistente en disco local
+
+
+class DiskEmbeddingCache:
+    """Tabla SQLite con los vectores empaquetados, acotada por número de entradas.
+
+    Las lecturas no escriben: los usos se anotan en memoria y se vuelcan en
+    un único ``UPDATE`` por lotes de ``_DISK_TOUCH_BATCH`` (y antes de
+    desalojar o cerrar), así que el orden LRU es aproximado. Al superar
+    ``max_entries`` se recuenta la tabla, porque otros procesos pueden
+    compartir el archivo, y se eliminan las entradas menos usadas
+    recientemente hasta quedar en el 90 % del límite; las páginas liberadas
+    se devuelven al sistema con ``incremental_vacuum``.
+    """
+
+    def __init__(self, path: str | pathlib.Path, *, max_entries: int = 100_000) -> None:
+        self.path = pathlib.Path(path).expanduser()
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._touched: dict[str, int] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, value BLOB NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS vectors_used ON vectors (used)")
+        row = self._connection.execute("SELECT COUNT(*), COALESCE(MAX(used), 0) FROM vectors").fetchone()
+        self._count, self._clock = int(row[0]), int(row[1])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: str) -> PackedVector | None:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, PackedVector]:
+        """Devuelve los vectores encontrados; los usos se anotan sin escribir."""
+
+        found: dict[str, PackedVector] = {}
+        corrupt: list[str] = []
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _SQLITE_BATCH):
+                batch = unique[start : start + _SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT key, value FROM vectors WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, raw in rows:
+                    packed = PackedVector.from_bytes(raw)
+                    if packed is None:
+                        corrupt.append(key)
+                    else:
+                        found[key] = packed
+            if found:
+                self._clock += 1
+                self._touched.update(dict.fromkeys(found, self._clock))
+                if len(self._touched) >= _DISK_TOUCH_BATCH:
+                    with self._transaction():
+                        self._flush_touches()
+        for key in corrupt:
+            self.delete(key)
+        return found
+
+    def set(self, key: str, packed: PackedVector) -> None:
+        self.set_many([(key, packed)])
+
+    def set_many(self, items: Iterable[tuple[str, PackedVector]]) -> None:
+        entries = dict(items)
+        if not entries:
+            return
+        keys = list(entries)
+        with self._lock:
+            with self._transaction():
+                known = 0
+                for start in range(0, len(keys), _SQLITE_BATCH):
+                    batch = keys[start : start + _SQLITE_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    known += self._connection.execute(
+                        f"SELECT COUNT(*) FROM vectors WHERE key IN ({placeholders})", batch
+                    ).fetchone()[0]
+                self._clock += 1
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO vectors (key, value, used) VALUES (?, ?, ?)",
+                    [(key, packed.to_bytes(), self._clock) for key, packed in entries.items()],
+                )
+                for key in keys:
+                    self._touched.pop(key, None)
+            self._count += len(keys) - known
+            if self._count > self.max_entries:
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._touched.pop(key, None)
+            if self._connection.execute("DELETE FROM vectors WHERE key = ?", (key,)).rowcount:
+                self._count -= 1
+
+    def compact(self) -> None:
+        """Reescribe el archivo completo para recuperar todo el espacio libre."""
+
+        with self._lock:
+            if self._touched:
+                with self._transaction():
+                    self._flush_touches()
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._connection.execute("VACUUM")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._touched:
+                with self._transaction():
+                    self._flush_touches()
+            self._connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._connection.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _flush_touches(self) -> None:
+        self._connection.executemany(
+            "UPDATE vectors SET used = ? WHERE key = ?", [(used, key) for key, used in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def _evict(self) -> None:
+        with self._transaction():
+            self._flush_touches()
+            count = self._connection.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            if count <= self.max_entries:
+                self._count = count
+                return
+            surplus = count - int(self.max_entries * 0.9)
+            deleted = self._connection.execute(
+                "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY used LIMIT ?)", (surplus,)
+            ).rowcount
+            self._count = count - deleted
+        self._connection.execute("PRAGMA incremental_vacuum")
+
+
+# ---------------------------------------------------------------------------
+# Caché híbrida (memoria + disco local y Redis opcionales)
 
 
 class HybridEmbeddingCache:
-    """Caché LRU con backend opcional en Redis."""
+    """Caché LRU con niveles opcionales en disco local y en Redis.
+
+    Las lecturas consultan memoria, disco y Redis en ese orden; un acierto en
+    un nivel inferior se copia a los superiores. Las escrituras llegan a
+    todos los niveles configurados. ``redis_client`` permite pasar un cliente
+    ya creado en lugar de ``redis_url``.
+    """
 
     def __init__(
         self,
@@ -99,12 +357,26 @@ class HybridEmbeddingCache:
         max_size: int = 2048,
         namespace: str = "embeddings",
         redis_url: str | None = None,
+        disk_path: str | pathlib.Path | None = None,
+        disk_max_entries: int = 100_000,
+        redis_client: Any | None = None,
     ) -> None:
         self.max_size = max(1, max_size)
         self.namespace = namespace
-        self._storage: OrderedDict[str, dict] = OrderedDict()
+        self._storage: OrderedDict[str, PackedVector] = OrderedDict()
         self._lock = threading.Lock()
-        self._redis = self._initialize_redis(redis_url)
+        self._disk = self._initialize_disk(disk_path, disk_max_entries)
+        self._redis = redis_client if redis_client is not None else self._initialize_redis(redis_url)
+
+    @staticmethod
+    def _initialize_disk(path: str | pathlib.Path | None, max_entries: int) -> DiskEmbeddingCache | None:
+        if path is None:
+            return None
+        try:
+            return DiskEmbeddingCache(path, max_entries=max_entries)
+        except (OSError, sqlite3.Error) as exc:
+            LOGGER.warning("No se pudo abrir el caché de embeddings en disco %s: %s", path, exc)
+            return None
 
     @staticmethod
     def _initialize_redis(redis_url: str | None):  # pragma: no cover - import dinámico
@@ -123,41 +395,115 @@ class HybridEmbeddingCache:
     def _make_key(self, identifier: str) -> str:
         return f"{self.namespace}:{identifier}"
 
-    def get(self, identifier: str) -> dict | None:
-        key = self._make_key(identifier)
-        with self._lock:
-            if key in self._storage:
-                self._storage.move_to_end(key)
-                return dict(self._storage[key])
-        if self._redis is None:
-            return None
-        raw = self._redis.get(key)
-        if raw is None:
-            return None
-        try:
-            data = json.loads(raw.decode("utf-8"))
-            with self._lock:
-                self._storage[key] = data
-                self._storage.move_to_end(key)
-                while len(self._storage) > self.max_size:
-                    self._storage.popitem(last=False)
-            return dict(data)
-        except Exception:
-            return None
+    def get(self, identifier: str) -> PackedVector | None:
+        return self.get_many([identifier])[0]
+
+    def get_many(self, identifiers: Sequence[str]) -> list[PackedVector | None]:
+        """Busca varios vectores a la vez; el resultado sigue el orden de entrada.
+
+        El LRU se consulta con una sola adquisición del candado, el disco en
+        una transacción y Redis con un único ``MGET``.
+        """
 
-    def set(self, identifier: str, payload: dict) -> None:
-        key = self._make_key(identifier)
+        keys = [self._make_key(identifier) for identifier in identifiers]
+        found: dict[str, PackedVector] = {}
         with self._lock:
-            self._storage[key] = dict(payload)
-            self._storage.move_to_end(key)
-            while len(self._storage) > self.max_size:
-                self._storage.popitem(last=False)
+            for key in keys:
+                packed = self._storage.get(key)
+                if packed is not None:
+                    self._storage.move_to_end(key)
+                    found[key] = packed
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            from_disk = self._disk_get_many(missing)
+            found.update(from_disk)
+            missing = [key for key in missing if key not in from_disk]
+            from_redis = self._redis_get_many(missing)
+            found.update(from_redis)
+            self._remember_many({**from_disk, **from_redis})
+            self._disk_set_many(from_redis)
+        return [found.get(key) for key in keys]
+
+    def set(self, identifier: str, packed: PackedVector) -> None:
+        self.set_many([(identifier, packed)])
+
+    def set_many(self, items: Iterable[tuple[str, PackedVector]]) -> None:
+        """Escribe varios vectores en todos los niveles (``SET`` en pipeline para Redis)."""
+
+        entries = {self._make_key(identifier): packed for identifier, packed in items}
+        if not entries:
+            return
+        self._remember_many(entries)
+        self._disk_set_many(entries)
         if self._redis is not None:
             try:  # pragma: no branch - se intenta escribir y se ignoran errores
-                self._redis.set(key, json.dumps(payload))
+                pipeline = self._redis.pipeline(transaction=False)
+                for key, packed in entries.items():
+                    pipeline.set(key, packed.to_bytes())
+                pipeline.execute()
             except Exception:
                 pass
 
+    def memory_report(self) -> dict[str, int]:
+        """Resumen del uso de memoria de las entradas en proceso."""
+
+        with self._lock:
+            entries = list(self._storage.values())
+        payload = sum(len(packed.data) for packed in entries)
+        return {
+            "entries": len(entries),
+            "payload_bytes": payload,
+            "approx_resident_bytes": sum(
+                sys.getsizeof(packed) + sys.getsizeof(packed.data) for packed in entries
+            ),
+        }
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def _disk_get_many(self, keys: Sequence[str]) -> dict[str, PackedVector]:
+        if self._disk is None or not keys:
+            return {}
+        try:
+            return self._disk.get_many(keys)
+        except sqlite3.Error as exc:
+            LOGGER.warning("Lectura fallida en el caché de embeddings en disco: %s", exc)
+            return {}
+
+    def _disk_set_many(self, entries: dict[str, PackedVector]) -> None:
+        if self._disk is None or not entries:
+            return
+        try:
+            self._disk.set_many(entries.items())
+        except sqlite3.Error as exc:
+            LOGGER.warning("Escritura fallida en el caché de embeddings en disco: %s", exc)
+
+    def _redis_get_many(self, keys: Sequence[str]) -> dict[str, PackedVector]:
+        if self._redis is None or not keys:
+            return {}
+        try:
+            raw_values = self._redis.mget(keys)
+        except Exception:
+            return {}
+        found: dict[str, PackedVector] = {}
+        for key, raw in zip(keys, raw_values, strict=False):
+            packed = PackedVector.from_bytes(raw) if raw is not None else None
+            if packed is not None:
+                found[key] = packed
+        return found
+
+    def _remember_many(self, entries: dict[str, PackedVector]) -> None:
+        if not entries:
+            return
+        with self._lock:
+            for key, packed in entries.items():
+                self._storage[key] = packed
+                self._storage.move_to_end(key)
+            while len(self._storage) > self.max_size:
+                self._storage.popitem(last=False)
+
 
 # ---------------------------------------------------------------------------
 # Sistema de embeddings multi-modelo
@@ -180,10 +526,12 @@ class EmbeddingSystem:
                 EmbeddingModelConfig(name="gemma2:2b", dimension=384, precision="fp16"),
             )
         self.configs = list(configs)
+        self._owns_cache = cache is None
         self.cache = cache or HybridEmbeddingCache()
         self.factories = factories or {}
         self.default_strategy = default_strategy
         self._embedders: dict[str, SupportsEmbedding] = {}
+        self._flights: SingleFlight[str, list[float]] = SingleFlight()
 
     # ------------------------------------------------------------------
     def embed(
@@ -203,13 +551,15 @@ class EmbeddingSystem:
 
         aggregate: list[list[float] | None] = [None] * len(normalized_texts)
         metrics: list[EmbeddingRunMetrics] = []
+        # Una sola huella por texto, reutilizada por cada modelo y precisión.
+        digests = [text_key(text) for text in normalized_texts]
 
         for index, config in enumerate(selected):
             embedder = self._get_embedder(config)
             run_precision = precision or config.precision
             start = time.perf_counter()
             vectors, hits, misses = self._embed_with_cache(
-                normalized_texts, embedder, config, run_precision
+                normalized_texts, embedder, config, run_precision, digests=digests
             )
             elapsed = (time.perf_counter() - start) * 1000.0
             metrics.append(
@@ -224,11 +574,28 @@ class EmbeddingSystem:
             )
             aggregate = self._merge_vectors(aggregate, vectors, strategy, index)
 
-        final_vectors = [self._normalize_vector(vector) for vector in aggregate if vector is not None]
+        final_vectors = vector_math.l2_normalize_many([vector for vector in aggregate if vector is not None])
         if return_metrics:
             return final_vectors, metrics
         return final_vectors
 
+    @property
+    def fallback_batches(self) -> int:
+        """Lotes que los embedders resolvieron con su fallback por un fallo remoto."""
+
+        return sum(getattr(embedder, "fallback_batches", 0) for embedder in list(self._embedders.values()))
+
+    def close(self) -> None:
+        """Cierra los embedders creados por el sistema y su caché propio."""
+
+        embedders, self._embedders = list(self._embedders.values()), {}
+        for embedder in embedders:
+            close = getattr(embedder, "close", None)
+            if close is not None:
+                close()
+        if self._owns_cache:
+            self.cache.close()
+
     # ------------------------------------------------------------------
     def quality_report(self, vectors: Sequence[Sequence[float]]) -> EmbeddingQuality:
         """Calcula métricas agregadas de calidad para un lote de embeddings."""
@@ -267,31 +634,49 @@ class EmbeddingSystem:
         embedder: SupportsEmbedding,
         config: EmbeddingModelConfig,
         precision: str,
+        *,
+        digests: Sequence[str] | None = None,
     ) -> tuple[list[list[float]], int, int]:
         hits = 0
         misses = 0
         vectors: list[list[float]] = []
-        to_query: list[tuple[int, str]] = []
+        missing: dict[str, list[int]] = {}
 
-        for index, text in enumerate(texts):
-            key = self._cache_key(text, config, precision)
-            cached = self.cache.get(key)
+        if digests is None:
+            digests = [text_key(text) for text in texts]
+        keys = [self._digest_key(digest, config, precision) for digest in digests]
+        for index, (key, cached) in enumerate(zip(keys, self.cache.get_many(keys), strict=True)):
             if cached is not None:
-                vector = self._dequantize(cached["vector"], cached.get("precision", precision))
-                vectors.append(vector)
+                vectors.append(self._dequantize(cached))
                 hits += 1
             else:
                 vectors.append([])
-                to_query.append((index, text))
+                missing.setdefault(key, []).append(index)
                 misses += 1
 
-        if to_query:
-            fresh_vectors = embedder.embed([text for _, text in to_query])
-            for (position, text), vector in zip(to_query, fresh_vectors, strict=False):
-                quantized = self._quantize(vector, precision)
-                key = self._cache_key(text, config, precision)
-                self.cache.set(key, {"precision": precision, "vector": quantized})
-                vectors[position] = list(vector)
+        if missing:
+            # Solo se calcula cada clave una vez: los duplicados del lote se
+            # agrupan y las claves que ya calcula otro hilo se esperan.
+            leading, following = self._flights.claim(missing)
+            computed: dict[str, list[float]] = {}
+            try:
+                if leading:
+                    fallbacks = getattr(embedder, "fallback_batches", 0)
+                    fresh_vectors = embedder.embed([texts[missing[key][0]] for key in leading])
+                    computed.update(zip(leading, (list(vector) for vector in fresh_vectors), strict=True))
+                    # Los vectores de fallback (fallo remoto) no se cachean: al
+                    # recuperarse el modelo se recalculan en su propio espacio.
+                    if getattr(embedder, "fallback_batches", 0) == fallbacks:
+                        self.cache.set_many((key, self._quantize(computed[key], precision)) for key in leading)
+            except BaseException as exc:
+                self._flights.abandon(leading, exc)
+                raise
+            self._flights.publish(computed)
+            for key, flight in following.items():
+                computed[key] = flight.wait()
+            for key, positions in missing.items():
+                for position in positions:
+                    vectors[position] = list(computed[key])
 
         return vectors, hits, misses
 
@@ -325,56 +710,28 @@ class EmbeddingSystem:
                 aggregate[index] = list(vector)
         return aggregate
 
-    def _normalize_vector(self, vector: Sequence[float]) -> list[float]:
-        norm = math.sqrt(sum(component * component for component in vector))
-        if norm == 0:
-            return [0.0 for _ in vector]
-        return [component / norm for component in vector]
-
     def _cache_key(self, text: str, config: EmbeddingModelConfig, precision: str) -> str:
-        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return self._digest_key(text_key(text), config, precision)
+
+    @staticmethod
+    def _digest_key(digest: str, config: EmbeddingModelConfig, precision: str) -> str:
         return f"{config.name}:{config.dimension}:{precision}:{digest}"
 
-    def _quantize(self, vector: Sequence[float], precision: str) -> list[float] | list[int]:
-        if precision.lower() == "fp16":
-            return [float(f"{component:.4f}") for component in vector]
-        if precision.lower() == "int8":
-            scale = 127.0
-            return [int(max(-127, min(127, round(component * scale)))) for component in vector]
-        return [float(component) for component in vector]
-
-    def _dequantize(self, data: Sequence[float | int], precision: str) -> list[float]:
-        if precision.lower() == "fp16":
-            return [float(component) for component in data]
-        if precision.lower() == "int8":
-            scale = 127.0
-            return [float(component) / scale for component in data]
-        return [float(component) for component in data]
+    def _quantize(self, vector: Sequence[float], precision: str) -> PackedVector:
+        return PackedVector.encode(vector, precision)
 
-    def _average_pairwise_cosine(self, vectors: Sequence[Sequence[float]]) -> float:
-        if len(vectors) < 2:
-            return 1.0
-        total = 0.0
-        count = 0
-        for i in range(len(vectors)):
-            for j in range(i + 1, len(vectors)):
-                total += self._cosine(vectors[i], vectors[j])
-                count += 1
-        return total / count if count else 0.0
-
-    def _cosine(self, left: Sequence[float], right: Sequence[float]) -> float:
-        numerator = sum(a * b for a, b in zip(left, right, strict=False))
-        norm_left = math.sqrt(sum(a * a for a in left))
-        norm_right = math.sqrt(sum(b * b for b in right))
-        if norm_left == 0 or norm_right == 0:
-            return 0.0
-        return numerator / (norm_left * norm_right)
+    def _dequantize(self, packed: PackedVector) -> list[float]:
+        return packed.decode()
 
+    def _average_pairwise_cosine(self, vectors: Sequence[Sequence[float]]) -> float:
+        return vector_math.average_pairwise_cosine(vectors)
 
 __all__ = [
+    "PackedVector",
     "EmbeddingModelConfig",
     "EmbeddingRunMetrics",
     "EmbeddingQuality",
+    "DiskEmbeddingCache",
     "HybridEmbeddingCache",
     "EmbeddingSystem",
 ]
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
+import inspect
 import pathlib
 import time
 from dataclasses import dataclass
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Iterator, Optional
 
 import textwrap
 
@@ -119,9 +121,12 @@ class DungeonLifeAgent:
         dataset_agent: DatasetAnalysisAgent | None = None,
         templates: CollaborationTemplates | None = None,
         language_model: LanguageModelClient | None = None,
+        watch_documentation: bool = False,
     ) -> None:
         self.config = configuration or load_config(config_path)
         self.knowledge = knowledge_index or DocumentationIndex(documentation_path)
+        if watch_documentation and hasattr(self.knowledge, "start_watching"):
+            self.knowledge.start_watching()
         self.mode_manager = mode_manager or ModeManager.from_config(self.config)
         self.tools = tool_integration or ToolIntegration()
         self.metrics = metrics or MetricsRegistry()
@@ -148,6 +153,29 @@ class DungeonLifeAgent:
             trace=trace,
         )
 
+    async def aquery(
+        self, message: str, *, mode: str = "consultor", role: Optional[str] = None, limit: int = 3
+    ) -> AgentResponse:
+        """Versión asíncrona de :meth:`query` para servidores con ``asyncio``."""
+
+        self.mode_manager.ensure(mode, "query")
+        role_profile = self.config.get_role(role)
+        start = time.perf_counter()
+        asearch = getattr(self.knowledge, "asearch", None)
+        if asearch is not None:
+            results = await asearch(message, limit=limit)
+        else:
+            results = await asyncio.to_thread(self.knowledge.search, message, limit=limit)
+        self.metrics.record_search(mode, time.perf_counter() - start, len(results))
+        trace = self.knowledge.last_search_trace()
+        return self._build_response(
+            mode=mode,
+            role=role_profile,
+            query=message,
+            results=results,
+            trace=trace,
+        )
+
     def list_documents(self, *, mode: str = "consultor") -> list[str]:
         self.mode_manager.ensure(mode, "list_documents")
         return [str(path) for path in self.knowledge.list_documents()]
@@ -193,6 +221,14 @@ class DungeonLifeAgent:
         self.mode_manager.ensure(mode, "refresh_index")
         self.knowledge.refresh(paths)
 
+    def close(self) -> None:
+        """Libera recursos de fondo: el observador de documentación y los hilos de embeddings."""
+
+        if hasattr(self.knowledge, "close"):
+            self.knowledge.close()
+        elif hasattr(self.knowledge, "stop_watching"):
+            self.knowledge.stop_watching()
+
     def get_metrics_report(self) -> str:
         return self.metrics.format_report()
 
@@ -268,11 +304,56 @@ class DungeonLifeAgent:
         self.mode_manager.ensure(mode, "record_productivity")
         self.metrics.record_productivity(role=role, tasks_completed=tasks_completed, minutes=session_minutes)
 
-    def generate_with_model(self, prompt: str, *, mode: str = "colaborador", **kwargs) -> str:
+    def generate_with_model(
+        self,
+        prompt: str,
+        *,
+        mode: str = "colaborador",
+        on_chunk: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ) -> str:
+        """Genera texto con el modelo configurado.
+
+        Con ``on_chunk`` la respuesta se pide en streaming y cada fragmento se
+        entrega al callback en cuanto llega; el valor devuelto es el texto
+        completo en ambos casos.
+        """
+
+        if on_chunk is None:
+            self.mode_manager.ensure(mode, "invoke_llm")
+            return self._require_language_model().generate(prompt, **kwargs)
+        pieces: list[str] = []
+        for piece in self.stream_with_model(prompt, mode=mode, **kwargs):
+            pieces.append(piece)
+            on_chunk(piece)
+        return "".join(pieces)
+
+    def stream_with_model(self, prompt: str, *, mode: str = "colaborador", **kwargs) -> Iterator[str]:
+        """Itera los fragmentos de la respuesta del modelo según se generan.
+
+        Los clientes sin ``generate_stream`` producen un único fragmento.
+        """
+
         self.mode_manager.ensure(mode, "invoke_llm")
+        language_model = self._require_language_model()
+        stream = getattr(language_model, "generate_stream", None)
+        if stream is None:
+            return iter((language_model.generate(prompt, **kwargs),))
+        return iter(stream(prompt, **kwargs))
+
+    def _require_language_model(self) -> LanguageModelClient:
         if self.language_model is None:
             raise RuntimeError("No hay cliente de modelo configurado. Inicializa DungeonLifeAgent con language_model.")
-        return self.language_model.generate(prompt, **kwargs)
+        return self.language_model
+
+    async def agenerate_with_model(self, prompt: str, *, mode: str = "colaborador", **kwargs) -> str:
+        """Como :meth:`generate_with_model`; espera directamente a clientes asíncronos."""
+
+        self.mode_manager.ensure(mode, "invoke_llm")
+        language_model = self._require_language_model()
+        if inspect.iscoroutinefunction(language_model.generate):
+            return await language_model.generate(prompt, **kwargs)
+        return await asyncio.to_thread(language_model.generate, prompt, **kwargs)
 
     def get_agent_info_display(self) -> str:
         """Genera información formateada sobre el agente para mostrar en CLI o GUI."""
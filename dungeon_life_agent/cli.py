@@ -10,6 +10,7 @@ from typing import Optional
 from .agent import DungeonLifeAgent
 from .banner import print_welcome
 from .interactive import run_interactive
+from .memory import migrate_json_to_sqlite
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -29,6 +30,12 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--limit", type=int, default=5, help="Número máximo de resultados o sugerencias")
     parser.add_argument("--refresh-index", action="store_true", help="Reconstruye el índice de documentación")
     parser.add_argument("--metrics", action="store_true", help="Muestra métricas acumuladas del agente")
+    parser.add_argument(
+        "--migrate-memory",
+        nargs=2,
+        metavar=("ORIGEN_JSON", "DESTINO_SQLITE"),
+        help="Copia la memoria colectiva JSON a una base SQLite y termina",
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -45,6 +52,12 @@ def main(argv: Optional[list[str]] = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
 
+    if args.migrate_memory:
+        source, destination = args.migrate_memory
+        migrated = migrate_json_to_sqlite(source, destination)
+        print(f"{migrated} registros migrados a {destination}.")
+        return 0
+
     # Si no hay argumentos, iniciar modo interactivo como python run_agent.py
     if argv is None and not args.message and not any([
         args.list_docs,
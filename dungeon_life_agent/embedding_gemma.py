@@ -8,14 +8,30 @@ punto, tal y como requiere la capa semántica del buscador."""
 
 from __future__ import annotations
 
+import asyncio
 import functools
 import hashlib
-import math
+import logging
 import threading
 from collections import OrderedDict
 from dataclasses import dataclass
+from operator import add
 from typing import Iterable, Protocol, Sequence
 
+from . import vector_math
+from .embedding_scheduler import EmbeddingBatcher
+from .single_flight import SingleFlight
+from .vector_store import text_key
+
+try:  # Dependencia opcional: construye los embeddings de fallback por lotes
+    import numpy as np
+except Exception:  # pragma: no cover - NumPy no disponible
+    np = None  # type: ignore[assignment]
+
+LOGGER = logging.getLogger(__name__)
+
+_BYTE_VALUES = tuple((byte / 255.0) * 2.0 - 1.0 for byte in range(256))
+
 
 class _SupportsEmbed(Protocol):
     """Protocolo mínimo compatible con el cliente oficial de Ollama."""
@@ -24,6 +40,13 @@ class _SupportsEmbed(Protocol):
         ...
 
 
+class _SupportsAsyncEmbed(Protocol):
+    """Variante asíncrona, p. ej. ``AsyncOllamaClient``."""
+
+    async def embed(self, *, model: str, input: Sequence[str]) -> dict:
+        ...
+
+
 @dataclass(frozen=True)
 class EmbeddingRequest:
     """Representa una solicitud de embedding, utilizada para caché LRU."""
@@ -61,7 +84,12 @@ class EmbeddingGemma:
     El adaptador intenta usar automáticamente un cliente compatible con
     Ollama si está disponible. En caso contrario, se recurre a un modo de
     fallback determinista basado en hashing, suficiente para pruebas y para
-    garantizar que la canalización de búsqueda siga funcionando."""
+    garantizar que la canalización de búsqueda siga funcionando.
+
+    Si hay cliente pero la llamada remota falla, el lote se resuelve con el
+    fallback, no se guarda en el caché y se incrementa ``fallback_batches``:
+    quien persista vectores puede comparar el contador antes y después de
+    ``embed`` para no guardar vectores de otro espacio."""
 
     def __init__(
         self,
@@ -70,11 +98,30 @@ class EmbeddingGemma:
         client: _SupportsEmbed | None = None,
         cache_size: int = 2048,
         dimension: int = 384,
+        max_batch_size: int = 64,
+        max_batch_wait_ms: float = 0.0,
+        async_client: _SupportsAsyncEmbed | None = None,
     ) -> None:
         self.model = model
         self.dimension = dimension
         self._client = client or self._autodetect_client()
+        self._async_client = async_client
+        # Las peticiones remotas de todos los hilos se agrupan en lotes acotados.
+        self._batcher = EmbeddingBatcher(
+            self._embed_remote_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_batch_wait_ms,
+            name=f"embeddings-{model}",
+        )
         self._cache = _LRUCache(max_size=cache_size)
+        self._flights: SingleFlight[EmbeddingRequest, list[float]] = SingleFlight()
+        self.fallback_batches = 0
+        self._fallback_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Detiene el despachador de lotes remotos; después ``embed`` lanza ``RuntimeError``."""
+
+        self._batcher.close()
 
     # ------------------------------------------------------------------
     def embed(self, texts: Iterable[str]) -> list[list[float]]:
@@ -85,65 +132,151 @@ class EmbeddingGemma:
             return []
 
         results: list[list[float]] = []
-        missing: list[tuple[int, str]] = []
+        # Posiciones pendientes agrupadas por clave: los textos repetidos del
+        # lote se calculan una sola vez.
+        missing: dict[EmbeddingRequest, list[int]] = {}
+        texts_by_key: dict[EmbeddingRequest, str] = {}
 
         for index, text in enumerate(normalized_texts):
-            key = EmbeddingRequest(_hash_text(text), self.dimension)
+            key = EmbeddingRequest(text_key(text), self.dimension)
             cached = self._cache.get(key)
             if cached is not None:
                 results.append(cached)
             else:
                 results.append([])  # placeholder
-                missing.append((index, text))
+                missing.setdefault(key, []).append(index)
+                texts_by_key[key] = text
 
         if missing:
-            if self._client is not None:
-                try:
-                    remote_vectors = self._request_remote_embeddings([text for _, text in missing])
-                except Exception:
-                    remote_vectors = None
-            else:
-                remote_vectors = None
+            leading, following = self._flights.claim(missing)
+            computed: dict[EmbeddingRequest, list[float]] = {}
+            try:
+                # Otro hilo pudo terminar entre la consulta al caché y el reclamo.
+                pending = []
+                for key in leading:
+                    cached = self._cache.get(key)
+                    if cached is not None:
+                        computed[key] = cached
+                    else:
+                        pending.append(key)
+                if pending:
+                    vectors, degraded = self._compute([texts_by_key[key] for key in pending])
+                    computed.update(zip(pending, vectors, strict=True))
+                    if not degraded:
+                        for key in pending:
+                            self._cache.put(key, computed[key])
+            except BaseException as exc:
+                self._flights.abandon(leading, exc)
+                raise
+            self._flights.publish(computed)
+            for key, flight in following.items():
+                computed[key] = flight.wait()
+            for key, positions in missing.items():
+                for index in positions:
+                    results[index] = list(computed[key])
 
-            if remote_vectors is None:
-                remote_vectors = [self._fallback_embedding(text) for _, text in missing]
+        return [vector if vector else self._fallback_embedding("") for vector in results]
+
+    async def aembed(self, texts: Iterable[str]) -> list[list[float]]:
+        """Versión asíncrona de :meth:`embed`.
+
+        Con ``async_client`` los fallos de caché se piden en lotes de
+        ``max_batch_size`` lanzados a la vez sobre su pool de conexiones; sin
+        él se delega en :meth:`embed` en un hilo aparte.
+        """
 
-            for (index, text), vector in zip(missing, remote_vectors, strict=False):
-                normalized = _l2_normalize(vector)
-                key = EmbeddingRequest(_hash_text(text), self.dimension)
-                self._cache.put(key, normalized)
-                results[index] = normalized
+        normalized_texts = [text.strip() if text else "" for text in texts]
+        if self._async_client is None:
+            return await asyncio.to_thread(self.embed, normalized_texts)
+        if not normalized_texts:
+            return []
 
+        keys = [EmbeddingRequest(text_key(text), self.dimension) for text in normalized_texts]
+        results: list[list[float] | None] = [self._cache.get(key) for key in keys]
+        missing: dict[EmbeddingRequest, str] = {}
+        for key, text, cached in zip(keys, normalized_texts, results, strict=True):
+            if cached is None:
+                missing[key] = text
+        if missing:
+            pending = list(missing)
+            size = self._batcher.max_batch_size
+            batches = [pending[start : start + size] for start in range(0, len(pending), size)]
+            computed = await asyncio.gather(*(self._acompute([missing[key] for key in batch]) for batch in batches))
+            fresh: dict[EmbeddingRequest, list[float]] = {}
+            for batch, (vectors, degraded) in zip(batches, computed, strict=True):
+                for key, vector in zip(batch, vectors, strict=True):
+                    if not degraded:
+                        self._cache.put(key, vector)
+                    fresh[key] = vector
+            results = [cached if cached is not None else list(fresh[key]) for key, cached in zip(keys, results, strict=True)]
         return [vector if vector else self._fallback_embedding("") for vector in results]
 
+    async def _acompute(self, texts: Sequence[str]) -> tuple[list[list[float]], bool]:
+        """Vectores del lote y si hubo que recurrir al fallback por un fallo remoto."""
+
+        assert self._async_client is not None
+        try:
+            response = await self._async_client.embed(model=self.model, input=list(texts))
+            remote_vectors: list[list[float]] | None = _parse_embeddings(response)
+        except Exception as exc:
+            LOGGER.warning("Embeddings remotos de %s no disponibles (%s); se usa el fallback", self.model, exc)
+            remote_vectors = None
+        if remote_vectors is None or len(remote_vectors) != len(texts):
+            return self._degraded(texts), True
+        return vector_math.l2_normalize_many(remote_vectors), False
+
+    def _compute(self, texts: Sequence[str]) -> tuple[list[list[float]], bool]:
+        """Vectores del lote y si hubo que recurrir al fallback por un fallo remoto."""
+
+        if self._client is None:
+            return vector_math.l2_normalize_many(self._fallback_embeddings(texts)), False
+        try:
+            remote_vectors = self._request_remote_embeddings(texts)
+        except Exception as exc:
+            if self._batcher.closed:
+                raise
+            LOGGER.warning("Embeddings remotos de %s no disponibles (%s); se usa el fallback", self.model, exc)
+            remote_vectors = None
+        if remote_vectors is None or len(remote_vectors) != len(texts):
+            return self._degraded(texts), True
+        return vector_math.l2_normalize_many(remote_vectors), False
+
+    def _degraded(self, texts: Sequence[str]) -> list[list[float]]:
+        with self._fallback_lock:
+            self.fallback_batches += 1
+        return vector_math.l2_normalize_many(self._fallback_embeddings(texts))
+
     # ------------------------------------------------------------------
     def _request_remote_embeddings(self, texts: Sequence[str]) -> list[list[float]] | None:
         if self._client is None:
             return None
-        response = self._client.embed(model=self.model, input=list(texts))
-        vectors = response.get("embeddings") or response.get("data")
-        if not vectors:
-            return None
-        processed: list[list[float]] = []
-        for vector in vectors:
-            if isinstance(vector, dict) and "embedding" in vector:
-                vector = vector["embedding"]
-            processed.append(list(vector))
-        return processed
+        return self._batcher.submit(texts)
+
+    def _embed_remote_batch(self, texts: Sequence[str]) -> list[list[float]]:
+        assert self._client is not None
+        return _parse_embeddings(self._client.embed(model=self.model, input=list(texts)))
 
     def _fallback_embedding(self, text: str) -> list[float]:
-        tokens = _tokenize_for_fallback(text)
-        if not tokens:
-            return _unit_vector(self.dimension)
+        return self._fallback_embeddings([text])[0]
 
-        vector = [0.0] * self.dimension
-        for token in tokens:
-            digest = hashlib.sha256(token.encode("utf-8")).digest()
-            for index in range(self.dimension):
-                byte = digest[index % len(digest)]
-                vector[index] += (byte / 255.0) * 2.0 - 1.0
+    def _fallback_embeddings(self, texts: Sequence[str]) -> list[list[float]]:
+        """Embeddings deterministas por hashing de tokens.
+
+        Cada token aporta el patrón de bytes de su SHA-256 repetido hasta
+        ``dimension`` y mapeado a [-1, 1]. Los patrones se cachean por token
+        y las sumas se hacen en el mismo orden que el bucle original, así que
+        el resultado es idéntico bit a bit con o sin NumPy.
+        """
 
-        return _l2_normalize(vector)
+        token_lists = [_tokenize_for_fallback(text) for text in texts]
+        if np is not None and any(token_lists):
+            sums = _sum_patterns_numpy(token_lists, self.dimension)
+        else:
+            sums = [_sum_patterns(tokens, self.dimension) for tokens in token_lists]
+        return [
+            _l2_normalize(vector) if vector is not None else _unit_vector(self.dimension)
+            for vector in sums
+        ]
 
     @staticmethod
     @functools.lru_cache(maxsize=1)
@@ -156,15 +289,22 @@ class EmbeddingGemma:
 
 
 # ----------------------------------------------------------------------
-def _hash_text(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+def _parse_embeddings(response: dict) -> list[list[float]]:
+    """Extrae los vectores de una respuesta de ``/api/embed`` (o del módulo ``ollama``)."""
+
+    vectors = response.get("embeddings") or response.get("data")
+    if not vectors:
+        raise ValueError("Respuesta de embeddings vacía")
+    processed: list[list[float]] = []
+    for vector in vectors:
+        if isinstance(vector, dict) and "embedding" in vector:
+            vector = vector["embedding"]
+        processed.append(list(vector))
+    return processed
 
 
 def _l2_normalize(vector: Sequence[float]) -> list[float]:
-    norm = math.sqrt(sum(component * component for component in vector))
-    if norm == 0:
-        return [0.0] * len(vector)
-    return [component / norm for component in vector]
+    return vector_math.l2_normalize(vector)
 
 
 def _unit_vector(dimension: int) -> list[float]:
@@ -173,6 +313,59 @@ def _unit_vector(dimension: int) -> list[float]:
     return [1.0] + [0.0] * (dimension - 1)
 
 
+@functools.lru_cache(maxsize=65536)
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+@functools.lru_cache(maxsize=1024)
+def _token_pattern(token: str, dimension: int) -> tuple[float, ...]:
+    """Contribución de un token: bytes del digest repetidos hasta ``dimension``.
+
+    Cada patrón ocupa ~8 bytes por componente (3 KB con 384), así que solo se
+    guardan los tokens más frecuentes (~3 MB); el resto se expande desde el
+    digest, que sí se cachea ampliamente por ocupar 32 bytes.
+    """
+
+    digest = _token_digest(token)
+    repeats, remainder = divmod(dimension, len(digest))
+    return tuple(_BYTE_VALUES[byte] for byte in digest * repeats + digest[:remainder])
+
+
+def _sum_patterns(tokens: Sequence[str], dimension: int) -> list[float] | None:
+    if not tokens:
+        return None
+    vector = [0.0] * dimension
+    for token in tokens:
+        vector = list(map(add, vector, _token_pattern(token, dimension)))
+    return vector
+
+
+def _sum_patterns_numpy(token_lists: Sequence[Sequence[str]], dimension: int) -> list[list[float] | None]:
+    """Suma por lotes: una matriz de patrones para todo el vocabulario de la llamada.
+
+    ``np.add.accumulate`` suma fila a fila en orden, igual que el bucle en
+    Python puro (a diferencia de ``sum``, que usa suma por pares).
+    """
+
+    vocabulary: dict[str, int] = {}
+    for tokens in token_lists:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+    digests = np.frombuffer(b"".join(map(_token_digest, vocabulary)), dtype=np.uint8).reshape(len(vocabulary), -1)
+    repeats = -(-dimension // digests.shape[1])
+    patterns = (np.tile(digests, (1, repeats))[:, :dimension] / 255.0) * 2.0 - 1.0
+
+    sums: list[list[float] | None] = []
+    for tokens in token_lists:
+        if not tokens:
+            sums.append(None)
+            continue
+        rows = patterns[[vocabulary[token] for token in tokens]]
+        sums.append(np.add.accumulate(rows, axis=0)[-1].tolist())
+    return sums
+
+
 def _tokenize_for_fallback(text: str) -> list[str]:
     tokens = []
     current = []
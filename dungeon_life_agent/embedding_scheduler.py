@@ -0,0 +1,162 @@
+"""Planificador de micro-lotes para backends de embeddings remotos.
+
+Varios hilos que piden embeddings a la vez (la GUI, un refresco en segundo
+plano, varios workers) comparten un único hilo despachador. Este agrupa las
+peticiones pendientes en lotes de hasta ``max_batch_size`` textos, espera
+como mucho ``max_wait_ms`` a que lleguen más y devuelve a cada llamador solo
+sus vectores. Las peticiones mayores que un lote se trocean antes de
+encolarse, de modo que ningún envío al backend supera el límite. Tras
+``idle_timeout`` segundos sin trabajo el despachador termina (y suelta su
+referencia al backend); la siguiente petición lo vuelve a arrancar.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+BatchFunction = Callable[[Sequence[str]], Sequence[Sequence[float]]]
+
+
+class _Request:
+    __slots__ = ("vectors", "pending", "error", "done")
+
+    def __init__(self, size: int, parts: int) -> None:
+        self.vectors: list[list[float]] = [[] for _ in range(size)]
+        self.pending = parts
+        self.error: BaseException | None = None
+        self.done = threading.Event()
+
+
+class EmbeddingBatcher:
+    """Agrupa peticiones concurrentes de embeddings en lotes acotados."""
+
+    def __init__(
+        self,
+        embed_batch: BatchFunction,
+        *,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 0.0,
+        idle_timeout: float = 5.0,
+        name: str = "embedding-batcher",
+    ) -> None:
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.idle_timeout = max(0.0, idle_timeout)
+        self.name = name
+        self.batches_sent = 0
+        self._queue: deque[tuple[_Request, int, list[str]]] = deque()
+        self._queued_texts = 0
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    # ------------------------------------------------------------------
+    def submit(self, texts: Sequence[str]) -> list[list[float]]:
+        """Encola ``texts`` y bloquea hasta recibir sus vectores, en el mismo orden."""
+
+        texts = list(texts)
+        if not texts:
+            return []
+        size = self.max_batch_size
+        parts = [(offset, texts[offset : offset + size]) for offset in range(0, len(texts), size)]
+        request = _Request(len(texts), len(parts))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("El planificador de embeddings está cerrado")
+            self._ensure_worker()
+            for offset, chunk in parts:
+                self._queue.append((request, offset, chunk))
+                self._queued_texts += len(chunk)
+            self._condition.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def close(self) -> None:
+        """Detiene el despachador tras vaciar la cola."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    # ------------------------------------------------------------------
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._dispatch(batch)
+
+    def _next_batch(self) -> list[tuple[_Request, int, list[str]]] | None:
+        with self._condition:
+            while not self._queue:
+                if self._closed:
+                    return None
+                if not self._condition.wait(self.idle_timeout) and not self._queue and not self._closed:
+                    # Inactivo: se libera el hilo bajo el mismo cerrojo que usa ``submit``.
+                    self._thread = None
+                    return None
+            # Se espera a que el lote se llene o venza el plazo, lo primero que ocurra.
+            deadline = time.monotonic() + self.max_wait
+            while self._queued_texts < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch: list[tuple[_Request, int, list[str]]] = []
+            total = 0
+            while self._queue and total + len(self._queue[0][2]) <= self.max_batch_size:
+                part = self._queue.popleft()
+                batch.append(part)
+                total += len(part[2])
+            self._queued_texts -= total
+            return batch
+
+    def _dispatch(self, batch: list[tuple[_Request, int, list[str]]]) -> None:
+        texts = [text for _, _, chunk in batch for text in chunk]
+        try:
+            vectors = list(self.embed_batch(texts))
+            if len(vectors) != len(texts):
+                raise ValueError(f"El backend devolvió {len(vectors)} vectores para {len(texts)} textos")
+        except BaseException as exc:  # noqa: BLE001 - el error se entrega a cada llamador
+            LOGGER.debug("Lote de embeddings fallido (%d textos): %s", len(texts), exc)
+            for request, _, _ in batch:
+                request.error = exc
+                self._finish_part(request)
+            return
+        self.batches_sent += 1
+        position = 0
+        for request, offset, chunk in batch:
+            for index in range(len(chunk)):
+                request.vectors[offset + index] = list(vectors[position + index])
+            position += len(chunk)
+            self._finish_part(request)
+
+    @staticmethod
+    def _finish_part(request: _Request) -> None:
+        request.pending -= 1
+        if request.pending == 0:
+            request.done.set()
+
+
+__all__ = ["EmbeddingBatcher"]
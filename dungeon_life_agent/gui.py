@@ -173,7 +173,7 @@ if ctk is not None:
             self.geometry("1000x700")
             self.minsize(800, 600)
 
-            self.agent = agent or DungeonLifeAgent()
+            self.agent = agent or DungeonLifeAgent(watch_documentation=True)
             self.greeting = greeting or DEFAULT_GREETING
             self.conversation_history = ConversationHistory()
             self.is_processing = False
@@ -613,15 +613,33 @@ if ctk is not None:
 
         def _process_message_async(self, message: str) -> None:
             """Procesar mensaje de forma asíncrona."""
+            streamed: list[str] = []
+
+            def show_chunk(piece: str) -> None:
+                # El texto del modelo se pinta según llega en lugar de al final.
+                if not streamed:
+                    self._hide_typing_indicator()
+                    timestamp = datetime.datetime.now().strftime("%H:%M")
+                    self._insert_chat_text(f"Willow ({timestamp}): ")
+                streamed.append(piece)
+                self._insert_chat_text(piece)
+                self.update_idletasks()
+
             try:
                 should_continue, response = process_interactive_message(
-                    self.agent, message, show_debug=False
+                    self.agent, message, show_debug=False, on_chunk=show_chunk
                 )
 
                 # Ocultar indicador de escritura
                 self._hide_typing_indicator()
 
-                if response:
+                if streamed:
+                    self._insert_chat_text("\n")
+                    if response == "".join(streamed):
+                        self.conversation_history.add_message("Willow", response)
+                    elif response:
+                        self._append_message("Willow", response)
+                elif response:
                     self._append_message("Willow", response)
 
                 if not should_continue:
@@ -746,6 +764,12 @@ if ctk is not None:
             self._append_message_raw(author, text)
             self.conversation_history.add_message(author, text)
 
+        def _insert_chat_text(self, text: str) -> None:
+            self.chat_display.configure(state="normal")
+            self.chat_display.insert("end", text)
+            self.chat_display.configure(state="disabled")
+            self.chat_display.see("end")
+
         def _show_typing_indicator(self) -> None:
             """Mostrar indicador de que Willow está escribiendo."""
             if self.is_processing:
@@ -836,6 +860,7 @@ if ctk is not None:
                 except Exception:
                     pass
                 self._ollama_status_job_id = None
+            self.agent.close()
             self.destroy()
 
         def export_conversation(self) -> None:
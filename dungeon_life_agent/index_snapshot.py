@@ -0,0 +1,80 @@
+"""Instantánea binaria versionada del índice de documentación.
+
+El formato es deliberadamente simple: una cabecera fija con número mágico,
+versión del formato y el ``MAGIC_NUMBER`` del intérprete (``marshal`` no es
+estable entre versiones de Python), seguida de un payload ``marshal`` con
+tipos primitivos. La lectura se hace sobre un ``mmap`` para evitar copias
+intermedias y la escritura es atómica (archivo temporal + ``os.replace``),
+de modo que un proceso interrumpido nunca deja una instantánea corrupta.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import logging
+import marshal
+import mmap
+import os
+import pathlib
+import struct
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"DLAIDX"
+SNAPSHOT_VERSION = 3
+_HEADER = struct.Struct("<6sH4s")
+
+
+def default_snapshot_path(root: pathlib.Path) -> pathlib.Path:
+    """Ubicación por defecto: archivo oculto junto a la carpeta indexada."""
+
+    return root.with_name(f".{root.name}.dlaidx")
+
+
+def read_snapshot(path: pathlib.Path) -> dict[str, Any] | None:
+    """Carga una instantánea; devuelve ``None`` si falta o es incompatible."""
+
+    try:
+        with path.open("rb") as stream:
+            if os.fstat(stream.fileno()).st_size <= _HEADER.size:
+                return None
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, version, interpreter = _HEADER.unpack_from(mapped)
+                if (
+                    magic != SNAPSHOT_MAGIC
+                    or version != SNAPSHOT_VERSION
+                    or interpreter != importlib.util.MAGIC_NUMBER
+                ):
+                    return None
+                with memoryview(mapped) as view:
+                    payload = marshal.loads(view[_HEADER.size :])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError, TypeError) as exc:
+        LOGGER.warning("Instantánea de índice ilegible en %s: %s", path, exc)
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def write_snapshot(path: pathlib.Path, payload: dict[str, Any]) -> bool:
+    """Escribe la instantánea de forma atómica. Devuelve ``False`` si falla."""
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, importlib.util.MAGIC_NUMBER)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with temporary.open("wb") as stream:
+            stream.write(header)
+            stream.write(marshal.dumps(payload))
+        os.replace(temporary, path)
+    except (OSError, ValueError) as exc:
+        LOGGER.warning("No se pudo guardar la instantánea del índice en %s: %s", path, exc)
+        try:
+            temporary.unlink()
+        except OSError:
+            pass
+        return False
+    return True
+
+
+__all__ = ["SNAPSHOT_VERSION", "default_snapshot_path", "read_snapshot", "write_snapshot"]
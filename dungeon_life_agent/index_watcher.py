@@ -0,0 +1,298 @@
+"""Observador de la carpeta de documentación para mantener el índice caliente.
+
+En Linux se usa ``inotify`` directamente mediante ``ctypes`` (sin
+dependencias externas); en el resto de plataformas, o si inotify no está
+disponible, se recurre a un sondeo periódico de ``mtime`` y tamaño. Los
+eventos se agrupan con una ventana de *debounce* y se aplican mediante
+``DocumentationIndex.refresh_paths``, que publica una nueva generación del
+índice sin bloquear las búsquedas en curso.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import pathlib
+import select
+import struct
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .knowledge import DocumentationIndex
+
+LOGGER = logging.getLogger(__name__)
+
+_WATCHER_BACKENDS = ("auto", "inotify", "polling")
+
+
+class _EventSource(Protocol):
+    """Fuente de cambios: devuelve rutas modificadas y si hace falta reescanear."""
+
+    def wait(self, timeout: float) -> tuple[set[pathlib.Path], bool]:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+# ---------------------------------------------------------------------------
+# inotify (Linux)
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _InotifyEventSource:
+    """Vigila recursivamente ``root`` con inotify."""
+
+    def __init__(self, root: pathlib.Path) -> None:
+        library = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(library, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._directories: dict[int, pathlib.Path] = {}
+        self._watch_tree(root)
+
+    def _watch_tree(self, root: pathlib.Path) -> None:
+        for directory in (root, *(path for path in root.rglob("*") if path.is_dir())):
+            descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if descriptor < 0:
+                code = ctypes.get_errno()
+                if code in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+                raise OSError(code, os.strerror(code), str(directory))
+            self._directories[descriptor] = directory
+
+    def wait(self, timeout: float) -> tuple[set[pathlib.Path], bool]:
+        changed: set[pathlib.Path] = set()
+        rescan = False
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not ready:
+            return changed, rescan
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buffer:
+                break
+            offset = 0
+            while offset < len(buffer):
+                descriptor, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                raw_name = buffer[offset + _EVENT_HEADER.size : offset + _EVENT_HEADER.size + length]
+                offset += _EVENT_HEADER.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & _IN_IGNORED:
+                    self._directories.pop(descriptor, None)
+                    continue
+                directory = self._directories.get(descriptor)
+                if directory is None:
+                    continue
+                if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                    rescan = True
+                    continue
+                name = os.fsdecode(raw_name.rstrip(b"\0"))
+                if not name:
+                    continue
+                path = directory / name
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        self._watch_tree(path)
+                    rescan = True
+                    continue
+                if path.suffix == ".md":
+                    changed.add(path)
+        return changed, rescan
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+# ---------------------------------------------------------------------------
+# Sondeo (fallback portable)
+
+
+class _PollingEventSource:
+    """Compara ``mtime`` y tamaño de los markdown cada ``interval`` segundos."""
+
+    def __init__(self, root: pathlib.Path, interval: float) -> None:
+        self._root = root
+        self._interval = max(0.05, interval)
+        self._state = self._scan()
+        self._next_scan = time.monotonic() + self._interval
+
+    def _scan(self) -> dict[pathlib.Path, tuple[float, int]]:
+        state: dict[pathlib.Path, tuple[float, int]] = {}
+        for path in self._root.rglob("*.md"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            state[path] = (stat.st_mtime, stat.st_size)
+        return state
+
+    def wait(self, timeout: float) -> tuple[set[pathlib.Path], bool]:
+        remaining = self._next_scan - time.monotonic()
+        if remaining > 0:
+            time.sleep(min(timeout, remaining))
+            if time.monotonic() < self._next_scan:
+                return set(), False
+        self._next_scan = time.monotonic() + self._interval
+        current = self._scan()
+        changed = {path for path, signature in current.items() if self._state.get(path) != signature}
+        changed.update(path for path in self._state if path not in current)
+        self._state = current
+        return changed, False
+
+    def close(self) -> None:
+        self._state = {}
+
+
+# ---------------------------------------------------------------------------
+
+
+class DocumentationWatcher:
+    """Hilo de fondo que aplica cambios del sistema de archivos al índice."""
+
+    def __init__(
+        self,
+        index: "DocumentationIndex",
+        *,
+        backend: str = "auto",
+        debounce: float = 0.25,
+        poll_interval: float = 2.0,
+    ) -> None:
+        if backend not in _WATCHER_BACKENDS:
+            raise ValueError(
+                f"Backend de observación desconocido: {backend}. Opciones válidas: {', '.join(_WATCHER_BACKENDS)}"
+            )
+        self.index = index
+        self.debounce = max(0.0, debounce)
+        self.poll_interval = poll_interval
+        self.requested_backend = backend
+        self.backend: str | None = None
+        self.batches_applied = 0
+        self._source: _EventSource | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._source = self._create_source()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(self._source,), name="willow-doc-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Detiene el hilo; la fuente de eventos la cierra el propio hilo al salir.
+
+        Si ``join`` agota el plazo (p. ej. un lote grande en curso), la fuente
+        no se cierra desde aquí: el hilo podría estar leyendo de ese
+        descriptor, que el sistema ya habría podido reutilizar.
+        """
+
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        source, self._source = self._source, None
+        if thread is None:
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            LOGGER.warning("El observador de documentación sigue ocupado; cerrará su fuente al terminar")
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _create_source(self) -> _EventSource:
+        root = self.index.root
+        if self.requested_backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                source = _InotifyEventSource(root)
+                self.backend = "inotify"
+                return source
+            except (OSError, AttributeError) as exc:
+                if self.requested_backend == "inotify":
+                    raise
+                LOGGER.info("inotify no disponible (%s); se usará sondeo periódico", exc)
+        elif self.requested_backend == "inotify":
+            raise OSError(errno.ENOSYS, "inotify solo está disponible en Linux")
+        self.backend = "polling"
+        return _PollingEventSource(root, self.poll_interval)
+
+    def _run(self, source: _EventSource) -> None:
+        try:
+            self._watch(source)
+        finally:
+            source.close()
+
+    def _watch(self, source: _EventSource) -> None:
+        pending: set[pathlib.Path] = set()
+        rescan = False
+        last_event = 0.0
+        tick = min(0.1, self.debounce) if self.debounce > 0 else 0.05
+        while not self._stop.is_set():
+            try:
+                changed, needs_rescan = source.wait(tick)
+            except OSError as exc:
+                LOGGER.warning("Error leyendo eventos de la documentación: %s", exc)
+                self._stop.wait(self.poll_interval)
+                continue
+            if changed or needs_rescan:
+                pending |= changed
+                rescan = rescan or needs_rescan
+                last_event = time.monotonic()
+            if (pending or rescan) and time.monotonic() - last_event >= self.debounce:
+                self._flush(pending, rescan)
+                pending = set()
+                rescan = False
+
+    def _flush(self, pending: set[pathlib.Path], rescan: bool) -> None:
+        try:
+            if rescan:
+                self.index.refresh()
+            else:
+                self.index.refresh_paths(pending)
+            self.batches_applied += 1
+        except Exception:  # pragma: no cover - defensivo en hilo de fondo
+            LOGGER.exception("No se pudieron aplicar los cambios de documentación al índice")
+
+
+__all__ = ["DocumentationWatcher"]
@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 import msvcrt
 import sys
-from typing import Optional
+from typing import Callable, Optional
 
 from .agent import DungeonLifeAgent
 
@@ -29,9 +29,17 @@ HELP_TEXT = """Comandos disponibles:\n" \
 
 
 def process_interactive_message(
-    agent: DungeonLifeAgent, message: str, *, show_debug: bool = False
+    agent: DungeonLifeAgent,
+    message: str,
+    *,
+    show_debug: bool = False,
+    on_chunk: Optional[Callable[[str], None]] = None,
 ) -> tuple[bool, str]:
-    """Procesa un mensaje y devuelve si continuar y la respuesta generada."""
+    """Procesa un mensaje y devuelve si continuar y la respuesta generada.
+
+    ``on_chunk`` recibe en streaming el texto de ``lm generar`` a medida que
+    el modelo lo produce; la respuesta devuelta sigue siendo el texto completo.
+    """
 
     stripped = message.strip()
     if not stripped:
@@ -193,7 +201,7 @@ def process_interactive_message(
         if not prompt:
             return True, "Debes proporcionar un prompt para el modelo de lenguaje."
         try:
-            output = agent.generate_with_model(prompt)
+            output = agent.generate_with_model(prompt, on_chunk=on_chunk)
         except RuntimeError as error:
             return True, str(error)
         return True, output
@@ -239,11 +247,22 @@ def run_interactive(
             print()  # nueva línea
             break
 
+        streamed: list[str] = []
+
+        def print_chunk(piece: str) -> None:
+            streamed.append(piece)
+            print(piece, end="", flush=True)
+
         should_continue, output = process_interactive_message(
-            agent, message, show_debug=show_debug
+            agent, message, show_debug=show_debug, on_chunk=print_chunk
         )
 
-        if output:
+        if streamed:
+            print()
+            if output != "".join(streamed):  # p. ej. un error a mitad del stream
+                print(output)
+            print()
+        elif output:
             print(output)
             print()
 
@@ -2,23 +2,67 @@
 
 from __future__ import annotations
 
+import asyncio
+import heapq
+import logging
 import math
+import os
 import pathlib
 import re
+import threading
+from array import array
+from bisect import bisect_left
 from collections import Counter
-from dataclasses import dataclass
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from operator import itemgetter
 from typing import Iterable, Sequence
 
 from .embedding_gemma import EmbeddingGemma
+from .index_snapshot import default_snapshot_path, read_snapshot, write_snapshot
+from .index_watcher import DocumentationWatcher
 from .search_pipeline import (
     HybridSearchPipeline,
     PipelineSelection,
     PipelineTrace,
     SearchPipelineConfig,
 )
+from .vector_store import VectorStore, default_vector_store_path, text_key
 
+LOGGER = logging.getLogger(__name__)
 
 _TOKEN_RE = re.compile(r"[\wáéíóúñü]+", re.IGNORECASE)
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+_WAND_TOLERANCE = 1e-9
+_LEXICAL_ENGINES = ("exhaustive", "wand")
+_PARALLEL_MIN_DOCUMENTS = 8
+_VECTOR_COMPACTION_SLACK = 64
+_SPARSE_TITLE_WEIGHT = 1.0
+_SPARSE_TAG_WEIGHT = 0.5
+_SPARSE_EXPANSION_WEIGHT = 0.3
+_SPARSE_EXPANSION_TERMS = 8
+_DELTA_MERGE_FACTOR = 4
+_SNAPSHOT_REWRITE_FRACTION = 0.125
+_REMOVED = object()
+
+# Stop words en español para filtrar ruido
+_STOPWORDS = frozenset({
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'es', 'son',
+    'era', 'eran', 'fueron', 'sea', 'sean', 'que', 'como', 'para', 'con',
+    'por', 'del', 'desde', 'hasta', 'ante', 'sobre', 'tras', 'durante',
+    'mediante', 'este', 'esta', 'estos', 'estas', 'este', 'esta',
+    'esto', 'estos', 'estas', 'aquel', 'aquella', 'aquellos', 'aquellas',
+    'uno', 'una', 'unos', 'unas', 'todo', 'toda', 'todos', 'todas',
+    'muy', 'más', 'menos', 'mucho', 'poco', 'también', 'tampoco',
+    'siempre', 'nunca', 'aquí', 'allí', 'allá', 'acá', 'hoy', 'ayer',
+    'mañana', 'anoche', 'ahora', 'entonces', 'después', 'antes',
+    'primero', 'primera', 'último', 'última', 'primero', 'primera',
+    'segundo', 'segunda', 'tercero', 'tercera', 'cuarto', 'cuarta',
+    'quinto', 'quinta', 'sexto', 'séptimo', 'octavo', 'noveno', 'décimo'
+})
 
 
 @dataclass
@@ -31,6 +75,8 @@ class DocumentSection:
     metadata: dict[str, str]
     heading_level: int
     tokens: tuple[str, ...]
+    chunks: dict[tuple[int, int], tuple[str, ...]] = field(default_factory=dict, repr=False, compare=False)
+    term_weights: dict[str, float] | None = field(default=None, repr=False, compare=False)
 
     @property
     def identifier(self) -> str:
@@ -52,10 +98,301 @@ class _IndexedDocument:
     path: pathlib.Path
     mtime: float
     sections: list[DocumentSection]
+    size: int = -1
+    section_ids: list[int] = field(default_factory=list)
+
+
+class _DeltaMap(MutableMapping):
+    """Diccionario copy-on-write: una base compartida y un delta propio.
+
+    La base nunca se modifica una vez creada, de modo que ``fork()`` solo
+    copia el delta acumulado. Cuando el delta crece por encima de
+    ``_DELTA_MERGE_FACTOR·√n`` entradas, ``settle()`` lo funde en una base
+    nueva; así cada escritura cuesta O(√n) amortizado en lugar de O(n) y
+    las lecturas siguen siendo una o dos búsquedas en diccionarios.
+    """
+
+    __slots__ = ("_base", "_delta", "_length")
+
+    def __init__(self, base: dict | None = None) -> None:
+        self._base: dict = base if base is not None else {}
+        self._delta: dict = {}
+        self._length = len(self._base)
+
+    def fork(self) -> _DeltaMap:
+        clone = _DeltaMap.__new__(_DeltaMap)
+        clone._base = self._base
+        clone._delta = dict(self._delta)
+        clone._length = self._length
+        return clone
+
+    def settle(self) -> None:
+        if len(self._delta) > _DELTA_MERGE_FACTOR * math.isqrt(len(self._base)):
+            base = {key: value for key, value in self._base.items() if key not in self._delta}
+            base.update((key, value) for key, value in self._delta.items() if value is not _REMOVED)
+            self._base = base
+            self._delta = {}
+
+    def getter(self):
+        """``__getitem__`` más rápido disponible, para bucles calientes."""
+
+        return self.__getitem__ if self._delta else self._base.__getitem__
+
+    def __getitem__(self, key):
+        if self._delta and key in self._delta:
+            value = self._delta[key]
+            if value is _REMOVED:
+                raise KeyError(key)
+            return value
+        return self._base[key]
+
+    def get(self, key, default=None):
+        if self._delta and key in self._delta:
+            value = self._delta[key]
+            return default if value is _REMOVED else value
+        return self._base.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        if self._delta and key in self._delta:
+            return self._delta[key] is not _REMOVED
+        return key in self._base
+
+    def __setitem__(self, key, value) -> None:
+        if key not in self:
+            self._length += 1
+        self._delta[key] = value
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if key in self._base:
+            self._delta[key] = _REMOVED
+        else:
+            del self._delta[key]
+        self._length -= 1
+
+    def __iter__(self):
+        delta = self._delta
+        for key, value in delta.items():
+            if value is not _REMOVED:
+                yield key
+        for key in self._base:
+            if key not in delta:
+                yield key
+
+    def __len__(self) -> int:
+        return self._length
+
+
+class _IndexGeneration:
+    """Estado completo del índice en un instante dado.
+
+    Una generación publicada no vuelve a modificarse (salvo sus cachés
+    perezosas, que son deterministas). Las escrituras trabajan sobre
+    ``fork()``, que solo copia los deltas de sus mapas (``_DeltaMap``) y
+    clona las postings de un término cuando se modifican (copy-on-write);
+    después la nueva generación se publica sustituyendo una única
+    referencia. El coste de un lote es proporcional a lo que cambia, no al
+    tamaño del corpus.
+    """
+
+    def __init__(self) -> None:
+        self.documents: _DeltaMap = _DeltaMap()
+        self.sections_by_id: _DeltaMap = _DeltaMap()
+        self.section_lengths: _DeltaMap = _DeltaMap()
+        self.postings: _DeltaMap = _DeltaMap()
+        self.total_length = 0
+        self.avg_section_length = 0.0
+        self.next_section_id = 0
+        self.suggestion_scores: _DeltaMap = _DeltaMap()
+        self.suggestion_labels: _DeltaMap = _DeltaMap()
+        self.posting_lists: _DeltaMap = _DeltaMap()
+        self.term_upper_bounds: dict[str, float] = {}
+        self.sections_cache: list[DocumentSection] | None = None
+        self.suggestion_catalog: list[tuple[str, str]] | None = None
+        self.owned_postings: set[str] | None = None
+
+    def fork(self) -> _IndexGeneration:
+        clone = _IndexGeneration()
+        clone.documents = self.documents.fork()
+        clone.sections_by_id = self.sections_by_id.fork()
+        clone.section_lengths = self.section_lengths.fork()
+        clone.postings = self.postings.fork()
+        clone.total_length = self.total_length
+        clone.avg_section_length = self.avg_section_length
+        clone.next_section_id = self.next_section_id
+        clone.suggestion_scores = self.suggestion_scores.fork()
+        clone.suggestion_labels = self.suggestion_labels.fork()
+        clone.posting_lists = self.posting_lists.fork()
+        clone.owned_postings = set()
+        return clone
+
+    # ------------------------------------------------------------------
+    # Consultas
+    def token_idf(self, token: str) -> float | None:
+        entries = self.postings.get(token)
+        if not entries:
+            return None
+        freq = len(entries)
+        numerator = len(self.sections_by_id) - freq + 0.5
+        denominator = freq + 0.5
+        return math.log((numerator / denominator) + 1.0)
+
+    def term_upper_bound(self, token: str) -> float:
+        bound = self.term_upper_bounds.get(token)
+        if bound is None:
+            idf = self.token_idf(token) or 0.0
+            avg_length = self.avg_section_length or 1.0
+            section_length = self.section_lengths.getter()
+            bound = max(
+                (
+                    _bm25_term_score(idf, freq, section_length(section_id), avg_length)
+                    for section_id, freq in self.postings.get(token, {}).items()
+                ),
+                default=0.0,
+            )
+            self.term_upper_bounds[token] = bound
+        return bound
+
+    def posting_list(self, token: str) -> list[tuple[int, int]]:
+        entries = self.posting_lists.get(token)
+        if entries is None:
+            entries = list(self.postings.get(token, {}).items())
+            self.posting_lists[token] = entries
+        return entries
+
+    def document_order(self, section_id: int) -> tuple[str, str, int]:
+        """Clave de orden documental de una sección, estable entre refrescos.
+
+        Dentro de un documento los identificadores crecen en el orden de sus
+        secciones, así que desempatan sin depender del historial de refrescos.
+        """
+
+        path = self.sections_by_id[section_id].document_path
+        return path.name, path.as_posix(), section_id
+
+    def ordered_documents(self) -> list[_IndexedDocument]:
+        return sorted(self.documents.values(), key=lambda record: record.path.name)
+
+    def sections(self) -> list[DocumentSection]:
+        if self.sections_cache is None:
+            self.sections_cache = [
+                section for document in self.ordered_documents() for section in document.sections
+            ]
+        return self.sections_cache
+
+    def ordered_suggestions(self) -> list[tuple[str, str]]:
+        if self.suggestion_catalog is None:
+            if not self.sections_by_id:
+                self.suggestion_catalog = []
+            else:
+                ordered = sorted(self.suggestion_scores.items(), key=lambda item: (-item[1], item[0]))
+                self.suggestion_catalog = [(key, self.suggestion_labels[key]) for key, _ in ordered]
+        return self.suggestion_catalog
+
+    # ------------------------------------------------------------------
+    # Mutaciones (solo sobre generaciones aún no publicadas)
+    def replace_document(self, path: pathlib.Path, record: _IndexedDocument | None) -> None:
+        previous = self.documents.pop(path, None)
+        if previous is not None:
+            self._unindex_document(previous)
+        if record is not None:
+            self.documents[path] = record
+            self._index_document(record)
+
+    def finish_update(self) -> None:
+        total_sections = len(self.sections_by_id)
+        self.avg_section_length = self.total_length / total_sections if total_sections else 0.0
+        self.term_upper_bounds = {}
+        self.sections_cache = None
+        self.suggestion_catalog = None
+        for mapping in (
+            self.documents,
+            self.sections_by_id,
+            self.section_lengths,
+            self.postings,
+            self.suggestion_scores,
+            self.suggestion_labels,
+            self.posting_lists,
+        ):
+            mapping.settle()
+
+    def _index_document(self, record: _IndexedDocument) -> None:
+        record.section_ids = []
+        for section in record.sections:
+            section_id = self.next_section_id
+            self.next_section_id += 1
+            record.section_ids.append(section_id)
+            self.sections_by_id[section_id] = section
+            self.section_lengths[section_id] = len(section.tokens)
+            self.total_length += len(section.tokens)
+            for token, freq in Counter(section.tokens).items():
+                self._mutable_postings(token)[section_id] = freq
+                self.posting_lists.pop(token, None)
+        self._adjust_suggestions(record, 1)
+
+    def _unindex_document(self, record: _IndexedDocument) -> None:
+        for section_id, section in zip(record.section_ids, record.sections, strict=True):
+            del self.sections_by_id[section_id]
+            self.total_length -= self.section_lengths.pop(section_id)
+            for token in set(section.tokens):
+                entries = self._mutable_postings(token)
+                del entries[section_id]
+                if not entries:
+                    del self.postings[token]
+                self.posting_lists.pop(token, None)
+        self._adjust_suggestions(record, -1)
+
+    def _mutable_postings(self, token: str) -> dict[int, int]:
+        entries = self.postings.get(token)
+        if entries is None:
+            entries = self.postings[token] = {}
+            if self.owned_postings is not None:
+                self.owned_postings.add(token)
+        elif self.owned_postings is not None and token not in self.owned_postings:
+            entries = self.postings[token] = dict(entries)
+            self.owned_postings.add(token)
+        return entries
+
+    def _adjust_suggestions(self, record: _IndexedDocument, sign: int) -> None:
+        for key, label, weight in _document_suggestions(record):
+            score = self.suggestion_scores.get(key, 0) + sign * weight
+            if score > 0:
+                self.suggestion_scores[key] = score
+                self.suggestion_labels.setdefault(key, label)
+            else:
+                self.suggestion_scores.pop(key, None)
+                self.suggestion_labels.pop(key, None)
 
 
 class DocumentationIndex:
-    """Indexa la carpeta de documentación usando una métrica TF-IDF ligera."""
+    """Indexa la carpeta de documentación usando una métrica TF-IDF ligera.
+
+    Las estadísticas del corpus (postings, frecuencias documentales, longitud
+    total y puntuaciones de sugerencias) se mantienen de forma incremental:
+    cada sección recibe un identificador estable y refrescar un documento
+    solo resta sus secciones antiguas y suma las nuevas. El IDF y las cotas
+    WAND se derivan bajo demanda de esas estadísticas.
+
+    Cada actualización produce una nueva generación del índice que se
+    publica de forma atómica, de modo que las búsquedas en curso nunca se
+    bloquean ni observan un estado a medio actualizar. Esto permite
+    mantener el índice al día con ``start_watching()`` desde un hilo de
+    fondo.
+
+    Con ``build_workers`` mayor que 1 (o ``None`` para usar todos los
+    núcleos) el análisis y la tokenización de lotes grandes, como la
+    construcción en frío, se reparten en un pool de procesos.
+
+    Con ``use_vector_store`` los embeddings de cada sección y fragmento se
+    calculan al indexar y se guardan en un ``VectorStore`` persistente, de
+    modo que en cada consulta solo hay que embeber la pregunta.
+
+    Con ``semantic_mode="sparse"`` en la configuración del pipeline, cada
+    sección recibe al indexar pesos dispersos de términos (frecuencia
+    saturada, título, etiquetas y expansión por co-ocurrencia en su
+    documento) que sustituyen al re-scoring denso sin llamar al embedder.
+    """
 
     def __init__(
         self,
@@ -64,24 +401,58 @@ class DocumentationIndex:
         pipeline: HybridSearchPipeline | None = None,
         embedder: EmbeddingGemma | None = None,
         pipeline_config: SearchPipelineConfig | None = None,
+        snapshot_path: str | pathlib.Path | None = None,
+        use_snapshot: bool = True,
+        build_workers: int | None = 1,
+        vector_store_path: str | pathlib.Path | None = None,
+        use_vector_store: bool = False,
     ):
         self.root = pathlib.Path(root).expanduser().resolve()
         if not self.root.exists():
             raise FileNotFoundError(f"No se encontró la carpeta de documentación: {self.root}")
-        self.sections: list[DocumentSection] = []
-        self._idf: dict[str, float] = {}
-        self._avg_section_length: float = 0.0
-        self._documents: dict[pathlib.Path, _IndexedDocument] = {}
-        self._suggestion_catalog: list[tuple[str, str]] = []
+        self._generation = _IndexGeneration()
+        self._write_lock = threading.Lock()
+        self._watcher: DocumentationWatcher | None = None
+        self._snapshot_stale = True
+        self._snapshot_pending = 0
+        self._build_workers = max(1, build_workers if build_workers is not None else (os.cpu_count() or 1))
+        self._owns_pipeline = pipeline is None
         if pipeline is not None:
             self._pipeline = pipeline
         else:
             config = pipeline_config or SearchPipelineConfig()
-            self._pipeline = HybridSearchPipeline(embedder=embedder or EmbeddingGemma(), config=config)
+            # Sin embedder explícito el pipeline crea (y cierra) su EmbeddingGemma.
+            self._pipeline = HybridSearchPipeline(embedder=embedder, config=config)
+        if not use_snapshot:
+            self._snapshot_path: pathlib.Path | None = None
+        elif snapshot_path is not None:
+            self._snapshot_path = pathlib.Path(snapshot_path).expanduser().resolve()
+        else:
+            self._snapshot_path = default_snapshot_path(self.root)
+        if use_vector_store and self._pipeline.vector_store is None:
+            store_path = (
+                pathlib.Path(vector_store_path).expanduser().resolve()
+                if vector_store_path is not None
+                else default_vector_store_path(self.root)
+            )
+            self._pipeline.vector_store = VectorStore(
+                store_path,
+                namespace=self._pipeline.embedding_namespace(),
+                precision=self._pipeline.config.vector_store_precision,
+            )
+        if self._snapshot_path is not None:
+            self._load_snapshot()
         self.refresh()
+        self._sync_vector_store()
 
     # ------------------------------------------------------------------
     # API pública
+    @property
+    def sections(self) -> list[DocumentSection]:
+        """Secciones indexadas, agrupadas por documento en orden alfabético."""
+
+        return self._generation.sections()
+
     def search(
         self,
         query: str,
@@ -94,19 +465,72 @@ class DocumentationIndex:
         tokens = _tokenize_mejorado(query)
         if not tokens:
             return []
+        generation = self._generation
         pool_target = max(limit, self._pipeline.config.lexical_top_k)
-        pool_size = min(pool_target, len(self.sections)) if self.sections else 0
-        candidates = self._stage_one(tokens, pool_size)
+        pool_size = min(pool_target, len(generation.sections_by_id))
+        candidates = self._stage_one(tokens, pool_size, generation)
         if not candidates:
             return []
+        sparse = _SparseQuery(generation, tokens) if self._uses_sparse_terms() else None
         selections = self._pipeline.search(
             query,
             candidates,
             limit=min(limit, len(candidates)),
             role=role,
             alpha_override=alpha,
+            sparse=sparse,
+        )
+        return self._selections_to_results(selections)
+
+    async def asearch(
+        self,
+        query: str,
+        limit: int = 3,
+        *,
+        role: str | None = None,
+        alpha: float | None = None,
+    ) -> list[SearchResult]:
+        """Versión asíncrona de :meth:`search`.
+
+        El embedding de la consulta se pide mientras la etapa léxica (BM25)
+        corre en un hilo, de modo que la latencia del modelo se solapa con
+        el trabajo de CPU en lugar de sumarse.
+        """
+
+        tokens = _tokenize_mejorado(query)
+        if not tokens:
+            return []
+        generation = self._generation
+        pool_target = max(limit, self._pipeline.config.lexical_top_k)
+        pool_size = min(pool_target, len(generation.sections_by_id))
+        sparse = _SparseQuery(generation, tokens) if self._uses_sparse_terms() else None
+        embedding = (
+            asyncio.ensure_future(self._pipeline.aembed_query(query))
+            if self._pipeline.config.semantic_mode == "dense"
+            else None
+        )
+        try:
+            candidates = await asyncio.to_thread(self._stage_one, tokens, pool_size, generation)
+        except BaseException:
+            if embedding is not None:
+                embedding.cancel()
+            raise
+        if not candidates:
+            if embedding is not None:
+                embedding.cancel()
+            return []
+        selections = await self._pipeline.asearch(
+            query,
+            candidates,
+            limit=min(limit, len(candidates)),
+            role=role,
+            alpha_override=alpha,
+            sparse=sparse,
+            query_vector=await embedding if embedding is not None else None,
         )
+        return self._selections_to_results(selections)
 
+    def _selections_to_results(self, selections: Sequence[PipelineSelection]) -> list[SearchResult]:
         total = len(selections)
         results: list[SearchResult] = []
         for position, selection in enumerate(selections):
@@ -115,7 +539,7 @@ class DocumentationIndex:
         return results
 
     def list_documents(self) -> list[pathlib.Path]:
-        return sorted((doc.path for doc in self._documents.values()), key=lambda path: path.name)
+        return sorted((doc.path for doc in self._generation.documents.values()), key=lambda path: path.name)
 
     def last_search_trace(self) -> PipelineTrace | None:
         """Devuelve la traza completa de la última consulta ejecutada."""
@@ -131,38 +555,107 @@ class DocumentationIndex:
         return trace.to_prompt(max_items_per_stage=max_items_per_stage)
 
     def refresh(self, paths: Iterable[str | pathlib.Path] | None = None) -> None:
-        """Reconstruye el índice detectando cambios incrementales."""
+        """Actualiza el índice detectando cambios incrementales.
+
+        La instantánea solo se reescribe si cambió una fracción apreciable del
+        corpus; los cambios sueltos se persisten en ``stop_watching``/``close``
+        y, si no, el siguiente arranque reanaliza solo esos documentos.
+        """
 
         forced_paths = {_resolve_to_root(self.root, path) for path in paths} if paths else None
         discovered: set[pathlib.Path] = set()
+        updated: list[tuple[pathlib.Path, os.stat_result]] = []
+        documents = self._generation.documents
 
         for path in sorted(self.root.rglob("*.md")):
             discovered.add(path)
             needs_update = False
-            record = self._documents.get(path)
-            mtime = path.stat().st_mtime
+            record = documents.get(path)
+            stat = path.stat()
             if record is None:
                 needs_update = True
             elif forced_paths and path in forced_paths:
                 needs_update = True
-            elif record.mtime < mtime:
+            elif record.mtime != stat.st_mtime or record.size != stat.st_size:
                 needs_update = True
 
             if needs_update:
-                self._documents[path] = _IndexedDocument(
-                    path=path,
-                    mtime=mtime,
-                    sections=list(_parse_sections(path)),
-                )
+                updated.append((path, stat))
 
         if paths is None:
-            stale = [path for path in self._documents if path not in discovered]
+            stale = [path for path in documents if path not in discovered]
         else:
-            stale = [path for path in self._documents if path not in discovered and path in forced_paths]
-        for path in stale:
-            self._documents.pop(path, None)
+            stale = [path for path in documents if path not in discovered and path in forced_paths]
+
+        self._apply_changes(updated, stale)
+        if self._snapshot_stale and (
+            self._snapshot_pending >= _SNAPSHOT_REWRITE_FRACTION * len(self._generation.documents)
+        ):
+            self._save_snapshot()
+
+    def refresh_paths(self, paths: Iterable[str | pathlib.Path]) -> bool:
+        """Actualiza solo las rutas indicadas, sin recorrer todo el árbol.
+
+        Pensado para observadores de sistema de archivos: cada ruta se
+        reindexa si cambió su ``mtime`` o tamaño y se retira si ya no existe.
+        Devuelve ``True`` si el índice cambió.
+        """
+
+        documents = self._generation.documents
+        updated: list[tuple[pathlib.Path, os.stat_result]] = []
+        removed: list[pathlib.Path] = []
+        for raw_path in paths:
+            path = _resolve_to_root(self.root, raw_path)
+            if path.suffix != ".md" or not path.is_relative_to(self.root):
+                continue
+            record = documents.get(path)
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                if record is not None:
+                    removed.append(path)
+                continue
+            if not path.is_file():
+                continue
+            if record is None or record.mtime != stat.st_mtime or record.size != stat.st_size:
+                updated.append((path, stat))
+        return self._apply_changes(updated, removed)
 
-        self._rebuild_cache()
+    def start_watching(
+        self,
+        *,
+        backend: str = "auto",
+        debounce: float = 0.25,
+        poll_interval: float = 2.0,
+    ) -> DocumentationWatcher:
+        """Mantiene el índice actualizado en segundo plano (inotify o sondeo)."""
+
+        if self._watcher is None:
+            self._watcher = DocumentationWatcher(
+                self,
+                backend=backend,
+                debounce=debounce,
+                poll_interval=poll_interval,
+            )
+            self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self) -> None:
+        """Detiene el observador y persiste la instantánea si quedó desfasada."""
+
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.stop()
+        if self._snapshot_stale:
+            self._save_snapshot()
+        self._sync_vector_store()
+
+    def close(self) -> None:
+        """Detiene el observador y libera el pipeline propio (hilos de embeddings)."""
+
+        self.stop_watching()
+        if self._owns_pipeline:
+            self._pipeline.close()
 
     def suggest(self, prefix: str, limit: int = 5) -> list[str]:
         """Devuelve sugerencias de autocompletado basadas en títulos y etiquetas."""
@@ -172,7 +665,7 @@ class DocumentationIndex:
             return []
 
         suggestions: list[str] = []
-        for key, label in self._suggestion_catalog:
+        for key, label in self._generation.ordered_suggestions():
             if key.startswith(normalized_prefix) or any(part.startswith(normalized_prefix) for part in key.split()):
                 if label not in suggestions:
                     suggestions.append(label)
@@ -181,43 +674,153 @@ class DocumentationIndex:
         return suggestions
 
     def _bm25_score(self, query_tokens: Sequence[str], section_tokens: Sequence[str]) -> float:
-        if not query_tokens or not section_tokens or not self._idf:
+        generation = self._generation
+        if not query_tokens or not section_tokens or not generation.postings:
             return 0.0
 
-        avg_length = self._avg_section_length or 1.0
+        avg_length = generation.avg_section_length or 1.0
         section_length = len(section_tokens)
         if section_length == 0:
             return 0.0
 
-        k1 = 1.5
-        b = 0.75
         term_freqs = Counter(section_tokens)
 
         score = 0.0
         for token in query_tokens:
-            idf = self._idf.get(token)
+            idf = generation.token_idf(token)
             if idf is None:
                 continue
             freq = term_freqs.get(token, 0)
             if freq == 0:
                 continue
-            numerator = freq * (k1 + 1)
-            denominator = freq + k1 * (1 - b + b * (section_length / avg_length))
-            score += idf * (numerator / denominator)
+            score += _bm25_term_score(idf, freq, section_length, avg_length)
         return score
 
     def _stage_one(
         self,
         query_tokens: Sequence[str],
         pool_size: int,
+        generation: _IndexGeneration | None = None,
     ) -> list[SearchResult]:
-        scores: list[SearchResult] = []
-        for section in self.sections:
-            score = self._bm25_score(query_tokens, section.tokens)
-            if score > 0:
-                scores.append(SearchResult(section=section, score=score))
-        scores.sort(key=lambda result: result.score, reverse=True)
-        return scores[:pool_size]
+        """Recupera candidatos BM25 recorriendo solo las postings de la consulta."""
+
+        generation = generation or self._generation
+        if not query_tokens or not generation.postings or pool_size <= 0:
+            return []
+
+        engine = self._pipeline.config.lexical_engine
+        if engine == "wand":
+            ranked = self._stage_one_wand(generation, query_tokens, pool_size)
+        elif engine == "exhaustive":
+            ranked = self._stage_one_exhaustive(generation, query_tokens, pool_size)
+        else:
+            raise ValueError(
+                f"Motor léxico desconocido: {engine}. Opciones válidas: {', '.join(_LEXICAL_ENGINES)}"
+            )
+        return [
+            SearchResult(section=generation.sections_by_id[section_id], score=score)
+            for section_id, score in ranked
+        ]
+
+    @staticmethod
+    def _stage_one_exhaustive(
+        generation: _IndexGeneration,
+        query_tokens: Sequence[str],
+        pool_size: int,
+    ) -> list[tuple[int, float]]:
+        avg_length = generation.avg_section_length or 1.0
+        section_length = generation.section_lengths.getter()
+        accumulators: dict[int, float] = {}
+        for token in query_tokens:
+            idf = generation.token_idf(token)
+            if idf is None:
+                continue
+            for section_id, freq in generation.postings[token].items():
+                length = section_length(section_id)
+                accumulators[section_id] = accumulators.get(section_id, 0.0) + _bm25_term_score(
+                    idf, freq, length, avg_length
+                )
+
+        scored = [item for item in accumulators.items() if item[1] > 0]
+        if len(scored) > pool_size:
+            # Solo las secciones empatadas con el corte necesitan la clave documental.
+            cutoff = heapq.nlargest(pool_size, map(itemgetter(1), scored))[-1]
+            scored = [item for item in scored if item[1] >= cutoff]
+        order = generation.document_order
+        scored.sort(key=lambda item: (-item[1], order(item[0])))
+        return scored[:pool_size]
+
+    @staticmethod
+    def _stage_one_wand(
+        generation: _IndexGeneration,
+        query_tokens: Sequence[str],
+        pool_size: int,
+    ) -> list[tuple[int, float]]:
+        """Top-k BM25 con poda dinámica WAND sobre las postings ordenadas.
+
+        Cada término aporta como máximo su cota superior precomputada; solo se
+        evalúan las secciones cuya suma de cotas puede superar el umbral del
+        heap, y el resto de cursores salta directamente al pivote mediante
+        búsqueda binaria. El resultado coincide con el motor exhaustivo.
+        """
+
+        avg_length = generation.avg_section_length or 1.0
+        section_length = generation.section_lengths.getter()
+        idf_values = {token: generation.token_idf(token) for token in set(query_tokens)}
+        multiplicity = Counter(token for token in query_tokens if idf_values[token] is not None)
+        cursors = [
+            _TermCursor(
+                token=token,
+                postings=generation.posting_list(token),
+                upper_bound=generation.term_upper_bound(token) * count,
+            )
+            for token, count in multiplicity.items()
+        ]
+
+        heap: list[tuple[float, int]] = []
+        while cursors:
+            cursors.sort(key=_TermCursor.current_position)
+            threshold = heap[0][0] if len(heap) >= pool_size else -math.inf
+
+            pivot = None
+            accumulated = 0.0
+            for index, cursor in enumerate(cursors):
+                accumulated += cursor.upper_bound
+                if accumulated > threshold - _WAND_TOLERANCE:
+                    pivot = index
+                    break
+            if pivot is None:
+                break
+
+            pivot_position = cursors[pivot].current_position()
+            if cursors[0].current_position() == pivot_position:
+                frequencies = {
+                    cursor.token: cursor.current_frequency()
+                    for cursor in cursors
+                    if cursor.current_position() == pivot_position
+                }
+                length = section_length(pivot_position)
+                score = 0.0
+                for token in query_tokens:
+                    freq = frequencies.get(token)
+                    if freq:
+                        score += _bm25_term_score(idf_values[token], freq, length, avg_length)
+                if score > 0:
+                    entry = (score, _LaterFirst(generation.document_order(pivot_position)))
+                    if len(heap) < pool_size:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+                for cursor in cursors:
+                    if cursor.current_position() == pivot_position:
+                        cursor.advance_to(pivot_position + 1)
+            else:
+                for cursor in cursors[:pivot]:
+                    cursor.advance_to(pivot_position)
+            cursors = [cursor for cursor in cursors if not cursor.exhausted]
+
+        heap.sort(reverse=True)
+        return [(later.key[-1], score) for score, later in heap]
 
     def _build_chunk_section(
         self,
@@ -243,74 +846,359 @@ class DocumentationIndex:
         )
 
     # ------------------------------------------------------------------
-    # Construcción del índice
-    def _rebuild_cache(self) -> None:
-        self.sections = [
-            section
-            for document in sorted(self._documents.values(), key=lambda record: record.path.name)
-            for section in document.sections
+    # Mantenimiento incremental del índice
+    def _apply_changes(
+        self,
+        updated: Iterable[tuple[pathlib.Path, os.stat_result]],
+        removed: Iterable[pathlib.Path],
+    ) -> bool:
+        """Reindexa documentos modificados y retira los eliminados.
+
+        El análisis de los archivos ocurre fuera del cerrojo de escritura; la
+        nueva generación se construye sobre un fork de la actual y se publica
+        al final. El coste es proporcional a los documentos afectados.
+        """
+
+        updated = sorted(updated, key=lambda item: item[0].name)
+        parsed = self._parse_documents([path for path, _ in updated])
+        records = [
+            _IndexedDocument(path=path, mtime=stat.st_mtime, sections=sections, size=stat.st_size)
+            for (path, stat), sections in zip(updated, parsed, strict=True)
         ]
-        self._build_index()
-        self._build_suggestions()
-
-    def _build_index(self) -> None:
-        total_sections = len(self.sections)
-        if total_sections == 0:
-            self._idf = {}
+        if self._uses_sparse_terms():
+            for record in records:
+                _assign_term_weights(record.sections)
+        new_sections = [section for record in records for section in record.sections]
+        self._pipeline.prepare_chunks(new_sections)
+        self._pipeline.prepare_embeddings(new_sections)
+        removed = list(removed)
+        if not records and not removed:
+            return False
+
+        with self._write_lock:
+            generation = self._generation.fork()
+            changed = bool(records)
+            for record in records:
+                generation.replace_document(record.path, record)
+            for path in removed:
+                if path in generation.documents:
+                    generation.replace_document(path, None)
+                    changed = True
+            if not changed:
+                return False
+            generation.finish_update()
+            self._generation = generation
+            self._snapshot_stale = True
+            self._snapshot_pending += len(records) + len(removed)
+        self._sync_vector_store()
+        return True
+
+    def _uses_sparse_terms(self) -> bool:
+        return self._pipeline.config.semantic_mode == "sparse"
+
+    def _sync_vector_store(self) -> None:
+        """Confirma los vectores nuevos y compacta si sobran filas huérfanas."""
+
+        store = self._pipeline.vector_store
+        if store is None:
             return
-        doc_freqs: dict[str, int] = {}
-        for section in self.sections:
-            for token in set(section.tokens):
-                doc_freqs[token] = doc_freqs.get(token, 0) + 1
-        self._idf = {}
-        for token, freq in doc_freqs.items():
-            numerator = total_sections - freq + 0.5
-            denominator = freq + 0.5
-            if denominator == 0:
-                continue
-            self._idf[token] = math.log((numerator / denominator) + 1.0)
+        store.flush()
+        generation = self._generation
+        # Cada sección aporta al menos una fila viva: si ni así sobra espacio,
+        # no hace falta recorrer el corpus para contar los fragmentos.
+        if store.stored_rows <= 2 * len(generation.sections_by_id) + _VECTOR_COMPACTION_SLACK:
+            return
+        key = self._pipeline.chunk_key()
+        live_count = sum(1 + len(section.chunks.get(key, ())) for section in generation.sections_by_id.values())
+        if store.stored_rows <= 2 * live_count + _VECTOR_COMPACTION_SLACK:
+            return
+        store.compact(
+            text_key(text)
+            for section in generation.sections_by_id.values()
+            for text in self._pipeline.corpus_texts(section)
+        )
 
-        total_length = sum(len(section.tokens) for section in self.sections)
-        self._avg_section_length = total_length / total_sections if total_sections else 0.0
+    def _parse_documents(self, paths: Sequence[pathlib.Path]) -> list[list[DocumentSection]]:
+        """Analiza los documentos, en paralelo si el lote lo justifica.
+
+        Los procesos devuelven una forma compacta (tokens unidos en una sola
+        cadena) para abaratar la serialización; el orden de salida coincide
+        con el de ``paths``, así que el resultado es idéntico al secuencial.
+        """
+
+        workers = min(self._build_workers, len(paths))
+        if workers > 1 and len(paths) >= _PARALLEL_MIN_DOCUMENTS:
+            chunksize = max(1, len(paths) // (workers * 4))
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    compact = list(executor.map(_parse_document_compact, paths, chunksize=chunksize))
+            except (OSError, BrokenProcessPool) as exc:
+                LOGGER.warning("No se pudo analizar en paralelo (%s); se continúa en serie", exc)
+            else:
+                return [_expand_document(path, payload) for path, payload in zip(paths, compact, strict=True)]
+        return [list(_parse_sections(path)) for path in paths]
 
-    def _build_suggestions(self) -> None:
-        if not self.sections:
-            self._suggestion_catalog = []
+    # ------------------------------------------------------------------
+    # Instantánea en disco
+    def _save_snapshot(self) -> None:
+        if self._snapshot_path is None:
+            return
+        generation = self._generation
+        chunk_key = self._pipeline.chunk_key()
+        vocabulary = list(generation.postings)
+        token_ids = {token: position for position, token in enumerate(vocabulary)}
+        documents = []
+        for record in generation.documents.values():
+            metadata = record.sections[0].metadata if record.sections else {}
+            documents.append(
+                (
+                    record.path.relative_to(self.root).as_posix(),
+                    record.mtime,
+                    record.size,
+                    dict(metadata),
+                    array("I", record.section_ids).tobytes(),
+                    [
+                        (
+                            section.title,
+                            section.content,
+                            section.heading_level,
+                            array("I", [token_ids[token] for token in section.tokens]).tobytes(),
+                            section.chunks.get(chunk_key),
+                        )
+                        for section in record.sections
+                    ],
+                )
+            )
+        postings = [
+            (
+                array("I", generation.postings[token].keys()).tobytes(),
+                array("I", generation.postings[token].values()).tobytes(),
+            )
+            for token in vocabulary
+        ]
+        payload = {
+            "root": str(self.root),
+            "vocabulary": vocabulary,
+            "documents": documents,
+            "postings": postings,
+            "next_section_id": generation.next_section_id,
+            "chunk_key": chunk_key,
+            "suggestions": [
+                (key, generation.suggestion_labels[key], score)
+                for key, score in generation.suggestion_scores.items()
+            ],
+        }
+        if write_snapshot(self._snapshot_path, payload) and generation is self._generation:
+            self._snapshot_stale = False
+            self._snapshot_pending = 0
+
+    def _load_snapshot(self) -> None:
+        if self._snapshot_path is None:
             return
+        payload = read_snapshot(self._snapshot_path)
+        if payload is None or payload.get("root") != str(self.root):
+            return
+        try:
+            generation = self._restore_snapshot(payload)
+        except (KeyError, TypeError, ValueError, IndexError):
+            return
+        if self._uses_sparse_terms():
+            for record in generation.documents.values():
+                _assign_term_weights(record.sections)
+        self._pipeline.prepare_chunks(generation.sections())
+        self._pipeline.prepare_embeddings(generation.sections())
+        self._generation = generation
+        self._snapshot_stale = False
+        self._snapshot_pending = 0
+
+    def _restore_snapshot(self, payload: dict) -> _IndexGeneration:
+        vocabulary: list[str] = payload["vocabulary"]
+        chunk_key = tuple(payload["chunk_key"])
+        generation = _IndexGeneration()
+        for relative, mtime, size, metadata, id_bytes, raw_sections in payload["documents"]:
+            path = self.root / relative
+            section_ids = array("I")
+            section_ids.frombytes(id_bytes)
+            record_sections = []
+            for section_id, (title, content, level, token_bytes, chunks) in zip(
+                section_ids, raw_sections, strict=True
+            ):
+                token_ids = array("I")
+                token_ids.frombytes(token_bytes)
+                section = DocumentSection(
+                    document_path=path,
+                    title=title,
+                    content=content,
+                    metadata=dict(metadata),
+                    heading_level=level,
+                    tokens=tuple(map(vocabulary.__getitem__, token_ids)),
+                )
+                if chunks is not None:
+                    section.chunks[chunk_key] = chunks
+                record_sections.append(section)
+                generation.sections_by_id[section_id] = section
+                generation.section_lengths[section_id] = len(section.tokens)
+                generation.total_length += len(section.tokens)
+            generation.documents[path] = _IndexedDocument(
+                path=path,
+                mtime=mtime,
+                sections=record_sections,
+                size=size,
+                section_ids=section_ids.tolist(),
+            )
+
+        for token, (id_bytes, freq_bytes) in zip(vocabulary, payload["postings"], strict=True):
+            section_ids = array("I")
+            section_ids.frombytes(id_bytes)
+            freqs = array("I")
+            freqs.frombytes(freq_bytes)
+            generation.postings[token] = dict(zip(section_ids, freqs, strict=True))
+
+        generation.next_section_id = int(payload["next_section_id"])
+        generation.suggestion_scores = _DeltaMap({key: score for key, _, score in payload["suggestions"]})
+        generation.suggestion_labels = _DeltaMap({key: label for key, label, _ in payload["suggestions"]})
+        generation.finish_update()
+        return generation
+
+
+class _LaterFirst:
+    """Invierte el orden documental para que el heap expulse primero la sección más tardía."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: tuple[str, str, int]) -> None:
+        self.key = key
+
+    def __lt__(self, other: _LaterFirst) -> bool:
+        return self.key > other.key
+
+    def __gt__(self, other: _LaterFirst) -> bool:
+        return self.key < other.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _LaterFirst) and self.key == other.key
+
+
+class _TermCursor:
+    """Cursor sobre las postings de un término durante la poda WAND."""
 
-        scores: Counter[str] = Counter()
-        labels: dict[str, str] = {}
-
-        for record in self._documents.values():
-            base_label = record.path.stem.replace("_", " ")
-            base_key = base_label.lower()
-            labels.setdefault(base_key, base_label)
-            scores[base_key] += 1
-
-            doc_metadata = record.sections[0].metadata if record.sections else {}
-            for key in ("tags", "keywords"):
-                raw = doc_metadata.get(key)
-                if raw:
-                    for tag in _tokenize(raw):
-                        if len(tag) < 3:
-                            continue
-                        labels.setdefault(tag, tag)
-                        scores[tag] += 1.5
-
-            for section in record.sections:
-                if section.title:
-                    label = f"{record.path.stem} › {section.title}"
-                    key = label.lower()
-                    labels.setdefault(key, label)
-                    scores[key] += 3
-                    for token in _tokenize(section.title):
-                        if len(token) < 3:
-                            continue
-                        labels.setdefault(token, token)
-                        scores[token] += 1.5
-
-        ordered = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
-        self._suggestion_catalog = [(key, labels[key]) for key, _ in ordered]
+    __slots__ = ("token", "postings", "upper_bound", "index")
+
+    def __init__(self, token: str, postings: list[tuple[int, int]], upper_bound: float) -> None:
+        self.token = token
+        self.postings = postings
+        self.upper_bound = upper_bound
+        self.index = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.index >= len(self.postings)
+
+    def current_position(self) -> int:
+        return self.postings[self.index][0]
+
+    def current_frequency(self) -> int:
+        return self.postings[self.index][1]
+
+    def advance_to(self, position: int) -> None:
+        self.index = bisect_left(self.postings, position, lo=self.index, key=itemgetter(0))
+
+
+class _SparseQuery:
+    """Señal semántica dispersa de una consulta: IDF de sus términos × pesos de sección."""
+
+    __slots__ = ("_generation", "_query_weights")
+
+    def __init__(self, generation: _IndexGeneration, query_tokens: Sequence[str]) -> None:
+        self._generation = generation
+        unseen_idf = math.log(len(generation.sections_by_id) + 1.0)
+        self._query_weights = {}
+        for token in query_tokens:
+            idf = generation.token_idf(token)
+            self._query_weights[token] = self._query_weights.get(token, 0.0) + (
+                idf if idf is not None else unseen_idf
+            )
+
+    def weights(self, section: DocumentSection) -> dict[str, float]:
+        if section.term_weights is None:
+            record = self._generation.documents.get(section.document_path)
+            _assign_term_weights(record.sections if record is not None else [section])
+        return section.term_weights or {}
+
+    def score(self, section: DocumentSection) -> float:
+        weights = self.weights(section)
+        return sum(weight * weights.get(token, 0.0) for token, weight in self._query_weights.items())
+
+
+def _assign_term_weights(sections: Sequence[DocumentSection]) -> None:
+    """Calcula los pesos dispersos de las secciones de un mismo documento.
+
+    Cada término propio pesa su frecuencia saturada (como en BM25); los del
+    título y las etiquetas reciben un refuerzo y los términos más frecuentes
+    del resto del documento se añaden como expansión. El vector resultante
+    se normaliza (L2) para que el producto punto entre secciones sea un
+    coseno.
+    """
+
+    if not sections:
+        return
+    metadata = sections[0].metadata
+    tag_terms = {
+        token
+        for key in ("tags", "keywords")
+        for token in _tokenize(metadata.get(key, ""))
+        if _is_content_term(token)
+    }
+    document_frequencies = Counter(
+        token for section in sections for token in section.tokens if _is_content_term(token)
+    )
+    expansion = document_frequencies.most_common(_SPARSE_EXPANSION_TERMS)
+    top_frequency = expansion[0][1] if expansion else 1
+
+    for section in sections:
+        frequencies = Counter(token for token in section.tokens if _is_content_term(token))
+        weights = {
+            token: freq * (_BM25_K1 + 1) / (freq + _BM25_K1) for token, freq in frequencies.items()
+        }
+        for token in _tokenize(section.title):
+            if _is_content_term(token):
+                weights[token] = weights.get(token, 0.0) + _SPARSE_TITLE_WEIGHT
+        for token in tag_terms:
+            weights[token] = weights.get(token, 0.0) + _SPARSE_TAG_WEIGHT
+        for token, freq in expansion:
+            if token not in frequencies:
+                weights[token] = weights.get(token, 0.0) + _SPARSE_EXPANSION_WEIGHT * freq / top_frequency
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        section.term_weights = {token: weight / norm for token, weight in weights.items()} if norm else {}
+
+
+def _is_content_term(token: str) -> bool:
+    return len(token) >= 3 and token not in _STOPWORDS
+
+
+def _document_suggestions(record: _IndexedDocument) -> Iterable[tuple[str, str, float]]:
+    """Contribuciones de un documento al catálogo de sugerencias."""
+
+    base_label = record.path.stem.replace("_", " ")
+    yield base_label.lower(), base_label, 1
+
+    doc_metadata = record.sections[0].metadata if record.sections else {}
+    for key in ("tags", "keywords"):
+        raw = doc_metadata.get(key)
+        if raw:
+            for tag in _tokenize(raw):
+                if len(tag) < 3:
+                    continue
+                yield tag, tag, 1.5
+
+    for section in record.sections:
+        if section.title:
+            label = f"{record.path.stem} › {section.title}"
+            yield label.lower(), label, 3
+            for token in _tokenize(section.title):
+                if len(token) < 3:
+                    continue
+                yield token, token, 1.5
 
 
 def _parse_sections(path: pathlib.Path) -> Iterable[DocumentSection]:
@@ -329,6 +1217,37 @@ def _parse_sections(path: pathlib.Path) -> Iterable[DocumentSection]:
         )
 
 
+def _parse_document_compact(
+    path: pathlib.Path,
+) -> tuple[dict[str, str], list[tuple[str, int, str, str]]]:
+    """Variante de ``_parse_sections`` para procesos trabajadores."""
+
+    metadata: dict[str, str] = {}
+    sections = []
+    for section in _parse_sections(path):
+        metadata = section.metadata
+        sections.append((section.title, section.heading_level, section.content, " ".join(section.tokens)))
+    return metadata, sections
+
+
+def _expand_document(
+    path: pathlib.Path,
+    payload: tuple[dict[str, str], list[tuple[str, int, str, str]]],
+) -> list[DocumentSection]:
+    metadata, sections = payload
+    return [
+        DocumentSection(
+            document_path=path,
+            title=title,
+            content=content,
+            metadata=dict(metadata),
+            heading_level=level,
+            tokens=tuple(joined.split(" ")),
+        )
+        for title, level, content, joined in sections
+    ]
+
+
 def _split_front_matter(text: str) -> tuple[dict[str, str], str]:
     if text.startswith("---"):
         parts = text.split("---", 2)
@@ -378,31 +1297,21 @@ def _tokenize_mejorado(text: str) -> list[str]:
     # Tokenización mejorada usando regex de palabras
     tokens = re.findall(r'\b\w+\b', text)
 
-    # Stop words en español para filtrar ruido
-    stopwords = {
-        'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'es', 'son',
-        'era', 'eran', 'fueron', 'sea', 'sean', 'que', 'como', 'para', 'con',
-        'por', 'del', 'desde', 'hasta', 'ante', 'sobre', 'tras', 'durante',
-        'mediante', 'este', 'esta', 'estos', 'estas', 'este', 'esta',
-        'esto', 'estos', 'estas', 'aquel', 'aquella', 'aquellos', 'aquellas',
-        'uno', 'una', 'unos', 'unas', 'todo', 'toda', 'todos', 'todas',
-        'muy', 'más', 'menos', 'mucho', 'poco', 'también', 'tampoco',
-        'siempre', 'nunca', 'aquí', 'allí', 'allá', 'acá', 'hoy', 'ayer',
-        'mañana', 'anoche', 'ahora', 'entonces', 'después', 'antes',
-        'primero', 'primera', 'último', 'última', 'primero', 'primera',
-        'segundo', 'segunda', 'tercero', 'tercera', 'cuarto', 'cuarta',
-        'quinto', 'quinta', 'sexto', 'séptimo', 'octavo', 'noveno', 'décimo'
-    }
-
     # Filtrar tokens: longitud mínima 3 caracteres, no stop words
     tokens_filtrados = [
         token for token in tokens
-        if len(token) >= 3 and token not in stopwords
+        if len(token) >= 3 and token not in _STOPWORDS
     ]
 
     return tokens_filtrados
 
 
+def _bm25_term_score(idf: float, freq: int, length: int, avg_length: float) -> float:
+    numerator = freq * (_BM25_K1 + 1)
+    denominator = freq + _BM25_K1 * (1 - _BM25_B + _BM25_B * (length / avg_length))
+    return idf * (numerator / denominator)
+
+
 def _term_frequencies(tokens: Sequence[str]) -> dict[str, float]:
     frequencies: dict[str, float] = {}
     if not tokens:
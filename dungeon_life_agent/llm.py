@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Mapping, Protocol
+import asyncio
+import json
+import ssl
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator, Mapping, Protocol, Sequence
+from urllib.parse import urlsplit
 
 
 class LanguageModelClient(Protocol):
@@ -19,32 +23,300 @@ class OllamaClient:
 
     model: str
     host: str = "http://localhost:11434"
+    # Any ``requests.Session``-compatible object; created on first use if omitted.
+    session: Any = field(default=None, repr=False, compare=False)
 
     def __post_init__(self) -> None:
-        self._session = None
+        self._session = self.session
 
     def generate(self, prompt: str, **kwargs: Any) -> str:
-        if self._session is None:
-            import requests
-
-            self._session = requests.Session()
-        payload: dict[str, Any] = {
-            "model": kwargs.get("model", self.model),
-            "prompt": prompt,
-            "stream": False,
-        }
-        options = kwargs.get("options")
-        if isinstance(options, Mapping):
-            payload["options"] = dict(options)
-        response = self._session.post(
+        response = self._get_session().post(
             f"{self.host.rstrip('/')}/api/generate",
-            json=payload,
+            json=_generate_payload(self.model, prompt, kwargs, stream=False),
             timeout=kwargs.get("timeout", 120),
         )
         response.raise_for_status()
         data = response.json()
         return data.get("response", "")
 
+    def generate_stream(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        """Yield completion text as Ollama produces it (NDJSON ``stream: true``)."""
+
+        response = self._get_session().post(
+            f"{self.host.rstrip('/')}/api/generate",
+            json=_generate_payload(self.model, prompt, kwargs, stream=True),
+            timeout=kwargs.get("timeout", 120),
+            stream=True,
+        )
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                piece, done = _parse_stream_line(line)
+                if piece:
+                    yield piece
+                if done:
+                    return
+
+    def _get_session(self):
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        return self._session
+
+
+def _generate_payload(model: str, prompt: str, kwargs: Mapping[str, Any], *, stream: bool) -> dict[str, Any]:
+    payload: dict[str, Any] = {
+        "model": kwargs.get("model", model),
+        "prompt": prompt,
+        "stream": stream,
+    }
+    options = kwargs.get("options")
+    if isinstance(options, Mapping):
+        payload["options"] = dict(options)
+    return payload
+
+
+def _parse_stream_line(line: bytes | str) -> tuple[str, bool]:
+    """Decode one NDJSON line of a streamed completion into ``(text, done)``."""
+
+    line = line.strip()
+    if not line:
+        return "", False
+    data = json.loads(line)
+    if data.get("error"):
+        raise RuntimeError(f"Ollama stream error: {data['error']}")
+    return data.get("response", ""), bool(data.get("done"))
+
+
+class OllamaHTTPError(RuntimeError):
+    """Non-2xx answer from an Ollama endpoint."""
+
+    def __init__(self, status: int, reason: str, body: str = "") -> None:
+        super().__init__(f"Ollama answered {status} {reason}: {body[:200]}")
+        self.status = status
+        self.reason = reason
+
+
+class _AsyncConnectionPool:
+    """Keep-alive HTTP/1.1 connections to a single host, built on asyncio streams.
+
+    At most ``max_connections`` requests are in flight at once; idle
+    connections are reused by later requests. The pool belongs to the event
+    loop that first used it.
+    """
+
+    def __init__(self, host: str, *, max_connections: int) -> None:
+        parts = urlsplit(host if "://" in host else f"http://{host}")
+        self.scheme = parts.scheme or "http"
+        self.hostname = parts.hostname or "localhost"
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.base_path = parts.path.rstrip("/")
+        self._ssl = ssl.create_default_context() if self.scheme == "https" else None
+        self._limit = asyncio.Semaphore(max(1, max_connections))
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def post_json(self, path: str, payload: Mapping[str, Any], *, timeout: float) -> Any:
+        body = json.dumps(payload).encode("utf-8")
+        async with self._limit:
+            status, reason, data = await asyncio.wait_for(self._request(path, body), timeout)
+        text = data.decode("utf-8", errors="replace")
+        if not 200 <= status < 300:
+            raise OllamaHTTPError(status, reason, text)
+        return json.loads(text) if text else {}
+
+    async def stream_lines(self, path: str, payload: Mapping[str, Any], *, timeout: float) -> AsyncIterator[bytes]:
+        """POST ``payload`` and yield the response body line by line as it arrives.
+
+        ``timeout`` bounds the wait for each piece, not the whole stream. A
+        stream always opens its own connection, which joins the idle pool only
+        when the body was read to the end.
+        """
+
+        body = json.dumps(payload).encode("utf-8")
+        async with self._limit:
+            reader, writer = await asyncio.wait_for(self._connect(), timeout)
+            try:
+                status, reason, headers = await asyncio.wait_for(
+                    _exchange(reader, writer, self._head(path, len(body)) + body), timeout
+                )
+                if not 200 <= status < 300:
+                    data = await asyncio.wait_for(_read_body(reader, headers), timeout)
+                    raise OllamaHTTPError(status, reason, data.decode("utf-8", errors="replace"))
+                pending = b""
+                async for piece in _iter_body(reader, headers, timeout):
+                    pending += piece
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        yield line
+                if pending:
+                    yield pending
+            except BaseException:
+                writer.close()
+                raise
+            framed = "content-length" in headers or headers.get("transfer-encoding", "").lower() == "chunked"
+            if framed and headers.get("connection", "").lower() != "close":
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:  # pragma: no cover - already closed by the server
+                pass
+
+    async def _request(self, path: str, body: bytes) -> tuple[int, str, bytes]:
+        head = self._head(path, len(body))
+        reused = bool(self._idle)
+        reader, writer = self._idle.pop() if reused else await self._connect()
+        try:
+            try:
+                status, reason, headers = await _exchange(reader, writer, head + body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The server dropped an idle connection: retry once on a fresh one.
+                writer.close()
+                reader, writer = await self._connect()
+                status, reason, headers = await _exchange(reader, writer, head + body)
+            data = await _read_body(reader, headers)
+        except BaseException:
+            writer.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return status, reason, data
+
+    def _head(self, path: str, length: int) -> bytes:
+        return (
+            f"POST {self.base_path}{path} HTTP/1.1\r\n"
+            f"Host: {self.hostname}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            "Accept: application/json\r\n"
+            f"Content-Length: {length}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode("latin-1")
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_connection(self.hostname, self.port, ssl=self._ssl)
+
+
+async def _exchange(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, request: bytes
+) -> tuple[int, str, dict[str, str]]:
+    writer.write(request)
+    await writer.drain()
+    return await _read_head(reader)
+
+
+async def _read_head(reader: asyncio.StreamReader) -> tuple[int, str, dict[str, str]]:
+    status_line = (await reader.readuntil(b"\r\n")).decode("latin-1").rstrip("\r\n")
+    _, status, *reason = status_line.split(" ", 2)
+    headers: dict[str, str] = {}
+    while True:
+        line = (await reader.readuntil(b"\r\n")).decode("latin-1").rstrip("\r\n")
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(status), reason[0] if reason else "", headers
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Mapping[str, str]) -> bytes:
+    return b"".join([piece async for piece in _iter_body(reader, headers, None)])
+
+
+async def _iter_body(
+    reader: asyncio.StreamReader, headers: Mapping[str, str], timeout: float | None
+) -> AsyncIterator[bytes]:
+    """Yield the body as it arrives: chunked, ``Content-Length`` or until EOF."""
+
+    async def within(awaitable):
+        return await (asyncio.wait_for(awaitable, timeout) if timeout is not None else awaitable)
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await within(reader.readuntil(b"\r\n"))).split(b";", 1)[0], 16)
+            if size == 0:
+                await within(reader.readuntil(b"\r\n"))
+                return
+            yield await within(reader.readexactly(size))
+            await within(reader.readexactly(2))
+    length = headers.get("content-length")
+    if length is not None:
+        remaining = int(length)
+        while remaining > 0:
+            piece = await within(reader.read(min(remaining, 65536)))
+            if not piece:
+                raise asyncio.IncompleteReadError(piece, remaining)
+            remaining -= len(piece)
+            yield piece
+        return
+    while piece := await within(reader.read(65536)):
+        yield piece
+
+
+@dataclass
+class AsyncOllamaClient:
+    """asyncio client for Ollama sharing one keep-alive connection pool.
+
+    The same instance can serve text generation (``generate``) and
+    embeddings (``embed``, with the response shape of the official ``ollama``
+    module), so both kinds of request reuse the same connections.
+    """
+
+    model: str
+    host: str = "http://localhost:11434"
+    max_connections: int = 8
+    timeout: float = 120.0
+    _pool: _AsyncConnectionPool | None = field(default=None, init=False, repr=False)
+
+    async def generate(self, prompt: str, **kwargs: Any) -> str:
+        payload = _generate_payload(self.model, prompt, kwargs, stream=False)
+        data = await self._post("/api/generate", payload, kwargs.get("timeout"))
+        return data.get("response", "")
+
+    async def generate_stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        """Async counterpart of :meth:`OllamaClient.generate_stream`."""
+
+        if self._pool is None:
+            self._pool = _AsyncConnectionPool(self.host, max_connections=self.max_connections)
+        lines = self._pool.stream_lines(
+            "/api/generate",
+            _generate_payload(self.model, prompt, kwargs, stream=True),
+            timeout=kwargs.get("timeout") or self.timeout,
+        )
+        finished = False
+        try:
+            async for line in lines:
+                # Keep reading past ``done`` so the connection can be reused.
+                if finished:
+                    continue
+                piece, finished = _parse_stream_line(line)
+                if piece:
+                    yield piece
+        finally:
+            await lines.aclose()
+
+    async def embed(self, *, model: str | None = None, input: Sequence[str]) -> dict:
+        return await self._post("/api/embed", {"model": model or self.model, "input": list(input)}, None)
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _post(self, path: str, payload: Mapping[str, Any], timeout: float | None) -> dict:
+        if self._pool is None:
+            self._pool = _AsyncConnectionPool(self.host, max_connections=self.max_connections)
+        return await self._pool.post_json(path, payload, timeout=timeout or self.timeout)
+
 
 class EchoLanguageModel:
     """Testing client that echoes prompts with a configurable suffix."""
@@ -53,6 +325,18 @@ class EchoLanguageModel:
         suffix = kwargs.get("suffix", "[sin respuesta de modelo]")
         return f"{prompt}\n\n{suffix}"
 
+    def generate_stream(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        """Yield the echoed text word by word, mimicking a streamed completion."""
+
+        text = self.generate(prompt, **kwargs)
+        start = 0
+        for index, char in enumerate(text):
+            if char.isspace():
+                yield text[start : index + 1]
+                start = index + 1
+        if start < len(text):
+            yield text[start:]
+
 
 @dataclass(frozen=True)
 class OllamaServiceStatus:
@@ -115,6 +399,8 @@ def probe_ollama_service(
 __all__ = [
     "LanguageModelClient",
     "OllamaClient",
+    "AsyncOllamaClient",
+    "OllamaHTTPError",
     "EchoLanguageModel",
     "OllamaServiceStatus",
     "probe_ollama_service",
@@ -2,13 +2,25 @@
 
 from __future__ import annotations
 
+import array
+import bisect
+import contextlib
+import heapq
 import json
+import math
+import os
 import pathlib
 import re
+import sqlite3
+import threading
+import time
 import uuid
 from dataclasses import asdict, dataclass
-from datetime import UTC, datetime
-from typing import Iterable, Sequence
+from datetime import UTC, datetime, timedelta
+from typing import Iterable, Iterator, Protocol, Sequence
+
+from . import vector_math
+from .vector_store import VectorStore
 
 _TOKEN_RE = re.compile(r"[\wáéíóúñü]+", re.IGNORECASE)
 
@@ -30,51 +42,622 @@ class MemoryRecord:
         return self.channel.lower() == name.lower()
 
 
+class _SupportsEmbed(Protocol):
+    """Contrato mínimo del embedder usado para la búsqueda semántica."""
+
+    def embed(self, texts: Iterable[str]):
+        ...
+
+
+class _JsonFileStorage:
+    """Un único archivo JSON con todos los registros, reescrito en cada evento."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+
+    def load(self) -> list[dict]:
+        return _read_snapshot(self.path)
+
+    def append(self, record: MemoryRecord, records: Sequence[MemoryRecord]) -> None:
+        _write_snapshot(self.path, records)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _AppendLogStorage:
+    """Instantánea JSON más un registro JSONL de solo anexado.
+
+    Cada evento añade una línea al log (``<ruta>.log``); ``fsync`` se agrupa
+    cada ``fsync_every`` eventos o ``fsync_interval`` segundos. Cuando el log
+    alcanza el tamaño de la instantánea (con un mínimo de
+    ``compact_min_records``) se compacta: se reescribe la instantánea de
+    forma atómica y se vacía el log, así que el coste amortizado de capturar
+    sigue siendo O(1). Al cargar se lee la instantánea y se reproduce el log;
+    una última línea truncada por un corte se descarta.
+    """
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        *,
+        fsync_every: int = 32,
+        fsync_interval: float = 1.0,
+        compact_min_records: int = 1000,
+    ) -> None:
+        self.path = path
+        self.log_path = path.with_name(f"{path.name}.log")
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self.compact_min_records = max(1, compact_min_records)
+        self._stream = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._snapshot_records = 0
+        self._log_records = 0
+        self._torn_tail_at: int | None = None
+
+    def load(self) -> list[dict]:
+        entries = _read_snapshot(self.path)
+        self._snapshot_records = len(entries)
+        seen = {entry["identifier"] for entry in entries}
+        self._log_records = 0
+        self._torn_tail_at = None
+        try:
+            with self.log_path.open("rb") as stream:
+                complete = 0
+                for line in stream:
+                    if not line.endswith(b"\n"):
+                        # Escritura interrumpida: se recorta antes del próximo anexado
+                        # para que el siguiente evento no quede pegado a este resto.
+                        self._torn_tail_at = complete
+                        break
+                    complete += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        continue
+                    self._log_records += 1
+                    # Un corte entre compactar y vaciar el log deja duplicados.
+                    if entry["identifier"] not in seen:
+                        seen.add(entry["identifier"])
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def append(self, record: MemoryRecord, records: Sequence[MemoryRecord]) -> None:
+        if self._stream is None:
+            if self._torn_tail_at is not None:
+                with self.log_path.open("r+b") as stream:
+                    stream.truncate(self._torn_tail_at)
+                self._torn_tail_at = None
+            self._stream = self.log_path.open("a", encoding="utf-8")
+        self._stream.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+        self._stream.flush()
+        self._log_records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.flush()
+        if self._log_records >= max(self.compact_min_records, self._snapshot_records):
+            self.compact(records)
+
+    def compact(self, records: Sequence[MemoryRecord]) -> None:
+        self.flush()
+        _write_snapshot(self.path, records)
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        with self.log_path.open("w", encoding="utf-8"):
+            pass
+        self._snapshot_records = len(records)
+        self._log_records = 0
+
+    def flush(self) -> None:
+        if self._stream is not None and self._unsynced:
+            self._stream.flush()
+            os.fsync(self._stream.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class _SqliteStorage:
+    """Base de datos SQLite (WAL) consultada directamente con SQL.
+
+    Los registros no se cargan en memoria: ``records`` guarda las columnas
+    del :class:`MemoryRecord` con índices por canal y por fecha, y la tabla
+    virtual FTS5 ``records_fts`` indexa resumen, contenido, etiquetas y
+    decisiones para que ``search`` ordene con ``bm25()``; ``channels`` lleva
+    la cuenta de registros por canal. Cada captura es su
+    propia transacción, así que varios procesos pueden escribir a la vez sin
+    perder eventos.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with self._transaction():
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS records ("
+                    "id INTEGER PRIMARY KEY, identifier TEXT NOT NULL UNIQUE, timestamp TEXT NOT NULL, "
+                    "channel TEXT NOT NULL, channel_key TEXT NOT NULL, author TEXT NOT NULL, "
+                    "summary TEXT NOT NULL, content TEXT NOT NULL, tags TEXT NOT NULL, decisions TEXT NOT NULL)"
+                )
+                self._connection.execute("CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp)")
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS records_channel ON records (channel_key, timestamp)"
+                )
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS channels (channel TEXT PRIMARY KEY, records INTEGER NOT NULL)"
+                )
+                self._connection.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5("
+                    "summary, content, tags, decisions, content='records', content_rowid='id', "
+                    "tokenize=\"unicode61 remove_diacritics 0 tokenchars '_'\")"
+                )
+        except sqlite3.OperationalError as exc:
+            self._connection.close()
+            raise RuntimeError(f"No se pudo preparar la memoria SQLite en {path}: {exc}") from exc
+
+    def load(self) -> list[dict]:
+        return []
+
+    def append(self, record: MemoryRecord, records: Sequence[MemoryRecord]) -> None:
+        self.insert_many([record])
+
+    def insert_many(self, records: Iterable[MemoryRecord]) -> int:
+        """Inserta los registros nuevos (ignora identificadores ya presentes)."""
+
+        inserted = 0
+        with self._lock, self._transaction(immediate=True):
+            for record in records:
+                tags = " ".join(record.tags)
+                decisions = " ".join(record.decisions)
+                cursor = self._connection.execute(
+                    "INSERT OR IGNORE INTO records "
+                    "(identifier, timestamp, channel, channel_key, author, summary, content, tags, decisions) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        record.identifier,
+                        record.timestamp,
+                        record.channel,
+                        record.channel.lower(),
+                        record.author,
+                        record.summary,
+                        record.content,
+                        json.dumps(list(record.tags), ensure_ascii=False),
+                        json.dumps(list(record.decisions), ensure_ascii=False),
+                    ),
+                )
+                if not cursor.rowcount:
+                    continue
+                self._connection.execute(
+                    "INSERT INTO records_fts (rowid, summary, content, tags, decisions) VALUES (?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, record.summary, record.content, tags, decisions),
+                )
+                self._connection.execute(
+                    "INSERT INTO channels (channel, records) VALUES (?, 1) "
+                    "ON CONFLICT (channel) DO UPDATE SET records = records + 1",
+                    (record.channel,),
+                )
+                inserted += 1
+        return inserted
+
+    def search(
+        self,
+        tokens: Sequence[str],
+        limit: int,
+        channels: set[str] | None,
+        since: str | None = None,
+        until: str | None = None,
+    ) -> list[MemoryRecord]:
+        expression = " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+        sql = (
+            f"SELECT {_SQL_COLUMNS} FROM records_fts JOIN records r ON r.id = records_fts.rowid "
+            "WHERE records_fts MATCH ?"
+        )
+        parameters: list[object] = [expression]
+        if channels:
+            sql += f" AND r.channel_key IN ({','.join('?' * len(channels))})"
+            parameters.extend(sorted(channels))
+        if since is not None:
+            sql += " AND r.timestamp >= ?"
+            parameters.append(since)
+        if until is not None:
+            sql += " AND r.timestamp < ?"
+            parameters.append(until)
+        sql += " ORDER BY bm25(records_fts), r.timestamp DESC LIMIT ?"
+        parameters.append(limit)
+        return self._select(sql, parameters)
+
+    def list_recent(self, limit: int) -> list[MemoryRecord]:
+        if limit <= 0:
+            return []
+        return self._select(
+            f"SELECT {_SQL_COLUMNS} FROM records r ORDER BY r.timestamp DESC, r.rowid DESC LIMIT ?", [limit]
+        )
+
+    def channel_counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute("SELECT channel, records FROM channels ORDER BY channel").fetchall()
+        return {channel: count for channel, count in rows}
+
+    def compact(self, records: Sequence[MemoryRecord]) -> None:
+        """Fusiona los segmentos FTS5 y trunca el WAL."""
+
+        with self._lock:
+            self._connection.execute("INSERT INTO records_fts (records_fts) VALUES ('optimize')")
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _select(self, sql: str, parameters: Sequence[object]) -> list[MemoryRecord]:
+        with self._lock:
+            rows = self._connection.execute(sql, parameters).fetchall()
+        return [
+            MemoryRecord(
+                identifier=row[0],
+                timestamp=row[1],
+                channel=row[2],
+                author=row[3],
+                summary=row[4],
+                content=row[5],
+                tags=tuple(json.loads(row[6])),
+                decisions=tuple(json.loads(row[7])),
+            )
+            for row in rows
+        ]
+
+    @contextlib.contextmanager
+    def _transaction(self, *, immediate: bool = False) -> Iterator[None]:
+        self._connection.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+_SQL_COLUMNS = "r.identifier, r.timestamp, r.channel, r.author, r.summary, r.content, r.tags, r.decisions"
+_BACKENDS = ("json", "log", "sqlite")
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+
+
+class _MemoryIndex:
+    """Índice invertido incremental para BM25 sobre los registros.
+
+    Las postings se agrupan por canal (``token → canal → {registro: frecuencia}``),
+    así que una búsqueda filtrada solo recorre los registros de esos canales.
+    Los registros se identifican por su posición en la lista de la memoria.
+    """
+
+    def __init__(self) -> None:
+        self.postings: dict[str, dict[str, dict[int, int]]] = {}
+        self.document_frequency: dict[str, int] = {}
+        self.lengths: list[int] = []
+        self.total_length = 0
+
+    def add(self, position: int, channel: str, tokens: Sequence[str]) -> None:
+        channel_key = channel.lower()
+        for token, freq in _term_frequencies(tokens).items():
+            by_channel = self.postings.setdefault(token, {})
+            by_channel.setdefault(channel_key, {})[position] = freq
+            self.document_frequency[token] = self.document_frequency.get(token, 0) + 1
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+
+    def score(
+        self, tokens: Sequence[str], channels: set[str] | None, allowed: set[int] | None = None
+    ) -> dict[int, float]:
+        total = len(self.lengths)
+        avg_length = (self.total_length / total) if total else 1.0
+        accumulators: dict[int, float] = {}
+        for token in tokens:
+            by_channel = self.postings.get(token)
+            if not by_channel:
+                continue
+            df = self.document_frequency[token]
+            idf = math.log((total - df + 0.5) / (df + 0.5) + 1.0)
+            groups = by_channel.values() if channels is None else (by_channel.get(name, {}) for name in channels)
+            for entries in groups:
+                if allowed is None:
+                    matches: Iterable[tuple[int, int]] = entries.items()
+                elif len(allowed) < len(entries):
+                    # Ventana temporal más pequeña que la lista: se recorre la ventana.
+                    matches = ((position, entries[position]) for position in allowed if position in entries)
+                else:
+                    matches = ((position, freq) for position, freq in entries.items() if position in allowed)
+                for position, freq in matches:
+                    length = self.lengths[position]
+                    denominator = freq + _BM25_K1 * (1 - _BM25_B + _BM25_B * (length / (avg_length or 1.0)))
+                    accumulators[position] = accumulators.get(position, 0.0) + idf * (
+                        freq * (_BM25_K1 + 1) / denominator
+                    )
+        return accumulators
+
+
+_HYBRID_CANDIDATES = 50
+# Por encima de este número de celdas (filas × dimensión) el barrido exacto deja
+# de caber en unos pocos milisegundos y se preselecciona con la proyección.
+_EXACT_SCAN_CELLS = 4_000_000
+_SKETCH_DIMENSION = 64
+_SKETCH_OVERSAMPLING = 20
+
+
+class _MemoryVectors:
+    """Embeddings de los registros en una matriz ``float32`` contigua.
+
+    La fila ``i`` corresponde al registro en la posición ``i`` de la memoria.
+    Los vectores se persisten en un :class:`VectorStore` indexado por
+    identificador de registro, así que al arrancar solo se calculan los de
+    registros que aún no tenían vector (por ejemplo tras un corte).
+
+    Con NumPy se mantiene además una proyección aleatoria de la matriz
+    (:class:`vector_math.RandomProjection`): en memorias grandes la búsqueda
+    barre primero esa matriz reducida y solo reordena con los vectores
+    completos una lista corta de candidatos. Sin NumPy (extra ``fast``) cada
+    consulta recorre la matriz completa en Python puro: sirve para memorias
+    de unos pocos miles de registros, no para cientos de miles.
+    """
+
+    def __init__(self, embedder: _SupportsEmbed, path: pathlib.Path, *, precision: str = "fp16") -> None:
+        self.embedder = embedder
+        self.store = VectorStore(path, namespace=_embedder_namespace(embedder), precision=precision)
+        self.rows = array.array("f")
+        self.sketch = array.array("f")
+        self.dimension: int | None = None
+        self._projection: vector_math.RandomProjection | None = None
+
+    def __len__(self) -> int:
+        return len(self.rows) // self.dimension if self.dimension else 0
+
+    def load(self, records: Sequence[MemoryRecord]) -> None:
+        self.rows = array.array("f")
+        self.sketch = array.array("f")
+        self.dimension = None
+        self._projection = None
+        if not records:
+            return
+        rows, missing = self.store.export_rows([record.identifier for record in records])
+        # Un vector nuevo (o, si no falta ninguno, el del primer registro) confirma
+        # que el almacén sigue teniendo la dimensión que produce el embedder.
+        fresh, persist = self._embed([records[position] for position in missing or [0]])
+        stored_dimension = self.store.dimension
+        if stored_dimension is not None and len(fresh[0]) != stored_dimension:
+            # Con el embedder en fallback el almacén no se toca: la sesión usa
+            # solo vectores en memoria y el siguiente arranque lo reintenta.
+            if persist:
+                self.store.clear()
+            stored_dimension = None
+            missing = list(range(len(records)))
+            fresh, persist = self._embed(records)
+        if missing and persist:
+            for position, vector in zip(missing, fresh, strict=True):
+                self.store.add(records[position].identifier, vector)
+            self.store.flush()
+        if stored_dimension is None:
+            for vector in fresh:
+                self._append(vector)
+            return
+        for position, vector in zip(missing, fresh if missing else (), strict=True):
+            rows[position * stored_dimension : (position + 1) * stored_dimension] = array.array("f", vector)
+        self._configure(stored_dimension)
+        self.rows = rows
+        if self._projection is not None:
+            self.sketch = self._projection.apply_rows(rows)
+
+    def prepare(self, record: MemoryRecord) -> tuple[list[float], bool]:
+        """Embebe un registro sin modificar nada; falla si la dimensión no encaja.
+
+        Devuelve el vector y si puede persistirse (``False`` si el embedder
+        tuvo que recurrir a su fallback).
+        """
+
+        vectors, persist = self._embed([record])
+        if self.dimension is not None and len(vectors[0]) != self.dimension:
+            raise ValueError(
+                f"Dimensión de embedding incompatible: {len(vectors[0])} (se esperaba {self.dimension})"
+            )
+        return vectors[0], persist
+
+    def add(self, record: MemoryRecord, vector: Sequence[float], *, persist: bool = True) -> None:
+        if persist:
+            self.store.add(record.identifier, vector)
+        self._append(vector)
+
+    def embed_query(self, query: str) -> list[float]:
+        return vector_math.l2_normalize(self.embedder.embed([query])[0])
+
+    def top(self, query: Sequence[float], limit: int, positions: Sequence[int] | None) -> list[tuple[int, float]]:
+        if self.dimension is None:
+            return []
+        count = len(self) if positions is None else len(positions)
+        if self._projection is None or count * self.dimension <= _EXACT_SCAN_CELLS:
+            return vector_math.top_dot_rows(self.rows, self.dimension, query, limit, positions)
+        shortlist = vector_math.top_dot_rows(
+            self.sketch, _SKETCH_DIMENSION, self._projection.apply(query), limit * _SKETCH_OVERSAMPLING, positions
+        )
+        return vector_math.top_dot_rows(
+            self.rows, self.dimension, query, limit, [position for position, _ in shortlist]
+        )
+
+    def scores(self, query: Sequence[float], positions: Sequence[int]) -> list[float]:
+        if self.dimension is None:
+            return [0.0] * len(positions)
+        return vector_math.dot_rows(self.rows, self.dimension, query, positions)
+
+    def flush(self) -> None:
+        self.store.flush()
+
+    def close(self) -> None:
+        self.store.flush()
+        self.store.close()
+
+    def _embed(self, records: Sequence[MemoryRecord]) -> tuple[list[list[float]], bool]:
+        fallbacks = getattr(self.embedder, "fallback_batches", 0)
+        vectors = vector_math.l2_normalize_many(self.embedder.embed([_record_text(record) for record in records]))
+        return vectors, getattr(self.embedder, "fallback_batches", 0) == fallbacks
+
+    def _configure(self, dimension: int) -> None:
+        self.dimension = dimension
+        if vector_math.HAS_NUMPY:
+            self._projection = vector_math.RandomProjection(dimension, _SKETCH_DIMENSION)
+
+    def _append(self, vector: Sequence[float]) -> None:
+        if self.dimension is None:
+            self._configure(len(vector))
+        elif len(vector) != self.dimension:
+            raise ValueError(f"Dimensión de embedding incompatible: {len(vector)} (se esperaba {self.dimension})")
+        self.rows.extend(vector)
+        if self._projection is not None:
+            self.sketch.extend(self._projection.apply(vector))
+
+
 class CollectiveMemory:
-    """Persiste eventos colaborativos y permite consultarlos semánticamente."""
+    """Persiste eventos colaborativos y permite consultarlos semánticamente.
+
+    ``backend="json"`` reescribe el archivo completo en cada captura;
+    ``backend="log"`` añade cada evento a un log JSONL y compacta de vez en
+    cuando (ver :class:`_AppendLogStorage`), de modo que capturar no depende
+    del tamaño de la memoria. ``backend="sqlite"`` guarda los eventos en una
+    base de datos compartible entre procesos y resuelve las consultas con SQL
+    (ver :class:`_SqliteStorage`); su ruta por defecto termina en ``.sqlite3``.
 
-    def __init__(self, storage_path: str | pathlib.Path | None = None):
+    Con un ``embedder`` (``EmbeddingGemma``, ``EmbeddingSystem``…) cada registro
+    se embebe una vez al capturarse y la búsqueda fusiona BM25 con la
+    similitud coseno: ``alpha · bm25_normalizado + (1 - alpha) · (coseno + 1) / 2``,
+    igual que el pipeline de documentación. Los vectores se guardan junto a la
+    memoria en ``<ruta>.dlavec``. No está disponible con ``backend="sqlite"``,
+    que no mantiene los registros en memoria.
+    """
+
+    def __init__(
+        self,
+        storage_path: str | pathlib.Path | None = None,
+        *,
+        backend: str = "json",
+        fsync_every: int = 32,
+        fsync_interval: float = 1.0,
+        compact_min_records: int = 1000,
+        embedder: _SupportsEmbed | None = None,
+        alpha: float = 0.6,
+        vector_precision: str = "fp16",
+    ):
+        if backend not in _BACKENDS:
+            raise ValueError(f"Backend de memoria desconocido: {backend}. Opciones válidas: {', '.join(_BACKENDS)}")
+        if embedder is not None and backend == "sqlite":
+            raise ValueError("La búsqueda semántica de la memoria no está disponible con backend='sqlite'")
         base_path = pathlib.Path(storage_path) if storage_path else pathlib.Path("Documentacion/memoria_colectiva.json")
+        if backend == "sqlite" and not storage_path:
+            base_path = base_path.with_suffix(".sqlite3")
         self.path = base_path.expanduser().resolve()
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
+        self._storage: _JsonFileStorage | _AppendLogStorage | _SqliteStorage
+        self._database: _SqliteStorage | None = None
+        if backend == "sqlite":
+            self._storage = self._database = _SqliteStorage(self.path)
+        elif backend == "log":
+            self._storage = _AppendLogStorage(
+                self.path,
+                fsync_every=fsync_every,
+                fsync_interval=fsync_interval,
+                compact_min_records=compact_min_records,
+            )
+        else:
+            self._storage = _JsonFileStorage(self.path)
+        # ``_records`` conserva el orden de inserción (las posiciones son las del
+        # índice invertido); ``_timeline`` ordena esas posiciones por fecha.
         self._records: list[MemoryRecord] = []
-        self._tokens: dict[str, tuple[str, ...]] = {}
+        self._index = _MemoryIndex()
+        self._timeline_keys: list[str] = []
+        self._timeline: list[int] = []
+        self._channel_counts: dict[str, int] = {}
+        self._channel_positions: dict[str, list[int]] = {}
+        self.alpha = min(max(alpha, 0.0), 1.0)
+        self._vectors: _MemoryVectors | None = None
+        if embedder is not None:
+            self._vectors = _MemoryVectors(
+                embedder, self.path.with_name(f"{self.path.name}.dlavec"), precision=vector_precision
+            )
         self._load()
 
     # ------------------------------------------------------------------
     # Persistencia
     def _load(self) -> None:
-        if not self.path.exists():
-            self._records = []
-            self._tokens = {}
-            return
-        with self.path.open("r", encoding="utf-8") as stream:
-            raw = json.load(stream)
-        self._records = [
-            MemoryRecord(
-                identifier=entry["identifier"],
-                timestamp=entry["timestamp"],
-                channel=entry.get("channel", "desconocido"),
-                author=entry.get("author", "desconocido"),
-                summary=entry.get("summary", ""),
-                content=entry.get("content", ""),
-                tags=tuple(entry.get("tags", ())),
-                decisions=tuple(entry.get("decisions", ())),
-            )
-            for entry in raw
-        ]
-        self._rebuild_tokens()
+        self._records = [_record_from_dict(entry) for entry in self._storage.load()]
+        self._rebuild_index()
+        if self._vectors is not None:
+            self._vectors.load(self._records)
 
-    def _persist(self) -> None:
-        payload = [asdict(record) for record in self._records]
-        with self.path.open("w", encoding="utf-8") as stream:
-            json.dump(payload, stream, ensure_ascii=False, indent=2)
+    def flush(self) -> None:
+        """Fuerza a disco los eventos pendientes de ``fsync``."""
 
-    def _rebuild_tokens(self) -> None:
-        self._tokens = {
-            record.identifier: _tokenize(" ".join((record.summary, record.content, " ".join(record.tags), " ".join(record.decisions))))
-            for record in self._records
-        }
+        self._storage.flush()
+        if self._vectors is not None:
+            self._vectors.flush()
+
+    def compact(self) -> None:
+        """Vuelca el log a la instantánea (``log``) u optimiza el índice FTS5 (``sqlite``)."""
+
+        if isinstance(self._storage, (_AppendLogStorage, _SqliteStorage)):
+            self._storage.compact(self._records)
+        if self._vectors is not None:
+            self._vectors.flush()
+
+    def close(self) -> None:
+        self._storage.close()
+        if self._vectors is not None:
+            self._vectors.close()
+
+    def _rebuild_index(self) -> None:
+        records = self._records
+        self._index = _MemoryIndex()
+        self._channel_counts = {}
+        self._channel_positions = {}
+        for position, record in enumerate(records):
+            self._index.add(position, record.channel, _record_tokens(record))
+            self._channel_counts[record.channel] = self._channel_counts.get(record.channel, 0) + 1
+            self._channel_positions.setdefault(record.channel.lower(), []).append(position)
+        # Empates por fecha: orden de inserción, así ``list_recent`` da primero el más nuevo.
+        self._timeline = sorted(range(len(records)), key=lambda position: (records[position].timestamp, position))
+        self._timeline_keys = [records[position].timestamp for position in self._timeline]
+
+    def _track(self, record: MemoryRecord) -> None:
+        # El embedder puede fallar: se consulta antes de tocar ninguna estructura.
+        prepared = self._vectors.prepare(record) if self._vectors is not None else None
+        position = len(self._records)
+        self._records.append(record)
+        self._index.add(position, record.channel, _record_tokens(record))
+        self._channel_counts[record.channel] = self._channel_counts.get(record.channel, 0) + 1
+        self._channel_positions.setdefault(record.channel.lower(), []).append(position)
+        if self._vectors is not None and prepared is not None:
+            vector, persist = prepared
+            self._vectors.add(record, vector, persist=persist)
+        # Lo habitual es anexar al final; un reloj que retrocede inserta en medio.
+        slot = bisect.bisect_right(self._timeline_keys, record.timestamp)
+        self._timeline_keys.insert(slot, record.timestamp)
+        self._timeline.insert(slot, position)
 
     # ------------------------------------------------------------------
     # Operaciones públicas
@@ -100,41 +683,212 @@ class CollectiveMemory:
             tags=tuple(sorted({tag.strip() for tag in tags or () if tag.strip()})),
             decisions=tuple(decisions or ()),
         )
-        self._records.append(entry)
-        self._tokens[entry.identifier] = _tokenize(
-            " ".join((entry.summary, entry.content, " ".join(entry.tags), " ".join(entry.decisions)))
-        )
-        self._persist()
+        if self._database is None:
+            self._track(entry)
+        self._storage.append(entry, self._records)
         return entry
 
-    def search(self, query: str, limit: int = 5, *, channels: Iterable[str] | None = None) -> list[MemoryRecord]:
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        *,
+        channels: Iterable[str] | None = None,
+        since: str | datetime | None = None,
+        until: str | datetime | None = None,
+    ) -> list[MemoryRecord]:
+        """Registros más relevantes según BM25 (fusionado con la similitud coseno si
+        hay ``embedder``); los empates favorecen a los más recientes.
+
+        ``since`` (incluido) y ``until`` (excluido) acotan la fecha de los
+        registros; aceptan ``datetime`` o cadenas ISO 8601.
+        """
+
         tokens = _tokenize(query)
-        if not tokens:
+        if not tokens or limit <= 0:
             return []
         channel_filter = {name.lower() for name in channels} if channels else None
-
-        ranked: list[tuple[float, MemoryRecord]] = []
-        for record in self._records:
-            if channel_filter and record.channel.lower() not in channel_filter:
-                continue
-            record_tokens = self._tokens.get(record.identifier, ())
-            score = 0.0
-            if not record_tokens:
-                continue
-            record_freqs = _term_frequencies(record_tokens)
-            for token in tokens:
-                score += record_freqs.get(token, 0)
-            if score:
-                ranked.append((score, record))
-
-        ranked.sort(key=lambda item: (item[0], item[1].timestamp), reverse=True)
-        return [record for _, record in ranked[:limit]]
+        since_key, until_key = _timestamp_bound(since), _timestamp_bound(until)
+        if self._database is not None:
+            return self._database.search(tokens, limit, channel_filter, since_key, until_key)
+        allowed: set[int] | None = None
+        if since_key is not None or until_key is not None:
+            start, stop = self._window(since_key, until_key)
+            if start >= stop:
+                return []
+            allowed = set(self._timeline[start:stop])
+        if self._vectors is not None:
+            return self._hybrid_search(query, tokens, limit, channel_filter, allowed)
+        scores = self._index.score(tokens, channel_filter, allowed)
+        records = self._records
+        best = heapq.nlargest(
+            limit,
+            (item for item in scores.items() if item[1] > 0),
+            key=lambda item: (item[1], records[item[0]].timestamp),
+        )
+        return [records[position] for position, _ in best]
 
     def list_recent(self, limit: int = 10) -> list[MemoryRecord]:
-        return sorted(self._records, key=lambda record: record.timestamp, reverse=True)[:limit]
+        if limit <= 0:
+            return []
+        if self._database is not None:
+            return self._database.list_recent(limit)
+        return [self._records[position] for position in reversed(self._timeline[-limit:])]
 
     def channels(self) -> list[str]:
-        return sorted({record.channel for record in self._records})
+        return list(self.channel_counts())
+
+    def channel_counts(self) -> dict[str, int]:
+        """Número de registros por canal, ordenado por nombre de canal."""
+
+        if self._database is not None:
+            return self._database.channel_counts()
+        return dict(sorted(self._channel_counts.items()))
+
+    def _hybrid_search(
+        self,
+        query: str,
+        tokens: Sequence[str],
+        limit: int,
+        channel_filter: set[str] | None,
+        allowed: set[int] | None,
+    ) -> list[MemoryRecord]:
+        assert self._vectors is not None
+        pool = max(limit, _HYBRID_CANDIDATES)
+        lexical = self._index.score(tokens, channel_filter, allowed)
+        lexical_top = heapq.nlargest(pool, (item for item in lexical.items() if item[1] > 0), key=lambda item: item[1])
+        query_vector = self._vectors.embed_query(query)
+        # Candidatos: los mejores por coseno (con similitud positiva) más los mejores por BM25.
+        candidates = {
+            position: similarity
+            for position, similarity in self._vectors.top(
+                query_vector, pool, self._filtered_positions(channel_filter, allowed)
+            )
+            if similarity > 0
+        }
+        lexical_only = [position for position, _ in lexical_top if position not in candidates]
+        candidates.update(zip(lexical_only, self._vectors.scores(query_vector, lexical_only), strict=True))
+        max_lexical = lexical_top[0][1] if lexical_top else 0.0
+        alpha = self.alpha
+        fused = {
+            position: alpha * (lexical.get(position, 0.0) / max_lexical if max_lexical > 0 else 0.0)
+            + (1.0 - alpha) * (similarity + 1.0) / 2.0
+            for position, similarity in candidates.items()
+        }
+        records = self._records
+        best = heapq.nlargest(limit, fused.items(), key=lambda item: (item[1], records[item[0]].timestamp))
+        return [records[position] for position, _ in best]
+
+    def _filtered_positions(self, channel_filter: set[str] | None, allowed: set[int] | None) -> list[int] | None:
+        """Filas que cumplen los filtros de canal y fecha (``None`` = todas)."""
+
+        if channel_filter is None:
+            return None if allowed is None else sorted(allowed)
+        positions = list(heapq.merge(*(self._channel_positions.get(name, []) for name in channel_filter)))
+        if allowed is not None:
+            positions = [position for position in positions if position in allowed]
+        return positions
+
+    def _window(self, since: str | None, until: str | None) -> tuple[int, int]:
+        start = bisect.bisect_left(self._timeline_keys, since) if since is not None else 0
+        stop = bisect.bisect_left(self._timeline_keys, until) if until is not None else len(self._timeline_keys)
+        return start, stop
+
+
+def migrate_json_to_sqlite(source: str | pathlib.Path, destination: str | pathlib.Path) -> int:
+    """Copia una memoria ``json``/``log`` a una base SQLite; devuelve los registros nuevos.
+
+    Los identificadores ya presentes en el destino se omiten, así que la
+    migración puede repetirse sin duplicar eventos.
+    """
+
+    source_path = pathlib.Path(source).expanduser().resolve()
+    destination_path = pathlib.Path(destination).expanduser().resolve()
+    destination_path.parent.mkdir(parents=True, exist_ok=True)
+    # La instantánea más el log cubre ambos formatos JSON.
+    entries = _AppendLogStorage(source_path).load()
+    database = _SqliteStorage(destination_path)
+    try:
+        return database.insert_many(_record_from_dict(entry) for entry in entries)
+    finally:
+        database.close()
+
+
+def _record_from_dict(entry: dict) -> MemoryRecord:
+    return MemoryRecord(
+        identifier=entry["identifier"],
+        timestamp=entry["timestamp"],
+        channel=entry.get("channel", "desconocido"),
+        author=entry.get("author", "desconocido"),
+        summary=entry.get("summary", ""),
+        content=entry.get("content", ""),
+        tags=tuple(entry.get("tags", ())),
+        decisions=tuple(entry.get("decisions", ())),
+    )
+
+
+def _read_snapshot(path: pathlib.Path) -> list[dict]:
+    try:
+        with path.open("r", encoding="utf-8") as stream:
+            return list(json.load(stream))
+    except FileNotFoundError:
+        return []
+
+
+def _write_snapshot(path: pathlib.Path, records: Sequence[MemoryRecord]) -> None:
+    """Reescribe la instantánea en un temporal y la sustituye de forma atómica."""
+
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with temporary.open("w", encoding="utf-8") as stream:
+        json.dump([asdict(record) for record in records], stream, ensure_ascii=False, indent=2)
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(temporary, path)
+
+
+def _embedder_namespace(embedder: _SupportsEmbed) -> str:
+    """Identifica modelos y dimensiones del embedder para invalidar vectores de otra configuración."""
+
+    configs = getattr(embedder, "configs", None)
+    if configs:  # EmbeddingSystem
+        models = ",".join(f"{config.name}/{config.dimension}/{config.weight}" for config in configs)
+        return f"{type(embedder).__name__}:{models}:{getattr(embedder, 'default_strategy', '')}"
+    return ":".join(
+        (type(embedder).__name__, str(getattr(embedder, "model", "")), str(getattr(embedder, "dimension", "")))
+    )
+
+
+def _timestamp_bound(value: str | datetime | None) -> str | None:
+    """Normaliza un límite temporal al formato de ``MemoryRecord.timestamp``.
+
+    Las cadenas se interpretan como ISO 8601 (admite ``Z``); sin zona horaria
+    se asume UTC. Así las comparaciones de texto contra las marcas guardadas
+    (``+00:00``) respetan el orden cronológico. Las fracciones de segundo se
+    redondean al segundo siguiente.
+    """
+
+    if value is None:
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        if text.endswith(("Z", "z")):
+            text = f"{text[:-1]}+00:00"
+        value = datetime.fromisoformat(text)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    if value.microsecond:
+        # Las marcas tienen resolución de segundos: redondear hacia arriba
+        # mantiene ``since`` inclusivo y ``until`` exclusivo.
+        value = value.replace(microsecond=0) + timedelta(seconds=1)
+    return value.astimezone(UTC).isoformat(timespec="seconds")
+
+
+def _record_text(record: MemoryRecord) -> str:
+    return " ".join((record.summary, record.content, " ".join(record.tags), " ".join(record.decisions)))
+
+
+def _record_tokens(record: MemoryRecord) -> tuple[str, ...]:
+    return _tokenize(_record_text(record))
 
 
 def _tokenize(text: str) -> tuple[str, ...]:
@@ -148,5 +902,5 @@ def _term_frequencies(tokens: Sequence[str]) -> dict[str, int]:
     return freqs
 
 
-__all__ = ["CollectiveMemory", "MemoryRecord"]
+__all__ = ["CollectiveMemory", "MemoryRecord", "migrate_json_to_sqlite"]
 
@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
-import math
+import asyncio
+import functools
 import re
 from dataclasses import asdict, dataclass, field
-from typing import Any, Iterable, Protocol, Sequence, TYPE_CHECKING
+from typing import Any, Iterable, Mapping, Protocol, Sequence, TYPE_CHECKING
 
+from . import vector_math
 from .embedding_gemma import EmbeddingGemma
+from .vector_store import VectorStore, text_key
 
 try:  # Import opcional para compatibilidad con el nuevo sistema avanzado
     from .advanced_embeddings import EmbeddingQuality
@@ -21,9 +24,22 @@ class _SupportsEmbed(Protocol):
     def embed(self, texts: Iterable[str]):
         ...
 
+
+class SparseSignal(Protocol):
+    """Señal semántica dispersa que aporta el índice para una consulta concreta."""
+
+    def score(self, section: "DocumentSection") -> float:
+        ...
+
+    def weights(self, section: "DocumentSection") -> Mapping[str, float]:
+        ...
+
+
 if TYPE_CHECKING:  # pragma: no cover
     from .knowledge import DocumentSection, SearchResult
 
+_SEMANTIC_MODES = ("dense", "sparse")
+
 
 @dataclass(frozen=True)
 class PipelineSelection:
@@ -130,15 +146,18 @@ class SearchPipelineConfig:
 
     alpha: float = 0.6  # fusión híbrida BM25 + Gemma
     lexical_top_k: int = 200
+    lexical_engine: str = "exhaustive"  # exhaustive | wand
     fusion_top_n: int = 50
     mmr_lambda: float = 0.8
-    mmr_limit: int = 20
+    mmr_limit: int = 30
     rrf_k: int = 60
     chunk_size_tokens: int = 400
     chunk_overlap_tokens: int = 40
     role_bias: float = 0.05
     final_context_size: int = 5
     embedding_strategy: str = "auto"
+    vector_store_precision: str = "fp32"  # fp32 | fp16
+    semantic_mode: str = "dense"  # dense | sparse
 
 
 class HybridSearchPipeline:
@@ -148,12 +167,23 @@ class HybridSearchPipeline:
         self,
         embedder: _SupportsEmbed | None = None,
         config: SearchPipelineConfig | None = None,
+        *,
+        vector_store: VectorStore | None = None,
     ) -> None:
+        self._owns_embedder = embedder is None
         self.embedder: _SupportsEmbed = embedder or EmbeddingGemma()
         self.config = config or SearchPipelineConfig()
+        self.vector_store = vector_store
         self.embedding_quality: EmbeddingQuality | None = None
         self.last_trace: PipelineTrace | None = None
 
+    def close(self) -> None:
+        """Libera el embedder si lo creó el propio pipeline."""
+
+        close = getattr(self.embedder, "close", None)
+        if self._owns_embedder and close is not None:
+            close()
+
     # ------------------------------------------------------------------
     def search(
         self,
@@ -163,9 +193,24 @@ class HybridSearchPipeline:
         limit: int,
         role: str | None = None,
         alpha_override: float | None = None,
+        sparse: SparseSignal | None = None,
+        query_vector: Sequence[float] | None = None,
     ) -> list[PipelineSelection]:
+        """Ejecuta el pipeline sobre los candidatos léxicos.
+
+        ``query_vector`` permite pasar el embedding de la consulta ya
+        calculado (por ejemplo en paralelo con la etapa léxica).
+        """
+
         self.last_trace = None
         stages: list[StageReport] = []
+        semantic_mode = self.config.semantic_mode
+        if semantic_mode not in _SEMANTIC_MODES:
+            raise ValueError(
+                f"Modo semántico desconocido: {semantic_mode}. Opciones válidas: {', '.join(_SEMANTIC_MODES)}"
+            )
+        if semantic_mode == "sparse" and sparse is None:
+            raise ValueError("El modo semántico 'sparse' requiere la señal dispersa del índice")
         if not candidates:
             return []
 
@@ -189,7 +234,7 @@ class HybridSearchPipeline:
                 description="Resultados iniciales BM25/TF-IDF",
                 input_size=len(candidates),
                 output_size=len(lexical_ranking),
-                parameters={"top_k": self.config.lexical_top_k},
+                parameters={"top_k": self.config.lexical_top_k, "engine": self.config.lexical_engine},
                 highlights=lexical_highlights,
             )
         )
@@ -217,14 +262,24 @@ class HybridSearchPipeline:
             )
         )
 
-        query_embedding = self._generate_embeddings([query])
-        query_vector = query_embedding[0]
-
         sections_for_mmr = fusion[: self.config.fusion_top_n]
-        section_texts = [self._section_to_text(candidate.section) for candidate in sections_for_mmr]
-        section_vectors = self._generate_embeddings(section_texts)
-        similarities = [_cosine_similarity(query_vector, vector) for vector in section_vectors]
-        mmr_indices = self._apply_mmr(section_vectors, similarities)
+        if sparse is not None and semantic_mode == "sparse":
+            sparse_vectors = [sparse.weights(candidate.section) for candidate in sections_for_mmr]
+            similarities = _scale_to_unit([sparse.score(candidate.section) for candidate in sections_for_mmr])
+            mmr_indices = vector_math.mmr_select(
+                sparse_vectors,
+                similarities,
+                limit=self.config.mmr_limit,
+                mmr_lambda=self.config.mmr_lambda,
+                similarity=vector_math.sparse_dot,
+            )
+        else:
+            if query_vector is None:
+                query_vector = self._generate_embeddings([query])[0]
+            section_texts = [self._section_to_text(candidate.section) for candidate in sections_for_mmr]
+            section_vectors = vector_math.as_matrix(self._embed_documents(section_texts))
+            similarities = vector_math.dot_scores(query_vector, section_vectors)
+            mmr_indices = self._apply_mmr(section_vectors, similarities)
         diversified_sections = [sections_for_mmr[index] for index in mmr_indices]
 
         mmr_highlights = [
@@ -294,17 +349,24 @@ class HybridSearchPipeline:
             )
         )
 
-        chunk_texts = [candidate.chunk_text for candidate in chunk_candidates]
-        chunk_vectors = self._generate_embeddings(chunk_texts)
-        if EmbeddingQuality is not None and hasattr(self.embedder, "quality_report"):
-            try:
-                self.embedding_quality = self.embedder.quality_report(chunk_vectors)  # type: ignore[arg-type]
-            except Exception:  # pragma: no cover - defensivo
-                self.embedding_quality = None
-        else:
+        if semantic_mode == "sparse":
+            section_similarity = {
+                id(sections_for_mmr[index].section): similarities[index] for index in mmr_indices
+            }
+            semantic_scores = [section_similarity[id(candidate.section)] for candidate in chunk_candidates]
             self.embedding_quality = None
-        semantic_scores = [_cosine_similarity(query_vector, vector) for vector in chunk_vectors]
-        semantic_scores = [(value + 1.0) / 2.0 for value in semantic_scores]
+        else:
+            chunk_texts = [candidate.chunk_text for candidate in chunk_candidates]
+            chunk_vectors = self._embed_documents(chunk_texts)
+            if EmbeddingQuality is not None and hasattr(self.embedder, "quality_report"):
+                try:
+                    self.embedding_quality = self.embedder.quality_report(chunk_vectors)  # type: ignore[arg-type]
+                except Exception:  # pragma: no cover - defensivo
+                    self.embedding_quality = None
+            else:
+                self.embedding_quality = None
+            semantic_scores = vector_math.dot_scores(query_vector, chunk_vectors)
+            semantic_scores = [(value + 1.0) / 2.0 for value in semantic_scores]
 
         semantic_highlights = [
             StageHighlight(
@@ -318,10 +380,12 @@ class HybridSearchPipeline:
         stages.append(
             StageReport(
                 name="Scoring Semántico",
-                description="Embeddings + fusión híbrida",
+                description="Embeddings + fusión híbrida"
+                if semantic_mode == "dense"
+                else "Pesos dispersos del índice + fusión híbrida",
                 input_size=len(chunk_candidates),
                 output_size=len(chunk_candidates),
-                parameters={"α": alpha, "β": self.config.role_bias},
+                parameters={"α": alpha, "β": self.config.role_bias, "modo": semantic_mode},
                 highlights=semantic_highlights,
             )
         )
@@ -385,6 +449,50 @@ class HybridSearchPipeline:
 
         return final_selections
 
+    async def asearch(
+        self,
+        query: str,
+        candidates: Sequence["SearchResult"],
+        *,
+        limit: int,
+        role: str | None = None,
+        alpha_override: float | None = None,
+        sparse: SparseSignal | None = None,
+        query_vector: Sequence[float] | None = None,
+    ) -> list[PipelineSelection]:
+        """Versión asíncrona de :meth:`search`.
+
+        El embedding de la consulta se obtiene con :meth:`aembed_query` y el
+        resto del pipeline, que es trabajo de CPU, corre en un hilo aparte.
+        """
+
+        if query_vector is None and self.config.semantic_mode == "dense" and candidates:
+            query_vector = await self.aembed_query(query)
+        return await asyncio.to_thread(
+            functools.partial(
+                self.search,
+                query,
+                candidates,
+                limit=limit,
+                role=role,
+                alpha_override=alpha_override,
+                sparse=sparse,
+                query_vector=query_vector,
+            )
+        )
+
+    async def aembed_query(self, query: str) -> list[float]:
+        """Embedding de la consulta sin bloquear el bucle de eventos."""
+
+        aembed = getattr(self.embedder, "aembed", None)
+        if aembed is None:
+            return (await asyncio.to_thread(self._generate_embeddings, [query]))[0]
+        try:
+            vectors = await aembed([query], strategy=self.config.embedding_strategy)
+        except TypeError:
+            vectors = await aembed([query])
+        return vectors[0]
+
     # ------------------------------------------------------------------
     def _generate_embeddings(self, texts: Iterable[str]) -> list[list[float]]:
         try:
@@ -392,6 +500,68 @@ class HybridSearchPipeline:
         except TypeError:
             return self.embedder.embed(texts)
 
+    def embedding_namespace(self) -> str:
+        """Identifica el embedder para invalidar vectores persistidos de otro modelo."""
+
+        embedder = self.embedder
+        return ":".join(
+            (
+                type(embedder).__name__,
+                str(getattr(embedder, "model", "")),
+                str(getattr(embedder, "dimension", "")),
+                self.config.embedding_strategy,
+            )
+        )
+
+    def corpus_texts(self, section: "DocumentSection") -> list[str]:
+        """Textos de una sección que el pipeline embebe: la sección y sus fragmentos."""
+
+        return [self._section_to_text(section), *self._chunk_section(section)]
+
+    def prepare_embeddings(self, sections: Iterable["DocumentSection"]) -> int:
+        """Embebe y guarda en el almacén las secciones y fragmentos que falten.
+
+        Devuelve el número de textos nuevos. Sin almacén no hace nada: los
+        vectores se calculan bajo demanda en cada consulta.
+        """
+
+        if self.vector_store is None:
+            return 0
+        texts = [text for section in sections for text in self.corpus_texts(section)]
+        before = len(self.vector_store)
+        self._embed_documents(texts)
+        return len(self.vector_store) - before
+
+    def _embed_documents(self, texts: Sequence[str]) -> list[list[float]]:
+        """Embeddings de textos del corpus, consultando primero el almacén persistente.
+
+        Si el embedder tuvo que recurrir a su fallback durante la llamada
+        (``fallback_batches`` cambió), los vectores se usan pero no se
+        guardan: pertenecen a otro espacio y se recalcularán cuando el
+        modelo vuelva a responder.
+        """
+
+        store = self.vector_store
+        if store is None:
+            return self._generate_embeddings(texts)
+        keys = [text_key(text) for text in texts]
+        vectors: list[list[float] | None] = [store.get(key) for key in keys]
+        missing: dict[str, list[int]] = {}
+        for position, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[position], []).append(position)
+        if missing:
+            positions = list(missing.values())
+            fallbacks = getattr(self.embedder, "fallback_batches", 0)
+            fresh = self._generate_embeddings([texts[group[0]] for group in positions])
+            persist = getattr(self.embedder, "fallback_batches", 0) == fallbacks
+            for group, vector in zip(positions, fresh, strict=True):
+                if persist:
+                    store.add(keys[group[0]], vector)
+                for position in group:
+                    vectors[position] = list(vector)
+        return vectors  # type: ignore[return-value]
+
     # ------------------------------------------------------------------
     def _apply_rrf(self, lexical_ranking: Sequence["SearchResult"]) -> list["SearchResult"]:
         if not lexical_ranking:
@@ -417,42 +587,43 @@ class HybridSearchPipeline:
         candidate_vectors: Sequence[Sequence[float]],
         similarities: Sequence[float],
     ) -> list[int]:
-        if not candidate_vectors:
-            return []
+        return vector_math.mmr_select(
+            candidate_vectors,
+            similarities,
+            limit=self.config.mmr_limit,
+            mmr_lambda=self.config.mmr_lambda,
+        )
 
-        mmr_lambda = self.config.mmr_lambda
-        limit = min(self.config.mmr_limit, len(candidate_vectors))
-        available = list(range(len(candidate_vectors)))
-        selected: list[int] = []
-        while available and len(selected) < limit:
-            best_index = None
-            best_score = -math.inf
-            for index in available:
-                if not selected:
-                    diversity_penalty = 0.0
-                else:
-                    diversity_penalty = max(
-                        _cosine_similarity(candidate_vectors[index], candidate_vectors[chosen])
-                        for chosen in selected
-                    )
-                mmr_score = mmr_lambda * similarities[index] - (1.0 - mmr_lambda) * diversity_penalty
-                if mmr_score > best_score:
-                    best_score = mmr_score
-                    best_index = index
-            if best_index is None:
-                break
-            selected.append(best_index)
-            available.remove(best_index)
-        return selected
+    def chunk_key(self) -> tuple[int, int]:
+        """Parámetros efectivos de segmentación (tamaño, solapamiento)."""
+
+        return max(50, self.config.chunk_size_tokens), max(0, self.config.chunk_overlap_tokens)
+
+    def prepare_chunks(self, sections: Iterable["DocumentSection"]) -> None:
+        """Precalcula los fragmentos de cada sección para la configuración actual.
+
+        Los fragmentos se guardan en la propia sección bajo ``chunk_key()``;
+        como las secciones se recrean al refrescar un documento, la caché se
+        invalida sola.
+        """
+
+        key = self.chunk_key()
+        for section in sections:
+            if key not in section.chunks:
+                section.chunks[key] = tuple(self._build_chunks(section, *key))
 
     def _chunk_section(self, section: "DocumentSection") -> list[str]:
+        key = self.chunk_key()
+        chunks = section.chunks.get(key)
+        if chunks is None:
+            chunks = section.chunks[key] = tuple(self._build_chunks(section, *key))
+        return list(chunks)
+
+    def _build_chunks(self, section: "DocumentSection", chunk_size: int, overlap: int) -> list[str]:
         sentences = _split_sentences(section.content)
         if not sentences:
             return [self._compose_chunk_text(section, section.content)]
 
-        chunk_size = max(50, self.config.chunk_size_tokens)
-        overlap = max(0, self.config.chunk_overlap_tokens)
-
         chunks: list[str] = []
         current: list[str] = []
         current_tokens = 0
@@ -542,15 +713,15 @@ def _split_sentences(text: str) -> list[str]:
     return [sentence.strip() for sentence in sentences if sentence.strip()]
 
 
-def _count_tokens(text: str) -> int:
-    return len(_TOKEN_PATTERN.findall(text))
+def _scale_to_unit(values: Sequence[float]) -> list[float]:
+    top = max(values, default=0.0)
+    if top <= 0:
+        return [0.0 for _ in values]
+    return [value / top for value in values]
 
 
-# ----------------------------------------------------------------------
-def _cosine_similarity(left: Sequence[float], right: Sequence[float]) -> float:
-    if not left or not right:
-        return 0.0
-    return sum(l * r for l, r in zip(left, right, strict=False))
+def _count_tokens(text: str) -> int:
+    return len(_TOKEN_PATTERN.findall(text))
 
 
 __all__ = [
@@ -560,4 +731,5 @@ __all__ = [
     "StageHighlight",
     "StageReport",
     "SearchPipelineConfig",
+    "SparseSignal",
 ]
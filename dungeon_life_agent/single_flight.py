@@ -0,0 +1,85 @@
+"""Coalescencia de cálculos concurrentes por clave ("single-flight").
+
+Cuando varios hilos necesitan el mismo resultado costoso (por ejemplo el
+embedding de un texto que aún no está en caché), solo el primero lo
+calcula; el resto espera a que lo publique. El reparto es por lotes: un
+hilo reclama todas las claves que le faltan de una vez, calcula las que
+lidera, las publica y solo entonces espera las que lidera otro hilo. Como
+ningún líder espera antes de publicar, no pueden formarse ciclos de espera.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Generic, Hashable, Iterable, Mapping, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class Flight(Generic[V]):
+    """Resultado pendiente de una clave calculada por otro hilo."""
+
+    __slots__ = ("_event", "_value", "_error")
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._value: V | None = None
+        self._error: BaseException | None = None
+
+    def wait(self) -> V:
+        """Bloquea hasta que el líder publique; relanza su excepción si falló."""
+
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value  # type: ignore[return-value]
+
+
+class SingleFlight(Generic[K, V]):
+    """Registro de cálculos en curso indexado por clave."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: dict[K, Flight[V]] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def claim(self, keys: Iterable[K]) -> tuple[list[K], dict[K, Flight[V]]]:
+        """Reparte ``keys`` (sin duplicados) entre las que lidera el llamador y las que espera."""
+
+        leading: list[K] = []
+        following: dict[K, Flight[V]] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                flight = self._flights.get(key)
+                if flight is None:
+                    self._flights[key] = Flight()
+                    leading.append(key)
+                else:
+                    following[key] = flight
+        return leading, following
+
+    def publish(self, results: Mapping[K, V]) -> None:
+        """Entrega los resultados de claves lideradas y despierta a quienes esperan."""
+
+        with self._lock:
+            flights = [(self._flights.pop(key, None), value) for key, value in results.items()]
+        for flight, value in flights:
+            if flight is not None:
+                flight._value = value
+                flight._event.set()
+
+    def abandon(self, keys: Iterable[K], error: BaseException) -> None:
+        """Libera claves lideradas cuyo cálculo falló; los que esperan reciben ``error``."""
+
+        with self._lock:
+            flights = [self._flights.pop(key, None) for key in keys]
+        for flight in flights:
+            if flight is not None:
+                flight._error = error
+                flight._event.set()
+
+
+__all__ = ["Flight", "SingleFlight"]
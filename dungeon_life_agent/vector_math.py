@@ -0,0 +1,302 @@
+"""Operaciones vectoriales del pipeline semántico con backend intercambiable.
+
+Si NumPy está instalado, las similitudes, la diversificación MMR y la
+normalización se ejecutan como operaciones matriciales sobre un arreglo
+2-D; en caso contrario se usan los bucles en Python puro de siempre. Ambos
+caminos producen los mismos resultados salvo diferencias de redondeo en
+el orden de las sumas.
+"""
+
+from __future__ import annotations
+
+import array
+import heapq
+import math
+import random
+from typing import Any, Callable, Mapping, Sequence
+
+try:  # Dependencia opcional: acelera las operaciones por lotes
+    import numpy as np
+except Exception:  # pragma: no cover - NumPy no disponible
+    np = None  # type: ignore[assignment]
+
+HAS_NUMPY = np is not None
+BACKEND = "numpy" if HAS_NUMPY else "python"
+
+
+def as_matrix(vectors: Sequence[Sequence[float]]) -> Any:
+    """Agrupa los vectores en una matriz 2-D si NumPy está disponible.
+
+    Devuelve la secuencia original cuando no hay NumPy, cuando está vacía o
+    cuando los vectores no comparten dimensión.
+    """
+
+    if not HAS_NUMPY or not len(vectors):
+        return vectors
+    if isinstance(vectors, np.ndarray):
+        return vectors
+    try:
+        matrix = np.asarray(vectors, dtype=np.float64)
+    except ValueError:
+        return vectors
+    return matrix if matrix.ndim == 2 else vectors
+
+
+def dot_scores(query: Sequence[float], vectors: Sequence[Sequence[float]]) -> list[float]:
+    """Producto punto de ``query`` con cada vector (coseno si están normalizados)."""
+
+    matrix = as_matrix(vectors)
+    if _is_matrix(matrix) and len(query) == matrix.shape[1]:
+        return (matrix @ np.asarray(query, dtype=np.float64)).tolist()
+    return [dot(query, vector) for vector in vectors]
+
+
+def dot_rows(
+    rows: array.array, dimension: int, query: Sequence[float], positions: Sequence[int]
+) -> list[float]:
+    """Producto punto de ``query`` con las filas ``positions`` de una matriz plana ``float32``."""
+
+    if not positions:
+        return []
+    if HAS_NUMPY:
+        matrix = np.frombuffer(rows, dtype=np.float32).reshape(-1, dimension)
+        return (matrix[np.asarray(positions, dtype=np.intp)] @ np.asarray(query, dtype=np.float32)).tolist()
+    return [dot(query, rows[position * dimension : (position + 1) * dimension]) for position in positions]
+
+
+def top_dot_rows(
+    rows: array.array,
+    dimension: int,
+    query: Sequence[float],
+    limit: int,
+    positions: Sequence[int] | None = None,
+) -> list[tuple[int, float]]:
+    """Las ``limit`` filas con mayor producto punto, como ``(fila, puntuación)`` descendente.
+
+    ``rows`` es una matriz ``float32`` aplanada por filas; ``positions``
+    restringe la búsqueda a un subconjunto de filas. Con NumPy se puntúa
+    con un único producto matriz-vector y ``argpartition``.
+    """
+
+    total = len(rows) // dimension if dimension else 0
+    if limit <= 0 or total == 0 or (positions is not None and not positions):
+        return []
+    if not HAS_NUMPY:
+        candidates = range(total) if positions is None else positions
+        scored = zip(candidates, dot_rows(rows, dimension, query, list(candidates)), strict=True)
+        return heapq.nlargest(limit, scored, key=lambda item: item[1])
+    matrix = np.frombuffer(rows, dtype=np.float32).reshape(-1, dimension)
+    vector = np.asarray(query, dtype=np.float32)
+    if positions is None:
+        index = None
+        scores = matrix @ vector
+    else:
+        index = np.asarray(positions, dtype=np.intp)
+        scores = matrix[index] @ vector
+    limit = min(limit, len(scores))
+    best = np.argpartition(-scores, limit - 1)[:limit]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    chosen = best if index is None else index[best]
+    return list(zip(chosen.tolist(), scores[best].tolist(), strict=True))
+
+
+def dot(left: Sequence[float], right: Sequence[float]) -> float:
+    if not left or not right:
+        return 0.0
+    return sum(l * r for l, r in zip(left, right, strict=False))
+
+
+def mmr_select(
+    vectors: Sequence[Sequence[float]],
+    similarities: Sequence[float],
+    *,
+    limit: int,
+    mmr_lambda: float,
+    similarity: Callable[[Any, Any], float] | None = None,
+) -> list[int]:
+    """Índices elegidos por Maximal Marginal Relevance, en orden de selección.
+
+    ``similarity`` permite otros tipos de vector (por ejemplo dispersos con
+    ``sparse_dot``); por defecto se usa el producto punto denso.
+    """
+
+    if not len(vectors):
+        return []
+    limit = min(limit, len(vectors))
+    if similarity is not None:
+        return _mmr_python(vectors, similarities, limit, mmr_lambda, similarity)
+    matrix = as_matrix(vectors)
+    if _is_matrix(matrix):
+        return _mmr_numpy(matrix, similarities, limit, mmr_lambda)
+    return _mmr_python(vectors, similarities, limit, mmr_lambda)
+
+
+def sparse_dot(left: Mapping[str, float], right: Mapping[str, float]) -> float:
+    """Producto punto de vectores dispersos representados como diccionarios."""
+
+    if len(left) > len(right):
+        left, right = right, left
+    return sum(weight * right.get(term, 0.0) for term, weight in left.items())
+
+
+def l2_normalize(vector: Sequence[float]) -> list[float]:
+    norm = math.sqrt(sum(component * component for component in vector))
+    if norm == 0:
+        return [0.0] * len(vector)
+    return [component / norm for component in vector]
+
+
+def l2_normalize_many(vectors: Sequence[Sequence[float]]) -> list[list[float]]:
+    """Normaliza un lote de vectores; las filas nulas quedan a cero."""
+
+    matrix = as_matrix(vectors)
+    if _is_matrix(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        safe = np.where(norms == 0, 1.0, norms)
+        return (matrix / safe).tolist()
+    return [l2_normalize(vector) for vector in vectors]
+
+
+def average_pairwise_cosine(vectors: Sequence[Sequence[float]]) -> float:
+    """Coseno medio entre todos los pares distintos del lote."""
+
+    if len(vectors) < 2:
+        return 1.0
+    matrix = as_matrix(vectors)
+    if _is_matrix(matrix):
+        norms = np.linalg.norm(matrix, axis=1)
+        safe = np.where(norms == 0, 1.0, norms)
+        unit = matrix / safe[:, None]
+        gram = unit @ unit.T
+        upper = np.triu_indices(len(vectors), k=1)
+        return float(gram[upper].mean())
+    total = 0.0
+    count = 0
+    for i in range(len(vectors)):
+        for j in range(i + 1, len(vectors)):
+            total += cosine(vectors[i], vectors[j])
+            count += 1
+    return total / count if count else 0.0
+
+
+def cosine(left: Sequence[float], right: Sequence[float]) -> float:
+    numerator = sum(a * b for a, b in zip(left, right, strict=False))
+    norm_left = math.sqrt(sum(a * a for a in left))
+    norm_right = math.sqrt(sum(b * b for b in right))
+    if norm_left == 0 or norm_right == 0:
+        return 0.0
+    return numerator / (norm_left * norm_right)
+
+
+# ----------------------------------------------------------------------
+class RandomProjection:
+    """Proyección gaussiana fija (Johnson–Lindenstrauss) a ``target`` dimensiones.
+
+    Conserva aproximadamente los productos punto, así que un primer barrido
+    sobre la matriz proyectada permite preseleccionar candidatos a una
+    fracción del coste del barrido exacto. La semilla hace la proyección
+    reproducible entre procesos.
+    """
+
+    def __init__(self, dimension: int, target: int = 64, *, seed: int = 0) -> None:
+        generator = random.Random(seed)
+        scale = 1.0 / math.sqrt(target)
+        self.dimension = dimension
+        self.target = target
+        # Una columna por dimensión de salida.
+        self.columns = [[generator.gauss(0.0, 1.0) * scale for _ in range(dimension)] for _ in range(target)]
+        self._matrix = np.asarray(self.columns, dtype=np.float32).T.copy() if HAS_NUMPY else None
+
+    def apply(self, vector: Sequence[float]) -> list[float]:
+        if self._matrix is not None:
+            return (np.asarray(vector, dtype=np.float32) @ self._matrix).tolist()
+        return [dot(vector, column) for column in self.columns]
+
+    def apply_rows(self, rows: array.array) -> array.array:
+        """Proyecta una matriz ``float32`` aplanada y la devuelve con el mismo formato."""
+
+        projected = array.array("f")
+        if self._matrix is not None:
+            matrix = np.frombuffer(rows, dtype=np.float32).reshape(-1, self.dimension)
+            projected.frombytes((matrix @ self._matrix).astype(np.float32).tobytes())
+            return projected
+        for offset in range(0, len(rows), self.dimension):
+            projected.extend(self.apply(rows[offset : offset + self.dimension]))
+        return projected
+
+
+def _is_matrix(value: Any) -> bool:
+    return HAS_NUMPY and isinstance(value, np.ndarray) and value.ndim == 2
+
+
+def _mmr_numpy(matrix: Any, similarities: Sequence[float], limit: int, mmr_lambda: float) -> list[int]:
+    relevance = mmr_lambda * np.asarray(similarities, dtype=np.float64)
+    gram = matrix @ matrix.T
+    penalty = np.zeros(len(matrix), dtype=np.float64)
+    available = np.ones(len(matrix), dtype=bool)
+    selected: list[int] = []
+    while len(selected) < limit:
+        scores = np.where(available, relevance - (1.0 - mmr_lambda) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        if not available[best]:
+            break
+        selected.append(best)
+        available[best] = False
+        penalty = gram[best] if len(selected) == 1 else np.maximum(penalty, gram[best])
+    return selected
+
+
+def _mmr_python(
+    vectors: Sequence[Sequence[float]],
+    similarities: Sequence[float],
+    limit: int,
+    mmr_lambda: float,
+    similarity: Callable[[Any, Any], float] = dot,
+) -> list[int]:
+    """MMR incremental: cada candidato guarda su máxima similitud con los elegidos.
+
+    Tras cada selección solo se compara el nuevo elemento con los candidatos
+    restantes, de modo que el coste total es O(limit · candidatos) productos.
+    """
+
+    relevance = [mmr_lambda * similarity for similarity in similarities]
+    penalty_weight = 1.0 - mmr_lambda
+    max_similarity = [0.0] * len(vectors)
+    available = list(range(len(vectors)))
+    selected: list[int] = []
+    while available and len(selected) < limit:
+        best_index = None
+        best_score = -math.inf
+        for index in available:
+            mmr_score = relevance[index] - penalty_weight * max_similarity[index]
+            if mmr_score > best_score:
+                best_score = mmr_score
+                best_index = index
+        if best_index is None:
+            break
+        available.remove(best_index)
+        chosen = vectors[best_index]
+        for index in available:
+            value = similarity(vectors[index], chosen)
+            if not selected or value > max_similarity[index]:
+                max_similarity[index] = value
+        selected.append(best_index)
+    return selected
+
+
+__all__ = [
+    "BACKEND",
+    "HAS_NUMPY",
+    "RandomProjection",
+    "as_matrix",
+    "average_pairwise_cosine",
+    "cosine",
+    "dot",
+    "dot_rows",
+    "dot_scores",
+    "l2_normalize",
+    "l2_normalize_many",
+    "mmr_select",
+    "sparse_dot",
+    "top_dot_rows",
+]
@@ -0,0 +1,321 @@
+"""Almacén persistente de embeddings para secciones y fragmentos.
+
+Los vectores viven en una matriz contigua (``float32`` o ``float16``) en un
+archivo binario que se proyecta en memoria con ``mmap`` al arrancar; un
+mapa de identificadores aparte (``marshal``) asocia la huella de cada texto
+con su fila. Las filas nuevas se añaden al final del archivo y el mapa se
+reescribe de forma atómica, de modo que un proceso interrumpido pierde como
+mucho los vectores aún no confirmados. ``compact`` elimina las filas que ya
+no corresponden a ningún texto indexado.
+
+Cada reescritura completa de la matriz incrementa una generación que se
+guarda tanto en la cabecera como en el mapa de ids; si un corte deja ambos
+archivos de generaciones distintas, el almacén se descarta al cargar en
+lugar de asociar huellas con filas ajenas.
+"""
+
+from __future__ import annotations
+
+import array
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import threading
+from typing import Iterable, Sequence
+
+try:  # Dependencia opcional: convierte filas fp16 en bloque
+    import numpy as np
+except Exception:  # pragma: no cover - NumPy no disponible
+    np = None  # type: ignore[assignment]
+
+LOGGER = logging.getLogger(__name__)
+
+VECTOR_STORE_MAGIC = b"DLAVEC"
+VECTOR_STORE_VERSION = 2
+_HEADER = struct.Struct("<6sHBxxxII")
+_PRECISIONS = {"fp32": (0, "f"), "fp16": (1, "e")}
+
+
+def default_vector_store_path(root: pathlib.Path) -> pathlib.Path:
+    """Ubicación por defecto: archivo oculto junto a la carpeta indexada."""
+
+    return root.with_name(f".{root.name}.dlavec")
+
+
+def text_key(text: str) -> str:
+    """Huella estable del texto usada como identificador de fila."""
+
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class VectorStore:
+    """Matriz de embeddings persistente indexada por huella de texto."""
+
+    def __init__(
+        self,
+        path: str | pathlib.Path,
+        *,
+        namespace: str = "",
+        precision: str = "fp32",
+    ) -> None:
+        if precision not in _PRECISIONS:
+            raise ValueError(
+                f"Precisión de vectores desconocida: {precision}. Opciones válidas: {', '.join(_PRECISIONS)}"
+            )
+        self.path = pathlib.Path(path).expanduser()
+        self.ids_path = self.path.with_name(f"{self.path.name}.ids")
+        self.namespace = namespace
+        self.precision = precision
+        self.dimension: int | None = None
+        self._rows: dict[str, int] = {}
+        self._pending: dict[str, tuple[float, ...]] = {}
+        self._row_struct: struct.Struct | None = None
+        self._mapped: mmap.mmap | None = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._pending)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows or key in self._pending
+
+    @property
+    def stored_rows(self) -> int:
+        """Filas confirmadas en disco (incluye las que ya no se usan)."""
+
+        return len(self._rows)
+
+    def get(self, key: str) -> list[float] | None:
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return list(pending)
+            row = self._rows.get(key)
+            if row is None or self._mapped is None or self._row_struct is None:
+                return None
+            offset = _HEADER.size + row * self._row_struct.size
+            return list(self._row_struct.unpack_from(self._mapped, offset))
+
+    def export_rows(self, keys: Sequence[str]) -> tuple[array.array, list[int]]:
+        """Filas de ``keys`` como matriz ``float32`` aplanada, más las posiciones ausentes.
+
+        Las filas ausentes quedan a cero. Copia los bytes del archivo
+        proyectado sin desempaquetar cada vector, así que cargar todo el
+        almacén cuesta poco más que leerlo.
+        """
+
+        rows = array.array("f")
+        with self._lock:
+            if self._row_struct is None or self.dimension is None:
+                return rows, list(range(len(keys)))
+            row_struct = self._row_struct
+            size = row_struct.size
+            empty = bytes(size)
+            chunks: list[bytes] = []
+            missing: list[int] = []
+            for position, key in enumerate(keys):
+                pending = self._pending.get(key)
+                row = self._rows.get(key)
+                if pending is not None:
+                    chunks.append(row_struct.pack(*pending))
+                elif row is not None and self._mapped is not None:
+                    offset = _HEADER.size + row * size
+                    chunks.append(self._mapped[offset : offset + size])
+                else:
+                    missing.append(position)
+                    chunks.append(empty)
+            raw = b"".join(chunks)
+        if self.precision == "fp32":
+            rows.frombytes(raw)
+            if sys.byteorder == "big":
+                rows.byteswap()
+        elif np is not None:
+            rows.frombytes(np.frombuffer(raw, dtype="<f2").astype(np.float32).tobytes())
+        else:
+            for offset in range(0, len(raw), size):
+                rows.extend(row_struct.unpack_from(raw, offset))
+        return rows, missing
+
+    def add(self, key: str, vector: Sequence[float]) -> None:
+        with self._lock:
+            if key in self._rows or key in self._pending:
+                return
+            if self.dimension is None:
+                self._configure(len(vector))
+            if len(vector) != self.dimension:
+                raise ValueError(
+                    f"Dimensión de vector incompatible: {len(vector)} (se esperaba {self.dimension})"
+                )
+            self._pending[key] = tuple(vector)
+
+    def flush(self) -> bool:
+        """Añade los vectores pendientes al archivo y confirma el mapa de ids."""
+
+        with self._lock:
+            if not self._pending:
+                return False
+            assert self._row_struct is not None and self.dimension is not None
+            if not self.path.exists():
+                self._rows = {}
+            keys = list(self._rows)
+            new_keys = list(self._pending)
+            rows = b"".join(self._row_struct.pack(*self._pending[key]) for key in new_keys)
+            # Un archivo nuevo es otra generación: un mapa de ids previo no le sirve.
+            generation = self._generation if keys else self._generation + 1
+            self._release()
+            try:
+                if not keys:
+                    with self.path.open("wb") as stream:
+                        stream.write(self._header(generation))
+                        stream.write(rows)
+                else:
+                    with self.path.open("r+b") as stream:
+                        stream.seek(_HEADER.size + len(keys) * self._row_struct.size)
+                        stream.write(rows)
+                        stream.truncate()
+                self._write_ids(keys + new_keys, generation)
+            except OSError as exc:
+                LOGGER.warning("No se pudo guardar el almacén de vectores en %s: %s", self.path, exc)
+                self._map()
+                return False
+            self._generation = generation
+            for key in new_keys:
+                self._rows[key] = len(self._rows)
+            self._pending.clear()
+            self._map()
+            return True
+
+    def compact(self, live_keys: Iterable[str]) -> int:
+        """Reescribe la matriz conservando solo ``live_keys``. Devuelve filas eliminadas."""
+
+        live = set(live_keys)
+        with self._lock:
+            if self._row_struct is None or self._mapped is None:
+                return 0
+            survivors = [key for key in self._rows if key in live]
+            removed = len(self._rows) - len(survivors)
+            if removed == 0:
+                return 0
+            size = self._row_struct.size
+            body = b"".join(
+                self._mapped[_HEADER.size + self._rows[key] * size : _HEADER.size + (self._rows[key] + 1) * size]
+                for key in survivors
+            )
+            temporary = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            generation = self._generation + 1
+            self._release()
+            try:
+                with temporary.open("wb") as stream:
+                    stream.write(self._header(generation))
+                    stream.write(body)
+                os.replace(temporary, self.path)
+            except OSError as exc:
+                LOGGER.warning("No se pudo compactar el almacén de vectores en %s: %s", self.path, exc)
+                self._map()
+                return 0
+            # La matriz ya es la compactada; sin el mapa nuevo, la próxima carga
+            # verá generaciones distintas y descartará el almacén.
+            self._rows = {key: row for row, key in enumerate(survivors)}
+            self._generation = generation
+            try:
+                self._write_ids(survivors, generation)
+            except OSError as exc:
+                LOGGER.warning("No se pudo guardar el mapa de ids de %s: %s", self.path, exc)
+            self._map()
+            return removed
+
+    def clear(self) -> None:
+        """Elimina todas las filas (por ejemplo, si el embedder cambió de dimensión)."""
+
+        with self._lock:
+            self._release()
+            for path in (self.path, self.ids_path):
+                path.unlink(missing_ok=True)
+            self._rows = {}
+            self._pending = {}
+            self.dimension = None
+            self._row_struct = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._release()
+
+    # ------------------------------------------------------------------
+    def _configure(self, dimension: int) -> None:
+        self.dimension = dimension
+        self._row_struct = struct.Struct(f"<{dimension}{_PRECISIONS[self.precision][1]}")
+
+    def _header(self, generation: int) -> bytes:
+        assert self.dimension is not None
+        return _HEADER.pack(
+            VECTOR_STORE_MAGIC, VECTOR_STORE_VERSION, _PRECISIONS[self.precision][0], self.dimension, generation
+        )
+
+    def _write_ids(self, keys: list[str], generation: int) -> None:
+        temporary = self.ids_path.with_name(f"{self.ids_path.name}.{os.getpid()}.tmp")
+        with temporary.open("wb") as stream:
+            marshal.dump(
+                {"namespace": self.namespace, "precision": self.precision, "generation": generation, "keys": keys},
+                stream,
+            )
+        os.replace(temporary, self.ids_path)
+
+    def _load(self) -> None:
+        try:
+            with self.ids_path.open("rb") as stream:
+                ids = marshal.load(stream)
+            with self.path.open("rb") as stream:
+                header = stream.read(_HEADER.size)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, EOFError, TypeError) as exc:
+            LOGGER.warning("Almacén de vectores ilegible en %s: %s", self.path, exc)
+            return
+        if not isinstance(ids, dict) or len(header) < _HEADER.size:
+            return
+        magic, version, precision_code, dimension, generation = _HEADER.unpack(header)
+        if (
+            magic != VECTOR_STORE_MAGIC
+            or version != VECTOR_STORE_VERSION
+            or precision_code != _PRECISIONS[self.precision][0]
+            or ids.get("namespace") != self.namespace
+        ):
+            LOGGER.info("Almacén de vectores incompatible en %s; se reconstruirá", self.path)
+            return
+        self._generation = generation
+        if ids.get("generation") != generation:
+            LOGGER.warning("Mapa de ids de otra generación en %s; se reconstruirá", self.path)
+            return
+        self._configure(dimension)
+        assert self._row_struct is not None
+        available = (self.path.stat().st_size - _HEADER.size) // self._row_struct.size
+        keys = list(ids.get("keys", ()))[:available]
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._map()
+
+    def _map(self) -> None:
+        if not self._rows:
+            return
+        try:
+            with self.path.open("rb") as stream:
+                self._mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            LOGGER.warning("No se pudo proyectar el almacén de vectores %s: %s", self.path, exc)
+            self._rows = {}
+            self._mapped = None
+
+    def _release(self) -> None:
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+
+__all__ = ["VectorStore", "default_vector_store_path", "text_key"]
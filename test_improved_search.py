@@ -17,7 +17,7 @@ def test_improved_search():
 
     # Inicializar el índice de documentación
     try:
-        index = DocumentationIndex("Documentacion")
+        index = DocumentationIndex("Documentacion", use_snapshot=False)
         print(f"*** Indice cargado: {len(index.sections)} secciones encontradas")
     except Exception as e:
         print(f"*** Error cargando indice: {e}")
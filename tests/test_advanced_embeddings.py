@@ -1,9 +1,13 @@
 import math
 
+import pytest
+
 from dungeon_life_agent.advanced_embeddings import (
+    DiskEmbeddingCache,
     EmbeddingModelConfig,
     EmbeddingSystem,
     HybridEmbeddingCache,
+    PackedVector,
 )
 
 
@@ -69,8 +73,9 @@ def test_int8_quantization_stores_integer_payloads():
     key = system._cache_key("quantiza", config, "int8")  # type: ignore[attr-defined]
     payload = cache.get(key)
     assert payload is not None
-    assert payload["precision"] == "int8"
-    assert all(isinstance(value, int) for value in payload["vector"])
+    assert payload.precision == "int8"
+    assert len(payload.data) == 3, "INT8 debe ocupar un byte por componente"
+    assert all(isinstance(value, int) for value in payload.values())
 
     system.embed(["quantiza"], return_metrics=True)
     assert embedder.calls == 1
@@ -82,3 +87,247 @@ def test_quality_report_measures_pairwise_cosine():
     report = system.quality_report(vectors)
     assert math.isclose(report.mean_magnitude, 1.0, rel_tol=1e-6)
     assert math.isclose(report.pairwise_cosine, 0.0, rel_tol=1e-6)
+
+
+@pytest.mark.parametrize(
+    ("precision", "item_size", "tolerance"),
+    [("fp32", 4, 1e-7), ("fp16", 2, 1e-3), ("int8", 1, 1e-2)],
+)
+def test_packed_vectors_round_trip_through_redis_bytes(precision, item_size, tolerance):
+    vector = [0.5, -0.25, 0.125, -0.9, 0.0, 0.333]
+    packed = PackedVector.encode(vector, precision)
+    assert len(packed.data) == item_size * len(vector)
+
+    restored = PackedVector.from_bytes(packed.to_bytes())
+    assert restored == packed
+    assert restored.decode() == pytest.approx(vector, abs=tolerance)
+    assert PackedVector.from_bytes(b'{"vector": [1.0]}') is None
+
+
+def test_fp16_packing_falls_back_to_fp32_outside_its_range():
+    vector = [0.5, 70000.0, -1e6]
+    packed = PackedVector.encode(vector, "fp16")
+    assert packed.precision == "fp32"
+    assert PackedVector.from_bytes(packed.to_bytes()).decode() == pytest.approx(vector)
+    assert PackedVector.encode([65504.0, -65504.0], "fp16").precision == "fp16"
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.values.get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.values.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.round_trips += 1
+        self.values[key] = value
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis: _FakeRedis) -> None:
+        self.redis = redis
+        self.pending: list[tuple[str, bytes]] = []
+
+    def set(self, key, value):
+        self.pending.append((key, value))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        self.redis.values.update(self.pending)
+        self.pending.clear()
+
+
+def test_cache_stores_raw_bytes_in_redis():
+    redis = _FakeRedis()
+    writer = HybridEmbeddingCache(namespace="demo", redis_client=redis)
+    writer.set("clave", PackedVector.encode([0.1, 0.2], "fp16"))
+    assert isinstance(redis.values["demo:clave"], bytes)
+
+    reader = HybridEmbeddingCache(namespace="demo", redis_client=redis)
+    assert reader.get("clave").decode() == pytest.approx([0.1, 0.2], abs=1e-3)
+    assert reader.memory_report()["payload_bytes"] == 4
+
+
+def test_disk_tier_survives_restarts_without_redis(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    config = EmbeddingModelConfig(name="stub", dimension=3, precision="fp16")
+    embedder = _StubEmbedder(3, 0.5)
+    system = EmbeddingSystem(
+        [config],
+        cache=HybridEmbeddingCache(disk_path=path),
+        factories={"stub": lambda cfg: embedder},
+    )
+    first = system.embed(["persistente"])
+    system.cache.close()
+    assert embedder.calls == 1
+
+    restarted = _StubEmbedder(3, 0.5)
+    system = EmbeddingSystem(
+        [config],
+        cache=HybridEmbeddingCache(disk_path=path),
+        factories={"stub": lambda cfg: restarted},
+    )
+    assert system.embed(["persistente"])[0] == pytest.approx(first[0], abs=1e-3)
+    assert restarted.calls == 0
+
+
+def test_disk_tier_evicts_least_recently_used_entries(tmp_path):
+    disk = DiskEmbeddingCache(tmp_path / "lru.sqlite", max_entries=10)
+    for index in range(10):
+        disk.set(f"k{index}", PackedVector.encode([float(index)], "fp32"))
+    assert disk.get("k0") is not None
+    disk.set("k10", PackedVector.encode([10.0], "fp32"))
+
+    assert len(disk) == 9
+    assert disk.get("k0") is not None
+    assert disk.get("k10") is not None
+    assert disk.get("k1") is None
+    disk.compact()
+    disk.close()
+
+
+def test_disk_tier_reads_do_not_write_and_eviction_recounts_shared_files(tmp_path):
+    path = tmp_path / "compartido.sqlite"
+    first = DiskEmbeddingCache(path, max_entries=10)
+    for index in range(10):
+        first.set(f"k{index}", PackedVector.encode([float(index)], "fp32"))
+    wal = path.with_name(f"{path.name}-wal")
+    size = wal.stat().st_size
+    assert first.get_many(["k0", "k1"])
+    assert wal.stat().st_size == size, "Una lectura no debe abrir una escritura"
+
+    second = DiskEmbeddingCache(path, max_entries=10)
+    second.set("k10", PackedVector.encode([10.0], "fp32"))
+    assert len(second) == 9
+    first.set("k11", PackedVector.encode([11.0], "fp32"))
+    assert len(first) == 10, "El recuento real evita desalojar de nuevo"
+    first.close()
+    second.close()
+
+
+def test_embed_with_cache_uses_one_redis_round_trip_per_direction():
+    redis = _FakeRedis()
+    cache = HybridEmbeddingCache(namespace="lote", redis_client=redis)
+    config = EmbeddingModelConfig(name="stub", dimension=2, precision="fp32")
+    embedder = _StubEmbedder(2, 0.5)
+    system = EmbeddingSystem([config], cache=cache, factories={"stub": lambda cfg: embedder})
+
+    system.embed(["uno", "dos", "tres", "dos"])
+    assert redis.round_trips == 2, "un MGET para buscar y un pipeline para escribir"
+    assert len(redis.values) == 3
+
+    restarted = _StubEmbedder(2, 0.5)
+    cold = EmbeddingSystem(
+        [config],
+        cache=HybridEmbeddingCache(namespace="lote", redis_client=redis),
+        factories={"stub": lambda cfg: restarted},
+    )
+    redis.round_trips = 0
+    cold.embed(["uno", "tres", "cuatro"])
+    assert redis.round_trips == 2
+    assert restarted.calls == 1, "solo «cuatro» falta en Redis"
+
+
+def test_concurrent_embeds_of_the_same_text_call_the_backend_once():
+    import threading
+    import time
+
+    class _SlowEmbedder(_StubEmbedder):
+        def embed(self, texts):
+            time.sleep(0.05)
+            return super().embed(texts)
+
+    embedder = _SlowEmbedder(2, 0.5)
+    config = EmbeddingModelConfig(name="lento", dimension=2, precision="fp32")
+    system = EmbeddingSystem(
+        [config], cache=HybridEmbeddingCache(max_size=1), factories={"lento": lambda cfg: embedder}
+    )
+    barrier = threading.Barrier(4)
+    results: list[list[list[float]]] = []
+
+    def worker() -> None:
+        barrier.wait()
+        results.append(system.embed(["compartido", "compartido"]))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert embedder.calls == 1
+    assert len(results) == 4
+    assert all(batch == results[0] for batch in results)
+
+    # Ningún vuelo queda colgado: tras desalojarlo del caché, el texto se vuelve a calcular.
+    system.embed(["otro"])
+    retry = threading.Thread(target=system.embed, args=(["compartido"],))
+    retry.start()
+    retry.join(5.0)
+    assert not retry.is_alive()
+    assert embedder.calls == 3
+
+
+def test_each_text_is_fingerprinted_once_per_embed_call(monkeypatch):
+    from dungeon_life_agent import advanced_embeddings
+
+    calls: list[str] = []
+    original = advanced_embeddings.text_key
+
+    def counting_text_key(text):
+        calls.append(text)
+        return original(text)
+
+    monkeypatch.setattr(advanced_embeddings, "text_key", counting_text_key)
+    configs = [
+        EmbeddingModelConfig(name="a", dimension=2, precision="fp32"),
+        EmbeddingModelConfig(name="b", dimension=2, precision="fp16"),
+    ]
+    system = EmbeddingSystem(
+        configs,
+        factories={"a": lambda cfg: _StubEmbedder(2, 1.0), "b": lambda cfg: _StubEmbedder(2, 0.5)},
+    )
+    system.embed(["uno", "dos"], strategy="stack")
+    assert calls == ["uno", "dos"]
+
+
+def test_fallback_vectors_never_reach_the_disk_tier(tmp_path):
+    from dungeon_life_agent.embedding_gemma import EmbeddingGemma
+
+    class _Ollama:
+        available = False
+
+        def embed(self, *, model, input):
+            if not self.available:
+                raise ConnectionError("ollama caído")
+            return {"embeddings": [[0.0, 3.0, 4.0] for _ in input]}
+
+    client = _Ollama()
+    path = tmp_path / "embeddings.sqlite"
+    config = EmbeddingModelConfig(name="remoto", dimension=3, precision="fp32")
+    system = EmbeddingSystem(
+        [config],
+        cache=HybridEmbeddingCache(disk_path=path),
+        factories={"remoto": lambda cfg: EmbeddingGemma(client=client, dimension=cfg.dimension)},
+    )
+    system.embed(["grifos"])
+    assert system.fallback_batches == 1
+
+    client.available = True
+    assert system.embed(["grifos"])[0] == pytest.approx([0.0, 0.6, 0.8])
+    system.close()
+    system.cache.close()
+
+    disk = DiskEmbeddingCache(path)
+    assert len(disk) == 1
+    disk.close()
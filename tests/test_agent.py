@@ -1,36 +1,42 @@
 import pytest
 
 from dungeon_life_agent.agent import DungeonLifeAgent
+from dungeon_life_agent.knowledge import DocumentationIndex
 from dungeon_life_agent.llm import EchoLanguageModel
 
 
+def _agent(**kwargs) -> DungeonLifeAgent:
+    # Sin instantánea para no escribir .Documentacion.dlaidx en el repositorio.
+    return DungeonLifeAgent(knowledge_index=DocumentationIndex("Documentacion", use_snapshot=False), **kwargs)
+
+
 def test_query_with_role_changes_tone():
-    agent = DungeonLifeAgent()
+    agent = _agent()
     response = agent.query("estado del roadmap", role="productor")
     assert "Respuesta directa" in response.summary or "Resultado" in response.summary
 
 
 def test_mode_permissions_are_enforced():
-    agent = DungeonLifeAgent()
+    agent = _agent()
     with pytest.raises(PermissionError):
         agent.use_tool("git_status", mode="consultor", path=".")
 
 
 def test_suggest_queries_returns_values():
-    agent = DungeonLifeAgent()
+    agent = _agent()
     suggestions = agent.suggest_queries("tax")
     assert suggestions
 
 
 def test_metrics_snapshot_records_queries():
-    agent = DungeonLifeAgent()
+    agent = _agent()
     agent.query("arquitectura tecnica")
     snapshot = agent.metrics_snapshot()
     assert snapshot.get("search.count", 0) >= 1
 
 
 def test_agent_collective_memory_and_pipelines():
-    agent = DungeonLifeAgent()
+    agent = _agent()
     record = agent.capture_memory_event(
         channel="general",
         author="tester",
@@ -47,7 +53,7 @@ def test_agent_collective_memory_and_pipelines():
 
 
 def test_agent_dataset_and_templates():
-    agent = DungeonLifeAgent()
+    agent = _agent()
     plan = agent.plan_dataset_analysis({"formato": "csv", "dominio": "narrativa", "tamanio": "500"})
     assert "Dataset" in plan.overview
     templates = agent.list_templates()
@@ -65,6 +71,23 @@ def test_agent_dataset_and_templates():
 
 
 def test_agent_generates_with_language_model():
-    agent = DungeonLifeAgent(language_model=EchoLanguageModel())
+    agent = _agent(language_model=EchoLanguageModel())
     output = agent.generate_with_model("Hola equipo")
     assert "Hola equipo" in output
+
+
+def test_generate_with_model_streams_chunks_to_callback():
+    agent = _agent(language_model=EchoLanguageModel())
+    chunks: list[str] = []
+    output = agent.generate_with_model("Hola equipo", on_chunk=chunks.append)
+    assert len(chunks) > 1
+    assert "".join(chunks) == output == agent.generate_with_model("Hola equipo")
+
+    class _BlockingModel:
+        def generate(self, prompt, **kwargs):
+            return f"completo: {prompt}"
+
+    agent.language_model = _BlockingModel()
+    assert list(agent.stream_with_model("x")) == ["completo: x"]
+    with pytest.raises(PermissionError):
+        agent.stream_with_model("x", mode="consultor")
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+
+from dungeon_life_agent.agent import DungeonLifeAgent
+from dungeon_life_agent.embedding_gemma import EmbeddingGemma
+from dungeon_life_agent.knowledge import DocumentationIndex
+from dungeon_life_agent.llm import AsyncOllamaClient, OllamaClient
+
+
+class _StubOllamaServer:
+    """Servidor HTTP/1.1 mínimo con keep-alive que imita /api/embed y /api/generate."""
+
+    def __init__(self) -> None:
+        self.connections = 0
+        self.requests: list[tuple[str, dict]] = []
+        self._server: asyncio.AbstractServer | None = None
+
+    async def __aenter__(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def __aexit__(self, *exc_info) -> None:
+        assert self._server is not None
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                path = request_line.decode().split(" ")[1]
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                payload = json.loads(await reader.readexactly(length))
+                self.requests.append((path, payload))
+                if payload.get("stream"):
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+                    for index, word in enumerate(payload["prompt"].split()):
+                        line = json.dumps({"response": f"{word} ", "done": False}).encode() + b"\n"
+                        # Una línea NDJSON puede llegar partida entre dos trozos HTTP.
+                        for piece in (line[:5], line[5:]) if index == 0 else (line,):
+                            writer.write(f"{len(piece):x}\r\n".encode() + piece + b"\r\n")
+                        await writer.drain()
+                    final = json.dumps({"response": "", "done": True}).encode() + b"\n"
+                    writer.write(f"{len(final):x}\r\n".encode() + final + b"\r\n0\r\n\r\n")
+                    await writer.drain()
+                    continue
+                if path == "/api/embed":
+                    await asyncio.sleep(0.01)
+                    answer = {"embeddings": [[1.0, float(len(text)), 0.0, 0.0] for text in payload["input"]]}
+                else:
+                    answer = {"response": f"eco: {payload['prompt']}"}
+                body = json.dumps(answer).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+def test_async_client_shares_keep_alive_connections_between_generation_and_embeddings():
+    async def scenario() -> None:
+        server = _StubOllamaServer()
+        async with server as host:
+            client = AsyncOllamaClient(model="gemma", host=host, max_connections=2)
+            assert await client.generate("hola") == "eco: hola"
+            embedded = await client.embed(input=["a", "bb"])
+            assert embedded["embeddings"][1][1] == 2.0
+            await asyncio.gather(*(client.embed(input=[f"texto {index}"]) for index in range(6)))
+            await client.aclose()
+        assert server.connections <= 2
+        assert len(server.requests) == 8
+
+    asyncio.run(scenario())
+
+
+def test_async_generate_stream_parses_chunked_ndjson_and_reuses_the_connection():
+    async def scenario() -> None:
+        server = _StubOllamaServer()
+        async with server as host:
+            client = AsyncOllamaClient(model="gemma", host=host, max_connections=1)
+            pieces = [piece async for piece in client.generate_stream("hola mundo feliz")]
+            assert await client.generate("otra") == "eco: otra"
+            await client.aclose()
+        assert pieces == ["hola ", "mundo ", "feliz "]
+        assert server.connections == 1
+
+    asyncio.run(scenario())
+
+
+def test_sync_generate_stream_yields_pieces_until_done():
+    lines = [
+        b'{"response": "Hola", "done": false}',
+        b"",
+        b'{"response": " mundo", "done": false}',
+        b'{"response": "", "done": true}',
+        b'{"response": "ignorado", "done": false}',
+    ]
+
+    class _Response:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+        def iter_lines(self):
+            return iter(lines)
+
+    class _Session:
+        def __init__(self) -> None:
+            self.calls: list[dict] = []
+
+        def post(self, url, json, timeout, stream=False):
+            self.calls.append({"url": url, "payload": json, "stream": stream})
+            return _Response()
+
+    session = _Session()
+    client = OllamaClient(model="gemma", session=session)
+    assert list(client.generate_stream("saluda")) == ["Hola", " mundo"]
+    assert session.calls[0]["payload"]["stream"] is True
+    assert session.calls[0]["stream"] is True
+
+
+def test_embedding_gemma_aembed_uses_async_client_and_cache():
+    async def scenario() -> None:
+        server = _StubOllamaServer()
+        async with server as host:
+            client = AsyncOllamaClient(model="gemma", host=host)
+            embedder = EmbeddingGemma(client=None, async_client=client, dimension=4, max_batch_size=2)
+            vectors = await embedder.aembed(["uno", "dos", "tres", "uno"])
+            again = await embedder.aembed(["tres"])
+            await client.aclose()
+        assert [len(payload["input"]) for _, payload in server.requests] == [2, 1]
+        assert vectors[0] == vectors[3]
+        assert again[0] == vectors[2]
+        assert all(math.isclose(math.hypot(*vector), 1.0) for vector in vectors)
+
+    asyncio.run(scenario())
+
+
+def test_async_query_matches_sync_query(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guia.md").write_text(
+        "# Dragones\nLos dragones custodian la cripta.\n# Taberna\nLa taberna sirve hidromiel.",
+        encoding="utf-8",
+    )
+    index = DocumentationIndex(docs, embedder=EmbeddingGemma(client=None, dimension=16), use_snapshot=False)
+    agent = DungeonLifeAgent(knowledge_index=index)
+
+    expected = agent.query("dragones en la cripta")
+    response = asyncio.run(agent.aquery("dragones en la cripta"))
+    assert response.summary == expected.summary
+    assert response.references == expected.references
+    assert asyncio.run(index.asearch("")) == []
@@ -1,6 +1,9 @@
 import math
 
+import pytest
+
 from dungeon_life_agent.embedding_gemma import EmbeddingGemma
+from dungeon_life_agent.vector_math import l2_normalize_many
 
 
 def test_embedding_gemma_returns_normalized_vectors():
@@ -19,3 +22,87 @@ def test_embedding_gemma_handles_textos_vacios():
     vector = embedder.embed([""])[0]
     norm = math.sqrt(sum(component * component for component in vector))
     assert math.isclose(norm, 1.0, rel_tol=1e-6)
+
+
+def _reference_fallback(text: str, dimension: int) -> list[float]:
+    import hashlib
+
+    from dungeon_life_agent.embedding_gemma import _l2_normalize, _tokenize_for_fallback, _unit_vector
+
+    tokens = _tokenize_for_fallback(text)
+    if not tokens:
+        return _unit_vector(dimension)
+    vector = [0.0] * dimension
+    for token in tokens:
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        for index in range(dimension):
+            vector[index] += (digest[index % len(digest)] / 255.0) * 2.0 - 1.0
+    return _l2_normalize(vector)
+
+
+def test_fast_fallback_is_bit_identical_to_reference(monkeypatch):
+    from dungeon_life_agent import embedding_gemma
+
+    texts = ["hola mundo", "", "Dragones, dragones y más dragones en la cripta ñandú 42", "a " * 50]
+    for dimension in (16, 40, 384):
+        # ``embed`` normaliza de nuevo la salida del fallback; la referencia pasa por lo mismo.
+        expected = l2_normalize_many([_reference_fallback(text.strip(), dimension) for text in texts])
+        assert EmbeddingGemma(dimension=dimension, client=None).embed(texts) == expected
+        if embedding_gemma.np is not None:
+            monkeypatch.setattr(embedding_gemma, "np", None)
+            assert EmbeddingGemma(dimension=dimension, client=None).embed(texts) == expected
+            monkeypatch.undo()
+
+
+def test_embedding_gemma_collapses_duplicates_and_concurrent_requests():
+    import threading
+    import time
+
+    class _SlowClient:
+        def __init__(self) -> None:
+            self.inputs: list[list[str]] = []
+
+        def embed(self, *, model, input):
+            self.inputs.append(list(input))
+            time.sleep(0.05)
+            return {"embeddings": [[1.0, float(len(text)), 0.0, 0.0] for text in input]}
+
+    client = _SlowClient()
+    embedder = EmbeddingGemma(client=client, dimension=4)
+    barrier = threading.Barrier(3)
+    results = []
+
+    def worker() -> None:
+        barrier.wait()
+        results.append(embedder.embed(["dragón", "cripta", "dragón"]))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(len(batch) for batch in client.inputs) == 2
+    assert all(batch == results[0] for batch in results)
+    assert results[0][0] == results[0][2]
+
+
+def test_fallback_vectors_are_not_cached_once_the_model_recovers():
+    class _Client:
+        available = False
+
+        def embed(self, *, model, input):
+            if not self.available:
+                raise ConnectionError("ollama caído")
+            return {"embeddings": [[0.0, 3.0, 0.0, 4.0] for _ in input]}
+
+    client = _Client()
+    embedder = EmbeddingGemma(client=client, dimension=4)
+    degraded = embedder.embed(["grifos"])[0]
+    assert embedder.fallback_batches == 1
+
+    client.available = True
+    assert embedder.embed(["grifos"])[0] == pytest.approx([0.0, 0.6, 0.0, 0.8])
+    assert degraded != pytest.approx([0.0, 0.6, 0.0, 0.8])
+    assert embedder.fallback_batches == 1
+    embedder.close()
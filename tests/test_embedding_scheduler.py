@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from dungeon_life_agent.embedding_scheduler import EmbeddingBatcher
+
+
+class _RecordingBackend:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.batches: list[list[str]] = []
+        self.delay = delay
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text)), float(index)] for index, text in enumerate(texts)]
+
+
+def test_oversize_requests_are_split_and_reassembled_in_order():
+    backend = _RecordingBackend()
+    batcher = EmbeddingBatcher(backend, max_batch_size=4)
+    texts = [f"texto-{index}" * (index + 1) for index in range(10)]
+
+    vectors = batcher.submit(texts)
+    batcher.close()
+
+    assert [len(batch) for batch in backend.batches] == [4, 4, 2]
+    assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+
+
+def test_concurrent_callers_share_batches_and_get_their_own_vectors():
+    backend = _RecordingBackend(delay=0.01)
+    batcher = EmbeddingBatcher(backend, max_batch_size=16, max_wait_ms=20.0)
+    barrier = threading.Barrier(8)
+    results: dict[int, list[list[float]]] = {}
+
+    def worker(identifier: int) -> None:
+        barrier.wait()
+        results[identifier] = batcher.submit(["x" * (identifier + 1)])
+
+    threads = [threading.Thread(target=worker, args=(identifier,)) for identifier in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert len(backend.batches) < 8
+    assert all(len(batch) <= 16 for batch in backend.batches)
+    assert {identifier: vectors[0][0] for identifier, vectors in results.items()} == {
+        identifier: float(identifier + 1) for identifier in range(8)
+    }
+
+
+def test_backend_errors_reach_every_caller_in_the_batch():
+    def failing(texts):
+        raise ConnectionError("ollama caído")
+
+    batcher = EmbeddingBatcher(failing, max_batch_size=2)
+    with pytest.raises(ConnectionError):
+        batcher.submit(["a", "b", "c"])
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(["d"])
+
+
+def _threads_named(name: str) -> list[threading.Thread]:
+    return [thread for thread in threading.enumerate() if thread.name == name]
+
+
+def test_idle_dispatcher_exits_and_restarts_on_demand():
+    backend = _RecordingBackend()
+    batcher = EmbeddingBatcher(backend, idle_timeout=0.01, name="despachador-ocioso")
+    assert batcher.submit(["a"])[0][0] == 1.0
+    (first,) = _threads_named("despachador-ocioso")
+    first.join(timeout=2.0)
+    assert not first.is_alive()
+
+    assert batcher.submit(["bb"])[0][0] == 2.0
+    batcher.close()
+    assert len(backend.batches) == 2
+
+
+def test_embedding_gemma_close_stops_its_dispatcher():
+    from dungeon_life_agent.embedding_gemma import EmbeddingGemma
+
+    class _Client:
+        def embed(self, *, model, input):
+            return {"embeddings": [[1.0, 0.0, 0.0, 0.0] for _ in input]}
+
+    embedder = EmbeddingGemma(client=_Client(), model="gemma-cierre", dimension=4)
+    embedder.embed(["hola"])
+    (thread,) = _threads_named("embeddings-gemma-cierre")
+    assert thread.is_alive()
+    embedder.close()
+    assert not thread.is_alive()
+
+
+def test_closed_embedding_gemma_raises_instead_of_falling_back(caplog):
+    from dungeon_life_agent.embedding_gemma import EmbeddingGemma
+
+    class _Client:
+        def __init__(self) -> None:
+            self.fail = False
+
+        def embed(self, *, model, input):
+            if self.fail:
+                raise ConnectionError("ollama caído")
+            return {"embeddings": [[1.0, 0.0, 0.0, 0.0] for _ in input]}
+
+    client = _Client()
+    embedder = EmbeddingGemma(client=client, dimension=4)
+    client.fail = True
+    with caplog.at_level("WARNING", logger="dungeon_life_agent.embedding_gemma"):
+        assert embedder.embed(["caído"])
+    assert "ollama caído" in caplog.text
+
+    embedder.close()
+    with pytest.raises(RuntimeError):
+        embedder.embed(["tras cerrar"])
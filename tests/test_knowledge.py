@@ -1,21 +1,53 @@
+import sys
+import time
+
+import pytest
+
 from dungeon_life_agent.knowledge import DocumentationIndex
+from dungeon_life_agent.search_pipeline import HybridSearchPipeline, SearchPipelineConfig
+
+
+class _NullEmbedder:
+    def embed(self, texts):
+        return [[1.0] for _ in texts]
+
+
+class _RecordingPipeline(HybridSearchPipeline):
+    """Pipeline que solo registra los candidatos BM25 que le entrega el índice."""
+
+    def __init__(self, **config) -> None:
+        super().__init__(embedder=_NullEmbedder(), config=SearchPipelineConfig(**config))
+        self.candidates: list[tuple[str, float]] = []
+
+    def search(self, query, candidates, **kwargs):
+        self.candidates = [(candidate.section.identifier, candidate.score) for candidate in candidates]
+        return []
+
+
+def _stage_one(index: DocumentationIndex, pipeline: _RecordingPipeline, query: str, pool_size: int):
+    """Candidatos de la primera etapa para ``query`` con un pool de ``pool_size`` secciones."""
+
+    pipeline.config.lexical_top_k = pool_size
+    pipeline.candidates = []
+    index.search(query, limit=1)
+    return pipeline.candidates
 
 
 def test_search_returns_results():
-    index = DocumentationIndex("Documentacion")
+    index = DocumentationIndex("Documentacion", use_snapshot=False)
     results = index.search("arquitectura tecnica", limit=5)
     assert results, "Se esperaba al menos un resultado"
     assert all(result.section.document_path.suffix == ".md" for result in results)
 
 
 def test_list_documents_returns_all_markdown_files():
-    index = DocumentationIndex("Documentacion")
+    index = DocumentationIndex("Documentacion", use_snapshot=False)
     docs = index.list_documents()
     assert any(doc.endswith("00_README_Principal.md") for doc in map(str, docs))
 
 
 def test_suggest_returns_titles_by_prefix():
-    index = DocumentationIndex("Documentacion")
+    index = DocumentationIndex("Documentacion", use_snapshot=False)
     suggestions = index.suggest("tax")
     assert suggestions, "Se esperaban sugerencias para prefijos conocidos"
     assert any("tax" in suggestion.lower() for suggestion in suggestions)
@@ -34,3 +66,309 @@ def test_refresh_updates_modified_documents(tmp_path):
     index.refresh(paths=[source])
     results = index.search("dragones")
     assert results, "La búsqueda debería reflejar el nuevo contenido"
+
+
+def test_stage_one_postings_match_bm25_scan():
+    import math
+    from collections import Counter
+
+    pipeline = _RecordingPipeline()
+    index = DocumentationIndex("Documentacion", use_snapshot=False, pipeline=pipeline)
+    tokens = ["arquitectura", "memoria", "pipeline", "memoria"]
+
+    # Recorrido BM25 de referencia (k1=1.5, b=0.75) sobre todas las secciones.
+    sections = index.sections
+    avg_length = sum(len(section.tokens) for section in sections) / len(sections)
+    frequencies = [Counter(section.tokens) for section in sections]
+    expected = []
+    for section, counts in zip(sections, frequencies):
+        score = 0.0
+        for token in tokens:
+            containing = sum(1 for other in frequencies if token in other)
+            if not counts[token]:
+                continue
+            idf = math.log((len(sections) - containing + 0.5) / (containing + 0.5) + 1.0)
+            length_norm = 1 - 0.75 + 0.75 * (len(section.tokens) / avg_length)
+            score += idf * (counts[token] * 2.5) / (counts[token] + 1.5 * length_norm)
+        if score > 0:
+            expected.append((section.identifier, score))
+    expected.sort(key=lambda item: item[1], reverse=True)
+
+    results = _stage_one(index, pipeline, " ".join(tokens), len(sections))
+    assert [identifier for identifier, _ in results] == [identifier for identifier, _ in expected]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+
+def test_wand_engine_matches_exhaustive_top_k():
+    pipeline = _RecordingPipeline()
+    index = DocumentationIndex("Documentacion", use_snapshot=False, pipeline=pipeline)
+    queries = [
+        "arquitectura",
+        "memoria colectiva conocimiento tacito",
+        "pipeline hibrido embeddings ollama pipeline agente",
+    ]
+    for query in queries:
+        for pool_size in (1, 5, 50):
+            pipeline.config.lexical_engine = "exhaustive"
+            expected = _stage_one(index, pipeline, query, pool_size)
+            pipeline.config.lexical_engine = "wand"
+            assert _stage_one(index, pipeline, query, pool_size) == expected
+
+
+def test_snapshot_restores_index_and_reparses_only_changed_files(tmp_path, monkeypatch):
+    from dungeon_life_agent import knowledge
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "alfa.md").write_text("# Alfa\nDragones en la cripta.\n# Beta\nMapas del bosque.", encoding="utf-8")
+    (docs / "gamma.md").write_text("# Gamma\nTaberna de los dragones.", encoding="utf-8")
+
+    pipeline = _RecordingPipeline()
+    original = DocumentationIndex(docs, pipeline=pipeline)
+    snapshot = docs.with_name(".docs.dlaidx")
+    assert snapshot.exists()
+
+    parsed: list[str] = []
+    real_parse = knowledge._parse_sections
+
+    def _tracking_parse(path):
+        parsed.append(path.name)
+        return real_parse(path)
+
+    monkeypatch.setattr(knowledge, "_parse_sections", _tracking_parse)
+
+    expected = _stage_one(original, pipeline, "dragones", 5)
+    restored = DocumentationIndex(docs, pipeline=pipeline)
+    assert parsed == []
+    assert [s.identifier for s in restored.sections] == [s.identifier for s in original.sections]
+    assert _stage_one(restored, pipeline, "dragones", 5) == expected
+    assert restored.suggest("gam") == original.suggest("gam")
+
+    (docs / "gamma.md").write_text("# Gamma\nTaberna de los grifos y un texto más largo.", encoding="utf-8")
+    updated = DocumentationIndex(docs)
+    assert parsed == ["gamma.md"]
+    assert updated.search("grifos")
+
+
+def test_incremental_refresh_matches_full_rebuild(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "alfa.md").write_text("# Alfa\nDragones en la cripta.\n# Beta\nMapas del bosque.", encoding="utf-8")
+    (docs / "gamma.md").write_text("---\ntags: taberna, gremios\n---\n# Gamma\nTaberna de dragones.", encoding="utf-8")
+    (docs / "delta.md").write_text("# Delta\nGremios de cartógrafos y mapas.", encoding="utf-8")
+
+    pipeline = _RecordingPipeline()
+    index = DocumentationIndex(docs, use_snapshot=False, pipeline=pipeline)
+    (docs / "gamma.md").write_text("# Gamma\nTaberna de grifos, mapas y más mapas.", encoding="utf-8")
+    (docs / "delta.md").unlink()
+    index.refresh()
+
+    rebuilt = DocumentationIndex(docs, use_snapshot=False, pipeline=pipeline)
+    # Las puntuaciones BM25 dependen del IDF y de la longitud media de sección.
+    for query in ("mapas", "dragones", "grifos", "gremios", "taberna mapas dragones", "cartografos"):
+        assert _stage_one(index, pipeline, query, 10) == _stage_one(rebuilt, pipeline, query, 10)
+    for prefix in ("", "a", "b", "g", "d"):
+        assert index.suggest(prefix, limit=10) == rebuilt.suggest(prefix, limit=10)
+    assert [s.identifier for s in index.sections] == [s.identifier for s in rebuilt.sections]
+
+
+def test_tied_scores_follow_document_order_after_incremental_refresh(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name in ("alfa", "beta", "gamma"):
+        (docs / f"{name}.md").write_text(f"# {name} uno\nDragones y mapas.\n# {name} dos\nDragones y mapas.", encoding="utf-8")
+
+    pipeline = _RecordingPipeline()
+    index = DocumentationIndex(docs, use_snapshot=False, pipeline=pipeline)
+    (docs / "alfa.md").write_text("# alfa uno\nDragones y mapas.\n# alfa dos\nDragones y mapas.\n", encoding="utf-8")
+    index.refresh(paths=[docs / "alfa.md"])
+    rebuilt = DocumentationIndex(docs, use_snapshot=False, pipeline=pipeline)
+
+    for engine in ("exhaustive", "wand"):
+        pipeline.config.lexical_engine = engine
+        for pool_size in (1, 3, 6):
+            incremental = [identifier for identifier, _ in _stage_one(index, pipeline, "dragones", pool_size)]
+            full = [identifier for identifier, _ in _stage_one(rebuilt, pipeline, "dragones", pool_size)]
+            assert incremental == full
+    assert full[:2] == ["alfa.md::alfa uno", "alfa.md::alfa dos"]
+
+
+def test_parallel_build_matches_serial_build():
+    pipeline = _RecordingPipeline()
+    serial = DocumentationIndex("Documentacion", use_snapshot=False, pipeline=pipeline)
+    parallel = DocumentationIndex("Documentacion", use_snapshot=False, build_workers=2, pipeline=pipeline)
+
+    assert parallel.sections == serial.sections
+    for query in ("arquitectura memoria pipeline", "dragones", "embeddings ollama"):
+        assert _stage_one(parallel, pipeline, query, 10) == _stage_one(serial, pipeline, query, 10)
+    assert parallel.suggest("", limit=50) == serial.suggest("", limit=50)
+
+
+def test_refresh_publishes_new_generation_without_touching_readers(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    source = docs / "guia.md"
+    source.write_text("# Guia\nContenido inicial sobre agentes.", encoding="utf-8")
+    refreshed = []
+
+    class _RefreshingPipeline(_RecordingPipeline):
+        """Publica una generación nueva mientras la búsqueda aún usa la anterior."""
+
+        def search(self, query, candidates, **kwargs):
+            if not refreshed:
+                source.write_text("# Guia\nContenido con dragones y agentes.", encoding="utf-8")
+                refreshed.append(index.refresh_paths([source]))
+            return super().search(query, candidates, **kwargs)
+
+    pipeline = _RefreshingPipeline()
+    index = DocumentationIndex(docs, use_snapshot=False, pipeline=pipeline)
+    candidates = _stage_one(index, pipeline, "inicial", 5)
+
+    assert refreshed == [True]
+    assert [identifier for identifier, _ in candidates] == ["guia.md::Guia"]
+    assert _stage_one(index, pipeline, "inicial", 5) == []
+    assert [identifier for identifier, _ in _stage_one(index, pipeline, "dragones", 5)] == ["guia.md::Guia"]
+
+
+def test_refresh_copies_only_changed_entries_and_defers_the_snapshot(tmp_path, monkeypatch):
+    from dungeon_life_agent import knowledge
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for number in range(40):
+        (docs / f"doc{number:02d}.md").write_text(f"# Doc {number}\nTexto comun y termino{number}.", encoding="utf-8")
+    pipeline = _RecordingPipeline()
+    index = DocumentationIndex(docs, pipeline=pipeline)
+    snapshot = docs.with_name(".docs.dlaidx")
+    saved = snapshot.read_bytes()
+
+    parsed: list[str] = []
+    real_parse = knowledge._parse_sections
+
+    def _tracking_parse(path):
+        parsed.append(path.name)
+        return real_parse(path)
+
+    monkeypatch.setattr(knowledge, "_parse_sections", _tracking_parse)
+    (docs / "doc07.md").write_text("# Doc 7\nTexto comun con dragones.", encoding="utf-8")
+    index.refresh()
+
+    assert parsed == ["doc07.md"]
+    assert _stage_one(index, pipeline, "termino7", 5) == []
+    assert [identifier for identifier, _ in _stage_one(index, pipeline, "dragones", 5)] == ["doc07.md::Doc 7"]
+    assert len(_stage_one(index, pipeline, "termino8", 5)) == 1
+    assert snapshot.read_bytes() == saved, "Un cambio suelto no debe reescribir la instantánea"
+
+    index.close()
+    assert snapshot.read_bytes() != saved
+    assert _stage_one(DocumentationIndex(docs, pipeline=pipeline), pipeline, "dragones", 5)
+
+
+def test_watcher_stop_leaves_the_source_open_while_a_batch_is_running(tmp_path, monkeypatch):
+    import threading
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    source = docs / "guia.md"
+    source.write_text("# Guia\nContenido inicial.", encoding="utf-8")
+    index = DocumentationIndex(docs, use_snapshot=False)
+    entered, release = threading.Event(), threading.Event()
+
+    def _blocking_refresh(paths):
+        entered.set()
+        release.wait(5.0)
+        return False
+
+    closed = []
+    monkeypatch.setattr(
+        "dungeon_life_agent.index_watcher._PollingEventSource.close", lambda source: closed.append(True)
+    )
+    index.refresh_paths = _blocking_refresh
+    watcher = index.start_watching(backend="polling", debounce=0.0, poll_interval=0.05)
+    (thread,) = [thread for thread in threading.enumerate() if thread.name == "willow-doc-watcher"]
+    source.write_text("# Guia\nContenido cambiado.", encoding="utf-8")
+    assert entered.wait(5.0)
+
+    watcher.stop(timeout=0.05)
+    assert thread.is_alive() and not closed
+    release.set()
+    thread.join(5.0)
+    assert closed == [True]
+
+
+@pytest.mark.parametrize("backend", ["polling", "inotify"])
+def test_watcher_keeps_index_fresh(tmp_path, backend):
+    if backend == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify solo existe en Linux")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guia.md").write_text("# Guia\nContenido inicial sobre agentes.", encoding="utf-8")
+    index = DocumentationIndex(docs)
+    watcher = index.start_watching(backend=backend, debounce=0.05, poll_interval=0.1)
+    try:
+        assert watcher.backend == backend
+        (docs / "nuevo.md").write_text("# Nuevo\nUn grimorio de hechizos.", encoding="utf-8")
+        deadline = time.monotonic() + 5.0
+        while not index.search("grimorio") and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert index.search("grimorio"), "El observador debería indexar el documento nuevo"
+    finally:
+        index.stop_watching()
+    assert not watcher.running
+    restored = DocumentationIndex(docs)
+    assert any(path.name == "nuevo.md" for path in restored.list_documents())
+
+
+def test_chunks_are_precomputed_at_index_time_and_refreshed(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    source = docs / "guia.md"
+    source.write_text("# Guia\nDragones en la cripta. Mapas del bosque.", encoding="utf-8")
+
+    pipeline = HybridSearchPipeline(embedder=_NullEmbedder())
+    index = DocumentationIndex(docs, pipeline=pipeline)
+    key = pipeline.chunk_key()
+    assert all(key in section.chunks for section in index.sections)
+
+    monkeypatch.setattr(pipeline, "_build_chunks", lambda *args: pytest.fail("no se debe re-segmentar"))
+    assert index.search("dragones")
+    restored = DocumentationIndex(docs, pipeline=pipeline)
+    assert restored.sections[0].chunks[key] == index.sections[0].chunks[key]
+    monkeypatch.undo()
+
+    source.write_text("# Guia\nGrifos sobre la taberna.", encoding="utf-8")
+    index.refresh(paths=[source])
+    assert "Grifos" in index.sections[0].chunks[key][0]
+
+
+def test_sparse_semantic_mode_ranks_without_embedding_calls(tmp_path):
+    from dungeon_life_agent.search_pipeline import SearchPipelineConfig
+
+    class _ForbiddenEmbedder:
+        def embed(self, texts, strategy="auto"):
+            raise AssertionError("el modo disperso no debe generar embeddings")
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "bestiario.md").write_text(
+        "---\ntags: criaturas\n---\n# Dragones\nLos dragones custodian tesoros.\n"
+        "# Grifos\nLos grifos vigilan las montañas y los tesoros.",
+        encoding="utf-8",
+    )
+    (docs / "taberna.md").write_text("# Taberna\nLa taberna sirve cerveza.", encoding="utf-8")
+
+    index = DocumentationIndex(
+        docs,
+        embedder=_ForbiddenEmbedder(),
+        pipeline_config=SearchPipelineConfig(semantic_mode="sparse"),
+        use_snapshot=False,
+    )
+    weights = {section.title: section.term_weights for section in index.sections}
+    assert abs(sum(value * value for value in weights["Grifos"].values()) - 1.0) < 1e-9
+    assert "dragones" in weights["Grifos"], "La expansión por documento debe aportar términos vecinos"
+    assert "criaturas" in weights["Dragones"]
+
+    results = index.search("grifos tesoros", limit=2)
+    assert results[0].section.document_path.name == "bestiario.md"
+    trace = index.last_search_trace()
+    assert any(stage.parameters.get("modo") == "sparse" for stage in trace.stages)
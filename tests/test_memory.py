@@ -1,5 +1,7 @@
 import json
 
+import pytest
+
 from dungeon_life_agent.memory import CollectiveMemory
 
 
@@ -20,3 +22,370 @@ def test_collective_memory_capture_and_search(tmp_path):
     with storage.open("r", encoding="utf-8") as stream:
         raw = json.load(stream)
     assert len(raw) == 2
+
+
+def test_log_backend_appends_without_rewriting_the_snapshot(tmp_path):
+    storage = tmp_path / "memoria.json"
+    memory = CollectiveMemory(storage, backend="log")
+    for index in range(5):
+        memory.capture(channel="general", author="alice", content=f"evento {index} pipeline")
+    memory.close()
+
+    assert not storage.exists(), "Capturar no debe reescribir la instantánea"
+    log_path = tmp_path / "memoria.json.log"
+    assert len(log_path.read_text(encoding="utf-8").splitlines()) == 5
+
+    # Una última línea truncada (corte a mitad de escritura) se ignora.
+    with log_path.open("a", encoding="utf-8") as stream:
+        stream.write('{"identifier": "roto", "timest')
+    reopened = CollectiveMemory(storage, backend="log")
+    assert len(reopened.list_recent(limit=10)) == 5
+
+    reopened.compact()
+    reopened.close()
+    assert len(json.loads(storage.read_text(encoding="utf-8"))) == 5
+    assert log_path.read_text(encoding="utf-8") == ""
+    assert len(CollectiveMemory(storage).search("pipeline", limit=10)) == 5
+
+
+def test_log_backend_compacts_once_the_log_outgrows_the_snapshot(tmp_path):
+    storage = tmp_path / "memoria.json"
+    log_path = tmp_path / "memoria.json.log"
+    memory = CollectiveMemory(storage, backend="log", compact_min_records=3)
+    for index in range(4):
+        memory.capture(channel="general", author="bob", content=f"nota {index}")
+
+    assert len(json.loads(storage.read_text(encoding="utf-8"))) == 3
+    assert len(log_path.read_text(encoding="utf-8").splitlines()) == 1
+
+    # Si el proceso cae entre compactar y vaciar el log, no hay duplicados.
+    with log_path.open("a", encoding="utf-8") as stream:
+        stream.write(json.dumps(json.loads(storage.read_text(encoding="utf-8"))[0]) + "\n")
+    memory.close()
+    assert len(CollectiveMemory(storage, backend="log").list_recent(limit=10)) == 4
+
+
+def test_search_ranks_with_bm25_and_filters_by_channel_postings(tmp_path):
+    memory = CollectiveMemory(tmp_path / "memoria.json")
+    memory.capture(channel="arte", author="ana", content="dragon dragon dragon " + "relleno " * 40)
+    memory.capture(channel="arte", author="ana", content="dragon de la cripta")
+    memory.capture(channel="diseño", author="leo", content="cripta dragon pipeline")
+    for index in range(5):
+        memory.capture(channel="diseño", author="leo", content=f"nota común {index} cripta")
+
+    # La longitud del registro normaliza la frecuencia: el texto corto gana.
+    results = memory.search("dragon", limit=2, channels=["Arte"])
+    assert [record.content for record in results] == ["dragon de la cripta", results[1].content]
+    assert all(record.channel == "arte" for record in results)
+
+    # "pipeline" es raro y pesa más que el muy frecuente "cripta".
+    assert memory.search("cripta pipeline", limit=1)[0].content == "cripta dragon pipeline"
+    assert memory.search("inexistente") == []
+    assert memory.search("dragon", limit=0) == []
+
+    reopened = CollectiveMemory(tmp_path / "memoria.json")
+    assert [record.identifier for record in reopened.search("dragon", limit=3)] == [
+        record.identifier for record in memory.search("dragon", limit=3)
+    ]
+
+
+def test_sqlite_backend_serves_queries_with_sql_and_migrates_json(tmp_path):
+    from dungeon_life_agent.memory import migrate_json_to_sqlite
+
+    source = tmp_path / "memoria.json"
+    legacy = CollectiveMemory(source)
+    legacy.capture(channel="Arte", author="ana", content="Boceto del dragón de la cripta", tags=["concepto"])
+    legacy.capture(channel="diseño", author="leo", content="Balance de la taberna", decisions=["alto:revisar"])
+
+    database = tmp_path / "memoria.sqlite3"
+    assert migrate_json_to_sqlite(source, database) == 2
+    assert migrate_json_to_sqlite(source, database) == 0, "La migración debe ser idempotente"
+
+    memory = CollectiveMemory(database, backend="sqlite")
+    # Un segundo proceso que escribe sobre la misma base no pisa al primero.
+    other = CollectiveMemory(database, backend="sqlite")
+    other.capture(channel="arte", author="eva", content="Paleta del dragón nocturno")
+    memory.capture(channel="general", author="bob", content="Reunión de roadmap")
+
+    assert memory.channels() == ["Arte", "arte", "diseño", "general"]
+    assert {record.author for record in memory.list_recent(limit=10)} == {"ana", "leo", "eva", "bob"}
+    assert len(memory.list_recent(limit=2)) == 2
+
+    results = memory.search("dragón", limit=5, channels=["ARTE"])
+    assert {record.author: record.tags for record in results} == {"ana": ("concepto",), "eva": ()}
+    assert memory.search("revisar")[0].decisions == ("alto:revisar",)
+    assert memory.search("inexistente") == []
+
+    memory.compact()
+    memory.close()
+    other.close()
+
+
+def test_timeline_orders_recent_records_and_filters_search_windows(tmp_path):
+    from datetime import UTC, datetime
+
+    from dungeon_life_agent.memory import migrate_json_to_sqlite
+
+    storage = tmp_path / "memoria.json"
+    entries = [
+        {"identifier": "c", "timestamp": "2026-03-01T10:00:00+00:00", "channel": "arte", "content": "dragón final"},
+        {"identifier": "a", "timestamp": "2026-01-01T10:00:00+00:00", "channel": "arte", "content": "dragón inicial"},
+        {"identifier": "b", "timestamp": "2026-02-01T10:00:00+00:00", "channel": "diseño", "content": "dragón medio"},
+    ]
+    storage.write_text(json.dumps(entries), encoding="utf-8")
+    memory = CollectiveMemory(storage)
+
+    assert [record.identifier for record in memory.list_recent(limit=2)] == ["c", "b"]
+    assert memory.list_recent(limit=0) == []
+    assert memory.channel_counts() == {"arte": 2, "diseño": 1}
+
+    window = memory.search("dragón", limit=5, since="2026-01-15", until=datetime(2026, 3, 1, 10, tzinfo=UTC))
+    assert [record.identifier for record in window] == ["b"]
+    assert [record.identifier for record in memory.search("dragón", since="2026-02-01T10:00:00+00:00")] == ["c", "b"]
+    assert memory.search("dragón", until="2025-12-31") == []
+
+    latest = memory.capture(channel="arte", author="ana", content="dragón recién capturado")
+    assert memory.list_recent(limit=1) == [latest]
+    assert memory.channel_counts()["arte"] == 3
+    assert memory.search("dragón", since=latest.timestamp) == [latest]
+
+    database = tmp_path / "memoria.sqlite3"
+    migrate_json_to_sqlite(storage, database)
+    sql_memory = CollectiveMemory(database, backend="sqlite")
+    assert sql_memory.channel_counts() == {"arte": 3, "diseño": 1}
+    assert [record.identifier for record in sql_memory.search("dragón", since="2026-01-15", until="2026-03-01")] == ["b"]
+    sql_memory.close()
+
+
+class _ThemeEmbedder:
+    """Embedder de prueba: agrupa sinónimos en la misma dirección del espacio."""
+
+    model = "temas"
+    dimension = 3
+    _themes = ({"dragón", "wyrm", "sierpe"}, {"taberna", "posada", "hidromiel"}, {"roadmap", "hitos"})
+
+    def __init__(self) -> None:
+        self.texts = 0
+
+    def embed(self, texts):
+        texts = list(texts)
+        self.texts += len(texts)
+        vectors = []
+        for text in texts:
+            words = set(text.lower().split())
+            vectors.append([float(len(words & theme)) for theme in self._themes])
+        return vectors
+
+
+def test_semantic_search_fuses_bm25_with_cosine_and_persists_vectors(tmp_path):
+    storage = tmp_path / "memoria.json"
+    embedder = _ThemeEmbedder()
+    memory = CollectiveMemory(storage, backend="log", embedder=embedder)
+    memory.capture(channel="arte", author="ana", content="boceto del wyrm de la cripta")
+    memory.capture(channel="diseño", author="leo", content="la posada sirve hidromiel")
+    memory.capture(channel="diseño", author="leo", content="la sierpe duerme bajo la posada")
+    memory.capture(channel="general", author="bob", content="revisión de hitos del roadmap")
+    memory.close()
+
+    # Sin coincidencia léxica, la similitud coseno recupera los sinónimos.
+    assert {record.author for record in memory.search("dragón", limit=5)} == {"ana", "leo"}
+    assert [record.author for record in memory.search("dragón", limit=5, channels=["arte"])] == ["ana"]
+    # BM25 desempata a favor del registro que además comparte términos.
+    assert memory.search("sierpe", limit=1)[0].content == "la sierpe duerme bajo la posada"
+    assert memory.search("hitos", limit=5)[0].author == "bob"
+
+    assert (tmp_path / "memoria.json.dlavec").exists()
+    reopened_embedder = _ThemeEmbedder()
+    reopened = CollectiveMemory(storage, backend="log", embedder=reopened_embedder)
+    # Solo se embebe un registro para comprobar la dimensión; el resto viene del disco.
+    assert reopened_embedder.texts == 1, "Los vectores persistidos no deben recalcularse"
+    assert [record.identifier for record in reopened.search("dragón", limit=5)] == [
+        record.identifier for record in memory.search("dragón", limit=5)
+    ]
+
+
+def test_large_semantic_memories_prefilter_with_the_random_projection(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    import random
+
+    from dungeon_life_agent import memory as memory_module
+
+    class _RandomEmbedder:
+        """Vector pseudoaleatorio fijo por texto: la consulta ``nota N`` coincide con su registro."""
+
+        model = "aleatorio"
+        dimension = 96
+
+        def embed(self, texts):
+            return [[random.Random(text).gauss(0.0, 1.0) for _ in range(96)] for text in texts]
+
+    memory = CollectiveMemory(tmp_path / "memoria.json", backend="log", embedder=_RandomEmbedder())
+    for index in range(400):
+        memory.capture(channel=f"canal-{index % 4}", author="ana", content=f"nota {index}")
+    exact = [record.content for record in memory.search("nota 123", limit=5)]
+    exact_channel = [record.content for record in memory.search("nota 123", channels=["canal-3"], limit=5)]
+
+    # Sin margen para el barrido exacto toda consulta pasa por la proyección.
+    monkeypatch.setattr(memory_module, "_EXACT_SCAN_CELLS", 0)
+    assert [record.content for record in memory.search("nota 123", limit=5)][0] == exact[0] == "nota 123"
+    assert [record.content for record in memory.search("nota 123", channels=["canal-3"], limit=5)][0] == (
+        exact_channel[0]
+    )
+    assert exact_channel[0] == "nota 123"
+
+
+def test_log_backend_recovers_from_a_torn_line_before_appending_again(tmp_path):
+    storage = tmp_path / "memoria.json"
+    memory = CollectiveMemory(storage, backend="log")
+    memory.capture(channel="general", author="ana", content="primero")
+    memory.close()
+    log_path = tmp_path / "memoria.json.log"
+    with log_path.open("a", encoding="utf-8") as stream:
+        stream.write('{"identifier": "roto", "timest')
+
+    reopened = CollectiveMemory(storage, backend="log")
+    reopened.capture(channel="general", author="ana", content="segundo grifos")
+    reopened.close()
+
+    final = CollectiveMemory(storage, backend="log")
+    assert sorted(record.content for record in final.list_recent(limit=10)) == ["primero", "segundo grifos"]
+    assert all(line.startswith("{") for line in log_path.read_text(encoding="utf-8").splitlines())
+
+
+def test_search_windows_parse_iso_bounds_with_zones(tmp_path):
+    storage = tmp_path / "memoria.json"
+    entries = [
+        {"identifier": "a", "timestamp": "2026-05-01T12:00:00+00:00", "channel": "arte", "content": "grifo dorado"},
+        {"identifier": "b", "timestamp": "2026-05-01T15:00:00+00:00", "channel": "arte", "content": "grifo plateado"},
+    ]
+    storage.write_text(json.dumps(entries), encoding="utf-8")
+    memory = CollectiveMemory(storage)
+
+    assert [record.identifier for record in memory.search("grifo", since="2026-05-01T12:00:00Z")] == ["b", "a"]
+    # 08:00-05:00 es 13:00 UTC: el registro de las 12:00 queda fuera.
+    assert [record.identifier for record in memory.search("grifo", since="2026-05-01T08:00:00-05:00")] == ["b"]
+    assert [record.identifier for record in memory.search("grifo", until="2026-05-01T13:00:00+01:00")] == []
+
+    database = tmp_path / "memoria.sqlite3"
+    from dungeon_life_agent.memory import migrate_json_to_sqlite
+
+    migrate_json_to_sqlite(storage, database)
+    sql_memory = CollectiveMemory(database, backend="sqlite")
+    assert [record.identifier for record in sql_memory.search("grifo", since="2026-05-01T08:00:00-05:00")] == ["b"]
+    assert len(sql_memory.search("grifo", since="2026-05-01T12:00:00Z")) == 2
+    sql_memory.close()
+
+
+def test_semantic_memory_rebuilds_vectors_when_the_embedding_dimension_changes(tmp_path):
+    from dungeon_life_agent.advanced_embeddings import EmbeddingModelConfig, EmbeddingSystem, HybridEmbeddingCache
+    from dungeon_life_agent.memory import _embedder_namespace
+
+    class _Constant:
+        """Embedder sin ``model`` ni ``dimension``: su espacio de nombres no delata el tamaño."""
+
+        def __init__(self, size: int) -> None:
+            self._size = size
+
+        def embed(self, texts):
+            return [[1.0] + [0.5] * (self._size - 1) for _ in texts]
+
+    def system(dimension: int) -> EmbeddingSystem:
+        return EmbeddingSystem(
+            [EmbeddingModelConfig(name="fijo", dimension=dimension)],
+            cache=HybridEmbeddingCache(redis_url=None),
+            factories={"fijo": lambda config: _Constant(config.dimension)},
+        )
+
+    assert _embedder_namespace(system(8)) != _embedder_namespace(system(4))
+
+    for name, old, new in (("sistema", system(8), system(4)), ("anonimo", _Constant(8), _Constant(4))):
+        storage = tmp_path / f"{name}.json"
+        memory = CollectiveMemory(storage, embedder=old)
+        memory.capture(channel="general", author="ana", content="primer evento")
+        memory.close()
+
+        resized = CollectiveMemory(storage, embedder=new)
+        resized.capture(channel="general", author="bob", content="segundo evento")
+        assert len(resized.search("evento", limit=5)) == 2
+        resized.close()
+        # El almacén de vectores quedó reconstruido con la dimensión nueva.
+        assert len(CollectiveMemory(storage, embedder=new).search("evento", limit=5)) == 2
+
+
+def test_failed_embedding_leaves_the_memory_untouched(tmp_path):
+    class _FlakyEmbedder(_ThemeEmbedder):
+        def embed(self, texts):
+            texts = list(texts)
+            if any("fantasma" in text for text in texts):
+                raise ConnectionError("modelo caído")
+            return super().embed(texts)
+
+    storage = tmp_path / "memoria.json"
+    memory = CollectiveMemory(storage, backend="log", embedder=_FlakyEmbedder())
+    memory.capture(channel="arte", author="ana", content="wyrm uno")
+    with pytest.raises(ConnectionError):
+        memory.capture(channel="arte", author="ana", content="fantasma en la posada")
+    memory.capture(channel="diseño", author="leo", content="posada tres")
+
+    assert [record.content for record in memory.search("posada", limit=5)] == ["posada tres"]
+    assert [record.content for record in memory.search("dragón", limit=5)] == ["wyrm uno"]
+    assert [record.content for record in memory.list_recent(limit=5)] == ["posada tres", "wyrm uno"]
+    assert memory.channel_counts() == {"arte": 1, "diseño": 1}
+    memory.close()
+
+    reopened = CollectiveMemory(storage, backend="log", embedder=_FlakyEmbedder())
+    assert [record.content for record in reopened.search("posada", limit=5)] == ["posada tres"]
+
+
+def test_fractional_bounds_and_same_second_records_keep_their_order(tmp_path):
+    storage = tmp_path / "memoria.json"
+    entries = [
+        {"identifier": f"r{index}", "timestamp": "2026-06-01T10:00:00+00:00", "channel": "arte", "content": "grifo"}
+        for index in range(3)
+    ]
+    entries.append({"identifier": "tarde", "timestamp": "2026-06-01T10:00:01+00:00", "channel": "arte", "content": "grifo"})
+    storage.write_text(json.dumps(entries), encoding="utf-8")
+    memory = CollectiveMemory(storage)
+
+    assert [record.identifier for record in memory.list_recent(limit=4)] == ["tarde", "r2", "r1", "r0"]
+    assert [record.identifier for record in memory.search("grifo", since="2026-06-01T10:00:00.500Z")] == ["tarde"]
+    assert {record.identifier for record in memory.search("grifo", until="2026-06-01T10:00:00.500Z")} == {"r0", "r1", "r2"}
+
+    database = tmp_path / "memoria.sqlite3"
+    from dungeon_life_agent.memory import migrate_json_to_sqlite
+
+    migrate_json_to_sqlite(storage, database)
+    sql_memory = CollectiveMemory(database, backend="sqlite")
+    assert [record.identifier for record in sql_memory.list_recent(limit=4)] == ["tarde", "r2", "r1", "r0"]
+    assert sql_memory.list_recent(limit=0) == []
+    assert sql_memory.list_recent(limit=-1) == []
+    sql_memory.close()
+
+
+def test_semantic_memory_does_not_persist_vectors_from_an_embedder_fallback(tmp_path):
+    class _Degradable(_ThemeEmbedder):
+        def __init__(self, degraded: bool) -> None:
+            super().__init__()
+            self.degraded = degraded
+            self.fallback_batches = 0
+
+        def embed(self, texts):
+            if self.degraded:
+                self.fallback_batches += 1
+            return super().embed(texts)
+
+    storage = tmp_path / "memoria.json"
+    memory = CollectiveMemory(storage, embedder=_Degradable(degraded=False))
+    memory.capture(channel="arte", author="ana", content="wyrm uno")
+    memory.close()
+
+    outage = _Degradable(degraded=True)
+    memory = CollectiveMemory(storage, embedder=outage)
+    memory.capture(channel="arte", author="ana", content="posada dos")
+    assert [record.content for record in memory.search("hidromiel", limit=5)] == ["posada dos"]
+    memory.close()
+
+    recovered = _Degradable(degraded=False)
+    CollectiveMemory(storage, embedder=recovered).close()
+    # Se re-embebe solo el registro capturado durante el fallo; el otro viene del disco.
+    assert recovered.texts == 1
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from dungeon_life_agent import vector_math
+
+
+def _random_unit_vectors(count: int, dimension: int, seed: int = 7) -> list[list[float]]:
+    generator = random.Random(seed)
+    vectors = [[generator.uniform(-1.0, 1.0) for _ in range(dimension)] for _ in range(count)]
+    return [vector_math.l2_normalize(vector) for vector in vectors]
+
+
+def test_mmr_prefers_relevance_then_diversity():
+    vectors = [[1.0, 0.0], [0.99, 0.141], [0.0, 1.0]]
+    similarities = [0.9, 0.89, 0.5]
+    selected = vector_math.mmr_select(vectors, similarities, limit=2, mmr_lambda=0.5)
+    assert selected == [0, 2]
+
+
+def test_numpy_backend_matches_pure_python():
+    np = pytest.importorskip("numpy")
+    vectors = _random_unit_vectors(40, 32)
+    query = vectors[0]
+    matrix = vector_math.as_matrix(vectors)
+    assert isinstance(matrix, np.ndarray)
+
+    expected_scores = [vector_math.dot(query, vector) for vector in vectors]
+    assert vector_math.dot_scores(query, matrix) == pytest.approx(expected_scores, abs=1e-12)
+
+    for mmr_lambda in (0.3, 0.8):
+        assert vector_math.mmr_select(
+            matrix, expected_scores, limit=15, mmr_lambda=mmr_lambda
+        ) == vector_math.mmr_select(
+            vectors, expected_scores, limit=15, mmr_lambda=mmr_lambda, similarity=vector_math.dot
+        )
+
+    raw = [[component * 3.0 for component in vector] for vector in vectors] + [[0.0] * 32]
+    normalized = vector_math.l2_normalize_many(raw)
+    for row, vector in zip(normalized, raw, strict=True):
+        assert row == pytest.approx(vector_math.l2_normalize(vector), abs=1e-12)
+
+    pairwise = vector_math.average_pairwise_cosine(vectors[:10])
+    pairs = [vector_math.cosine(a, b) for i, a in enumerate(vectors[:10]) for b in vectors[i + 1 : 10]]
+    assert pairwise == pytest.approx(sum(pairs) / len(pairs), abs=1e-12)
+
+
+def test_incremental_mmr_matches_naive_definition():
+    vectors = _random_unit_vectors(30, 16, seed=3)
+    similarities = [vector_math.dot(vectors[0], vector) for vector in vectors]
+
+    def naive(limit: int, mmr_lambda: float) -> list[int]:
+        available = list(range(len(vectors)))
+        selected: list[int] = []
+        while available and len(selected) < limit:
+            def score(index: int) -> float:
+                penalty = max((vector_math.dot(vectors[index], vectors[c]) for c in selected), default=0.0)
+                return mmr_lambda * similarities[index] - (1.0 - mmr_lambda) * penalty
+
+            best = max(available, key=lambda index: (score(index), -index))
+            selected.append(best)
+            available.remove(best)
+        return selected
+
+    for mmr_lambda in (0.2, 0.5, 0.8):
+        assert vector_math.mmr_select(
+            vectors, similarities, limit=12, mmr_lambda=mmr_lambda, similarity=vector_math.dot
+        ) == naive(12, mmr_lambda)
+
+
+def test_top_dot_rows_ranks_flat_float32_rows_and_respects_positions():
+    import array
+
+    vectors = _random_unit_vectors(30, 8)
+    rows = array.array("f", [component for vector in vectors for component in vector])
+    query = vectors[4]
+
+    expected = sorted(range(30), key=lambda index: vector_math.dot(query, rows[index * 8 : (index + 1) * 8]), reverse=True)
+    top = vector_math.top_dot_rows(rows, 8, query, 5)
+    assert [index for index, _ in top] == expected[:5]
+    assert top[0][0] == 4 and top[0][1] == pytest.approx(1.0, abs=1e-5)
+
+    subset = [1, 7, 12, 20]
+    restricted = vector_math.top_dot_rows(rows, 8, query, 10, positions=subset)
+    assert sorted(index for index, _ in restricted) == subset
+    assert [score for _, score in restricted] == sorted((score for _, score in restricted), reverse=True)
+    assert vector_math.dot_rows(rows, 8, query, [12]) == pytest.approx([dict(restricted)[12]], abs=1e-6)
+    assert vector_math.top_dot_rows(rows, 8, query, 3, positions=[]) == []
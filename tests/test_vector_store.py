@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import array
+
+import pytest
+
+from dungeon_life_agent.knowledge import DocumentationIndex
+from dungeon_life_agent.search_pipeline import HybridSearchPipeline
+from dungeon_life_agent.vector_store import VectorStore, text_key
+
+
+class _CountingEmbedder:
+    model = "contador"
+    dimension = 4
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def embed(self, texts, strategy="auto"):
+        vectors = []
+        for text in texts:
+            self.calls.append(text)
+            vectors.append([float(len(text) % 7), 1.0, 0.5, float(text.count(" "))])
+        return vectors
+
+
+@pytest.mark.parametrize("precision", ["fp32", "fp16"])
+def test_vector_store_round_trips_through_disk(tmp_path, precision):
+    path = tmp_path / "vectores.dlavec"
+    store = VectorStore(path, namespace="demo", precision=precision)
+    store.add("a", [0.5, -0.25, 1.0])
+    store.add("b", [0.125, 0.75, -1.0])
+    assert store.get("a") == [0.5, -0.25, 1.0]
+    assert store.flush()
+    store.add("c", [1.0, 0.0, 0.0])
+    assert store.flush()
+    store.close()
+
+    reopened = VectorStore(path, namespace="demo", precision=precision)
+    assert len(reopened) == 3
+    assert reopened.get("b") == [0.125, 0.75, -1.0]
+    assert reopened.get("c") == [1.0, 0.0, 0.0]
+
+    assert reopened.compact({"c"}) == 2
+    assert reopened.get("a") is None
+    assert VectorStore(path, namespace="demo", precision=precision).get("c") == [1.0, 0.0, 0.0]
+    assert len(VectorStore(path, namespace="otro", precision=precision)) == 0
+
+
+def test_interrupted_compaction_discards_the_store_instead_of_misreading_rows(tmp_path, monkeypatch):
+    path = tmp_path / "vectores.dlavec"
+    store = VectorStore(path, namespace="demo")
+    for index, key in enumerate("abcd"):
+        store.add(key, [float(index), 1.0])
+    store.flush()
+
+    class _Crash(Exception):
+        pass
+
+    def crash(*args, **kwargs):
+        raise _Crash
+
+    # Corte justo después de sustituir la matriz y antes de escribir el mapa de ids.
+    monkeypatch.setattr(VectorStore, "_write_ids", crash)
+    with pytest.raises(_Crash):
+        store.compact({"c", "d"})
+    monkeypatch.undo()
+
+    reopened = VectorStore(path, namespace="demo")
+    assert len(reopened) == 0
+    assert reopened.get("a") is None
+    reopened.add("a", [9.0, 9.0])
+    reopened.flush()
+    assert VectorStore(path, namespace="demo").get("a") == [9.0, 9.0]
+
+
+def test_index_time_embeddings_leave_only_the_query_for_search(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    source = docs / "guia.md"
+    source.write_text("# Guia\nDragones en la cripta. Mapas del bosque.\n# Taberna\nGrifos y dragones.", encoding="utf-8")
+
+    embedder = _CountingEmbedder()
+    DocumentationIndex(docs, embedder=embedder, use_vector_store=True)
+    assert embedder.calls, "La indexación debe calcular los embeddings del corpus"
+
+    restarted = _CountingEmbedder()
+    pipeline = HybridSearchPipeline(embedder=restarted)
+    index = DocumentationIndex(docs, pipeline=pipeline, use_vector_store=True)
+    assert restarted.calls == []
+    assert index.search("dragones")
+    assert restarted.calls == ["dragones"]
+
+    source.write_text("# Guia\nUn texto nuevo sobre grifos.", encoding="utf-8")
+    index.refresh(paths=[source])
+    store = pipeline.vector_store
+    assert all(text_key(text) in store for text in pipeline.corpus_texts(index.sections[0]))
+
+
+def test_export_rows_returns_a_flat_matrix_and_missing_positions(tmp_path):
+    store = VectorStore(tmp_path / "vectores.dlavec", precision="fp16")
+    store.add("a", [1.0, 0.5])
+    store.add("b", [0.25, -1.0])
+    store.flush()
+    store.add("c", [2.0, 3.0])  # pendiente, aún sin escribir
+
+    rows, missing = store.export_rows(["b", "x", "c", "a"])
+    assert list(rows) == [0.25, -1.0, 0.0, 0.0, 2.0, 3.0, 1.0, 0.5]
+    assert missing == [1]
+    assert VectorStore(tmp_path / "otro.dlavec").export_rows(["a"]) == (array.array("f"), [0])
+
+
+def test_fallback_vectors_from_a_remote_outage_are_not_persisted(tmp_path):
+    from dungeon_life_agent.embedding_gemma import EmbeddingGemma
+
+    class _Ollama:
+        def __init__(self, available: bool) -> None:
+            self.available = available
+            self.texts = 0
+
+        def embed(self, *, model, input):
+            if not self.available:
+                raise ConnectionError("ollama caído")
+            self.texts += len(input)
+            return {"embeddings": [[1.0, float(len(text)), 0.0, 0.5] for text in input]}
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guia.md").write_text("# Guia\nDragones en la cripta.\n# Taberna\nGrifos y dragones.", encoding="utf-8")
+
+    offline = EmbeddingGemma(client=_Ollama(available=False), dimension=4)
+    assert DocumentationIndex(docs, embedder=offline, use_vector_store=True, use_snapshot=False).search("dragones")
+    assert offline.fallback_batches > 0
+
+    recovered = _Ollama(available=True)
+    DocumentationIndex(docs, embedder=EmbeddingGemma(client=recovered, dimension=4), use_vector_store=True, use_snapshot=False)
+    assert recovered.texts > 0, "Los vectores del fallback no deben haberse guardado"
+
+    restarted = _Ollama(available=True)
+    DocumentationIndex(docs, embedder=EmbeddingGemma(client=restarted, dimension=4), use_vector_store=True, use_snapshot=False)
+    assert restarted.texts == 0